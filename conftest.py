@@ -0,0 +1,26 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # These modules use async/await syntax
+    collect_ignore += [
+        "tests/test_asgi.py",
+        "tests/test_async_registry.py",
+        "typedjsonrpc/asgi.py",
+        "typedjsonrpc/async_registry.py",
+    ]
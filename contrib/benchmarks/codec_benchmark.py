@@ -0,0 +1,75 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Codec benchmark
+
+This benchmark compares the codecs from :mod:`typedjsonrpc.codec` which are installed on
+representative JSON-RPC requests and responses.
+
+To run this benchmark, run:
+.. code-block:: bash
+
+    $ cd /path/to/typedjsonrpc
+    $ python contrib/benchmarks/codec_benchmark.py
+"""
+from __future__ import absolute_import, division, print_function
+
+import timeit
+
+from typedjsonrpc.codec import get_available_codecs
+
+SINGLE_REQUEST = {
+    "jsonrpc": "2.0",
+    "method": "example.add",
+    "params": {"a": 5, "b": 7},
+    "id": "foo",
+}
+BATCH_REQUEST = [dict(SINGLE_REQUEST, id=i) for i in range(100)]
+LARGE_RESPONSE = {
+    "jsonrpc": "2.0",
+    "id": "foo",
+    "result": [{
+        "id": i,
+        "name": u"user {}".format(i),
+        "score": i * 0.5,
+        "active": i % 2 == 0,
+        "tags": ["a", "b", "c"],
+    } for i in range(10000)],
+}
+SHAPES = [
+    ("single request", SINGLE_REQUEST, 20000),
+    ("batch of 100 requests", BATCH_REQUEST, 500),
+    ("large response", LARGE_RESPONSE, 20),
+]
+
+
+def main():
+    codecs = get_available_codecs()
+    print("{:<24} {:<8} {:>14} {:>14}".format("shape", "codec", "encode (us)", "decode (us)"))
+    for shape_name, message, number in SHAPES:
+        for codec in codecs:
+            encoded = codec.encode(message)
+            encode_time = min(timeit.repeat(lambda: codec.encode(message),
+                                            number=number, repeat=3))
+            decode_time = min(timeit.repeat(lambda: codec.decode(encoded),
+                                            number=number, repeat=3))
+            print("{:<24} {:<8} {:>14.2f} {:>14.2f}".format(shape_name, codec.name,
+                                                            encode_time / number * 1e6,
+                                                            decode_time / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Response memory benchmark
+
+This benchmark measures the peak memory which is allocated while a multi-megabyte batch response is
+dispatched and written out by :class:`typedjsonrpc.server.Server`. It compares joining the response
+into one string as :meth:`typedjsonrpc.registry.Registry.dispatch` does, and letting werkzeug
+encode it, against writing the encoded pieces from
+:meth:`typedjsonrpc.registry.Registry.dispatch_response` directly.
+
+The request body is read before the measurement starts, so only the response path is measured.
+
+This benchmark requires Python 3.4 or newer for :mod:`tracemalloc`.
+
+To run this benchmark, run:
+.. code-block:: bash
+
+    $ cd /path/to/typedjsonrpc
+    $ python contrib/benchmarks/memory_benchmark.py
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import tracemalloc
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request, Response
+
+from typedjsonrpc.registry import Registry
+
+BATCH_SIZE = 2000
+PAYLOAD_SIZE = 4096
+
+registry = Registry()  # pylint: disable=invalid-name
+
+
+@registry.method(returns=str, size=int)
+def payload(size):
+    return "x" * size
+
+
+def create_request():
+    body = json.dumps([{
+        "jsonrpc": "2.0",
+        "method": "__main__.payload",
+        "params": [PAYLOAD_SIZE],
+        "id": i,
+    } for i in range(BATCH_SIZE)])
+    return Request(EnvironBuilder(method="POST", data=body).get_environ())
+
+
+def write_joined_response(request):
+    """The response path as it was before the registry returned encoded chunks."""
+    response = Response(registry.dispatch(request), mimetype="application/json")
+    return sum(len(chunk) for chunk in response.iter_encoded())
+
+
+def write_chunked_response(request):
+    dispatch_result = registry.dispatch_response(request)
+    response = Response(dispatch_result.chunks, mimetype="application/json")
+    response.content_length = dispatch_result.content_length
+    return sum(len(chunk) for chunk in response.iter_encoded())
+
+
+def measure(write_response):
+    request = create_request()
+    request.get_data()
+    tracemalloc.start()
+    size = write_response(request)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak
+
+
+def main():
+    for name, write_response in [("joined string", write_joined_response),
+                                 ("encoded chunks", write_chunked_response)]:
+        size, peak = measure(write_response)
+        print("{:<15} response: {:.1f} MB, peak allocation of the response path: {:.1f} MB"
+              .format(name, size / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Type checking benchmark
+
+This benchmark compares the per-call cost of checking the parameters of a six-argument method with
+the generic :func:`typedjsonrpc.parameter_checker.check_types` against the validator which
+:meth:`typedjsonrpc.registry.Registry.method` generates for the method at registration time.
+
+To run this benchmark, run:
+.. code-block:: bash
+
+    $ cd /path/to/typedjsonrpc
+    $ python contrib/benchmarks/type_check_benchmark.py
+"""
+from __future__ import absolute_import, division, print_function
+
+import timeit
+
+import six
+
+from typedjsonrpc import parameter_checker
+from typedjsonrpc.method_info import CallPlan
+
+NUMBER = 200000
+ARGS = (six.text_type("name"), 42, 4.2, True, [1, 2, 3], {"key": "value"})
+PARAMETER_TYPES = {
+    "name": six.text_type,
+    "count": int,
+    "ratio": float,
+    "enabled": bool,
+    "items": list,
+    "options": dict,
+}
+
+
+def method(name, count, ratio, enabled=False, items=None, options=None):
+    return name, count, ratio, enabled, items, options
+
+
+def check_with_parameter_dict(call_plan, args, kwargs):
+    """The checks as they were done before validators were generated per method."""
+    parameters = dict(call_plan.defaults)
+    parameters.update(zip(call_plan.arg_names, args))
+    parameters.update(kwargs)
+    parameter_checker.check_types(parameters, PARAMETER_TYPES, strict_floats=False)
+
+
+def main():
+    call_plan = CallPlan.create(method, PARAMETER_TYPES)
+    validate = parameter_checker.create_parameter_validator(call_plan, strict_floats=False)
+
+    before = min(timeit.repeat(lambda: check_with_parameter_dict(call_plan, ARGS, {}),
+                               number=NUMBER, repeat=3))
+    after = min(timeit.repeat(lambda: validate(ARGS, {}), number=NUMBER, repeat=3))
+
+    print("check_types:         {:.3f} us/call".format(before / NUMBER * 1e6))
+    print("generated validator: {:.3f} us/call".format(after / NUMBER * 1e6))
+    print("speedup:             {:.1f}x".format(before / after))
+
+
+if __name__ == "__main__":
+    main()
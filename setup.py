@@ -60,6 +60,7 @@ setup(
         "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.4",
+        "Programming Language :: Python :: 3.5",
     ],
 
     keywords="jsonrpc json-rpc rpc",
@@ -71,4 +72,10 @@ setup(
         "werkzeug>=0.10.0,<0.11.0",
         "wrapt>=1.10.0,<2.0.0",
     ],
+
+    extras_require={
+        ":python_version=='2.7'": ["futures>=3.0.0,<4.0.0"],
+        "orjson": ["orjson"],
+        "ujson": ["ujson"],
+    },
 )
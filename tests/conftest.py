@@ -0,0 +1,47 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+
+import pytest
+
+
+class FakeRequest(object):
+    def __init__(self, data):
+        self._data = json.dumps(data).encode("utf-8")
+
+    def get_data(self, as_text=False):
+        return self._data.decode("utf-8") if as_text else self._data
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def create_request():
+    return FakeRequest
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
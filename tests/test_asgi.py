@@ -0,0 +1,152 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+import json
+
+from typedjsonrpc.asgi import AsgiServer
+from typedjsonrpc.async_registry import AsyncRegistry
+from typedjsonrpc.streaming import Stream
+
+
+def call(app, path, body, headers=()):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": list(headers),
+    }
+    messages = [{"type": "http.request", "body": body[:5], "more_body": True},
+                {"type": "http.request", "body": body[5:], "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(app(scope, receive, send))
+    finally:
+        loop.close()
+    status = sent[0]["status"]
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return status, body
+
+
+def create_app():
+    registry = AsyncRegistry()
+
+    @registry.method(returns=int, x=int)
+    async def double(x):
+        await asyncio.sleep(0)
+        return 2 * x
+
+    return AsgiServer(registry)
+
+
+def test_success():
+    status, body = call(create_app(), "/api", json.dumps({
+        "jsonrpc": "2.0",
+        "method": "test_asgi.double",
+        "params": [21],
+        "id": "foo",
+    }).encode("utf-8"))
+    assert status == 200
+    assert json.loads(body.decode("utf-8"))["result"] == 42
+
+
+def test_notification():
+    status, body = call(create_app(), "/api", json.dumps({
+        "jsonrpc": "2.0",
+        "method": "test_asgi.double",
+        "params": [21],
+    }).encode("utf-8"))
+    assert status == 204
+    assert body == b""
+
+
+def test_errors():
+    status, _ = call(create_app(), "/api", json.dumps({
+        "jsonrpc": "2.0",
+        "method": "bogus",
+        "id": "foo",
+    }).encode("utf-8"))
+    assert status == 404
+
+    status, _ = call(create_app(), "/api", b"{ not json }")
+    assert status == 400
+
+
+def test_streamed_result():
+    registry = AsyncRegistry()
+
+    @registry.method(returns=Stream(int), count=int)
+    def count_up(count):
+        for i in range(count):
+            yield i
+
+    status, body = call(AsgiServer(registry), "/api", json.dumps({
+        "jsonrpc": "2.0",
+        "method": "test_asgi.count_up",
+        "params": [3],
+        "id": 1,
+    }).encode("utf-8"))
+    assert status == 200
+    assert json.loads(body.decode("utf-8"))["result"] == [0, 1, 2]
+
+
+def test_invalid_endpoint():
+    status, _ = call(create_app(), "/bogus", b"{}")
+    assert status == 404
+
+
+def test_request_headers():
+    registry = AsyncRegistry()
+    seen_requests = []
+    original_dispatch_response = registry.dispatch_response
+
+    async def dispatch_response(request):
+        seen_requests.append(request)
+        return await original_dispatch_response(request)
+    registry.dispatch_response = dispatch_response
+
+    call(AsgiServer(registry), "/api", b"[]", headers=[(b"X-Test", b"foo")])
+    assert seen_requests[0].headers["x-test"] == "foo"
+    assert seen_requests[0].get_data(as_text=True) == "[]"
+
+
+def test_lifespan():
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(create_app()({"type": "lifespan"}, receive, send))
+    finally:
+        loop.close()
+    assert [message["type"] for message in sent] == ["lifespan.startup.complete",
+                                                     "lifespan.shutdown.complete"]
@@ -0,0 +1,318 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from typedjsonrpc.async_registry import AsyncRegistry
+from typedjsonrpc.errors import (InvalidParamsError, InvalidReturnTypeError, MethodNotFoundError,
+                                 MethodTimeoutError, OverloadedError)
+from typedjsonrpc.limits import Bulkhead
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.streaming import Stream
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_method_type_checks():
+    registry = AsyncRegistry()
+
+    @registry.method(returns=int, x=int)
+    async def double(x):
+        return 2 * x
+
+    @registry.method(returns=int)
+    async def wrong_return():
+        return "42"
+
+    assert asyncio.iscoroutinefunction(double)
+    assert run(double(21)) == 42
+    with pytest.raises(InvalidParamsError):
+        run(double("21"))
+    with pytest.raises(InvalidReturnTypeError):
+        run(wrong_return())
+
+
+def test_dispatch(create_request):
+    registry = AsyncRegistry()
+
+    @registry.method(returns=int, x=int, y=int)
+    async def add(x, y):
+        await asyncio.sleep(0)
+        return x + y
+
+    @registry.method(returns=int, x=int)
+    def negate(x):
+        return -x
+
+    response = run(registry.dispatch(create_request({
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.add",
+        "params": {"x": 1, "y": 2},
+        "id": "foo",
+    })))
+    assert json.loads(response) == {"jsonrpc": "2.0", "id": "foo", "result": 3}
+
+    response = run(registry.dispatch(create_request({
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.negate",
+        "params": [1],
+        "id": "foo",
+    })))
+    assert json.loads(response)["result"] == -1
+
+
+def test_dispatch_batch_concurrently(create_request):
+    registry = AsyncRegistry()
+
+    @registry.method(returns=int, x=int)
+    async def slow_identity(x):
+        await asyncio.sleep(0.1)
+        return x
+
+    batch = [{
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.slow_identity",
+        "params": [i],
+        "id": i,
+    } for i in range(50)]
+    batch.append({"jsonrpc": "2.0", "method": "test_async_registry.slow_identity", "params": [0]})
+    batch.append({"jsonrpc": "2.0", "method": "bogus", "id": 50})
+
+    start = time.time()
+    response = json.loads(run(registry.dispatch(create_request(batch))))
+    assert time.time() - start < 2.5
+
+    assert [msg["id"] for msg in response] == list(range(51))
+    assert [msg["result"] for msg in response[:50]] == list(range(50))
+    assert response[50]["error"]["code"] == MethodNotFoundError.code
+
+
+def test_dispatch_regular_function_does_not_block_loop(create_request):
+    registry = AsyncRegistry()
+    released = threading.Event()
+
+    @registry.method(returns=bool)
+    def wait_for_release():
+        return released.wait(5)
+
+    @registry.method(returns=bool)
+    async def release():
+        await asyncio.sleep(0.01)
+        released.set()
+        return True
+
+    batch = [{"jsonrpc": "2.0", "method": "test_async_registry.wait_for_release", "id": 1},
+             {"jsonrpc": "2.0", "method": "test_async_registry.release", "id": 2}]
+    response = json.loads(run(registry.dispatch(create_request(batch))))
+    assert response[0]["result"] is True
+    assert response[1]["result"] is True
+
+
+def test_dispatch_batch_method(create_request):
+    registry = AsyncRegistry()
+    invocations = []
+
+    @registry.batch_method(returns=int, x=int)
+    def square(calls):
+        invocations.append(len(calls))
+        return [call["x"] * call["x"] for call in calls]
+
+    @registry.method(returns=int, x=int)
+    async def negate(x):
+        return -x
+
+    batch = [{"jsonrpc": "2.0", "method": "test_async_registry.square", "params": [i], "id": i}
+             for i in range(5)]
+    batch.append({"jsonrpc": "2.0", "method": "test_async_registry.negate", "params": [5],
+                  "id": 5})
+    response = json.loads(run(registry.dispatch(create_request(batch))))
+    assert [item["result"] for item in response] == [0, 1, 4, 9, 16, -5]
+    assert invocations == [5]
+
+
+def test_dispatch_stream_outside_loop(create_request):
+    registry = AsyncRegistry()
+    threads = []
+
+    @registry.method(returns=Stream(int), count=int)
+    def count_up(count):
+        for i in range(count):
+            threads.append(threading.current_thread())
+            yield i
+
+    batch = [{"jsonrpc": "2.0", "method": "test_async_registry.count_up", "params": [3], "id": 1},
+             {"jsonrpc": "2.0", "method": "test_async_registry.count_up", "params": [2]}]
+    dispatch_result = run(registry.dispatch_response(create_request(batch)))
+    assert json.loads(dispatch_result.body) == [{"jsonrpc": "2.0", "id": 1, "result": [0, 1, 2]}]
+    assert dispatch_result.content_length == len(dispatch_result.body)
+    assert len(threads) == 5
+    assert threading.current_thread() not in threads
+
+
+def test_dispatch_notification(create_request):
+    registry = AsyncRegistry()
+    called = []
+
+    @registry.method(returns=None)
+    async def notify():
+        called.append(True)
+
+    assert run(registry.dispatch(create_request({
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.notify",
+    }))) is None
+    assert called == [True]
+
+
+def test_dispatch_batch_idempotent(create_request):
+    registry = AsyncRegistry()
+    calls = []
+
+    @registry.method(returns=int, options=MethodOptions(idempotent=True), x=int)
+    async def lookup(x):
+        calls.append(x)
+        return x
+
+    batch = [{
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.lookup",
+        "params": [i % 2],
+        "id": i,
+    } for i in range(4)]
+    response = json.loads(run(registry.dispatch(create_request(batch))))
+    assert [item["result"] for item in response] == [0, 1, 0, 1]
+    assert [item["id"] for item in response] == [0, 1, 2, 3]
+    assert sorted(calls) == [0, 1]
+    assert registry.deduplicated_calls == 2
+
+
+def test_dispatch_bulkhead(create_request):
+    registry = AsyncRegistry()
+    bulkhead = Bulkhead(max_concurrent=1, max_waiting=10)
+
+    @registry.method(returns=int, options=MethodOptions(bulkhead=bulkhead), x=int)
+    async def slow_identity(x):
+        await asyncio.sleep(0.01)
+        return x
+
+    batch = [{"jsonrpc": "2.0", "method": "test_async_registry.slow_identity", "params": [i],
+              "id": i} for i in range(2)]
+    response = json.loads(run(registry.dispatch(create_request(batch))))
+    assert response[0]["result"] == 0
+    assert response[1]["error"]["code"] == OverloadedError.code
+    assert bulkhead.info().active == 0
+
+
+async def top_level_coroutine():
+    return 42
+
+
+def test_method_process_executor_coroutine_function():
+    executor = ProcessPoolExecutor(max_workers=1)
+    registry = AsyncRegistry(process_executor=executor)
+    try:
+        with pytest.raises(Exception) as excinfo:
+            registry.method(returns=int,
+                            options=MethodOptions(executor="process"))(top_level_coroutine)
+    finally:
+        executor.shutdown()
+    assert "coroutine" in str(excinfo.value)
+
+
+def test_dispatch_timeout(create_request):
+    registry = AsyncRegistry()
+    cancelled = []
+
+    @registry.method(returns=int, options=MethodOptions(timeout=0.01), x=int)
+    async def stuck(x):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+        return x
+
+    response = json.loads(run(registry.dispatch(create_request({
+        "jsonrpc": "2.0",
+        "method": "test_async_registry.stuck",
+        "params": [1],
+        "id": 1,
+    }))))
+    assert response["error"]["code"] == MethodTimeoutError.code
+    assert cancelled == [1]
+    assert registry.timed_out_calls == 1
+
+
+def test_dispatch_timeout_of_regular_function_does_not_block_loop(create_request):
+    executor = ThreadPoolExecutor(max_workers=1)
+    registry = AsyncRegistry(timeout_executor=executor)
+    released = threading.Event()
+
+    @registry.method(returns=bool, options=MethodOptions(timeout=5))
+    def wait_for_release():
+        return released.wait(5)
+
+    @registry.method(returns=bool)
+    async def release():
+        await asyncio.sleep(0.01)
+        released.set()
+        return True
+
+    batch = [{"jsonrpc": "2.0", "method": "test_async_registry.wait_for_release", "id": 1},
+             {"jsonrpc": "2.0", "method": "test_async_registry.release", "id": 2}]
+    try:
+        response = json.loads(run(registry.dispatch(create_request(batch))))
+    finally:
+        executor.shutdown()
+    assert response[0]["result"] is True
+    assert response[1]["result"] is True
+    assert registry.timed_out_calls == 0
+
+
+def test_dispatch_timeout_of_regular_function(create_request):
+    executor = ThreadPoolExecutor(max_workers=1)
+    registry = AsyncRegistry(timeout_executor=executor)
+    released = threading.Event()
+
+    @registry.method(returns=bool, options=MethodOptions(timeout=0.01))
+    def stuck():
+        return released.wait(5)
+
+    try:
+        response = json.loads(run(registry.dispatch(create_request({
+            "jsonrpc": "2.0",
+            "method": "test_async_registry.stuck",
+            "id": 1,
+        }))))
+    finally:
+        released.set()
+        executor.shutdown()
+    assert response["error"]["code"] == MethodTimeoutError.code
+    assert registry.timed_out_calls == 1
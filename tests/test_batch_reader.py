@@ -0,0 +1,89 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+
+import pytest
+
+from typedjsonrpc.batch_reader import BatchReader
+from typedjsonrpc.codec import JsonCodec
+from typedjsonrpc.errors import ParseError
+
+MESSAGES = [
+    {"jsonrpc": "2.0", "method": "echo", "params": [u"[{\"été\\\\\"}],"], "id": 1},
+    {"jsonrpc": "2.0", "method": "echo", "params": {"x": [[], {}, [{"y": "]"}]]}},
+    42,
+    [],
+]
+
+
+def read(data, chunk_size):
+    reader = BatchReader(io.BytesIO(data), JsonCodec(), chunk_size=chunk_size)
+    return reader, list(reader)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 4096])
+def test_batch(chunk_size):
+    data = b" \n" + json.dumps(MESSAGES, ensure_ascii=False).encode("utf-8") + b" \n"
+    reader, messages = read(data, chunk_size)
+    assert reader.is_batch
+    assert messages == MESSAGES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4096])
+def test_single_message(chunk_size):
+    reader, messages = read(json.dumps(MESSAGES[0]).encode("utf-8"), chunk_size)
+    assert not reader.is_batch
+    assert messages == [MESSAGES[0]]
+
+
+def test_empty_batch():
+    reader, messages = read(b"[ ]", 1)
+    assert reader.is_batch
+    assert messages == []
+
+
+def test_entries_are_read_lazily():
+    stream = io.BytesIO(b'[{"id": 1}, {"id": 2}, {"id": 3}]')
+    messages = iter(BatchReader(stream, JsonCodec(), chunk_size=4))
+    assert next(messages) == {"id": 1}
+    assert stream.tell() < len(stream.getvalue())
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"{",
+    b"[1, 2",
+    b"[1, }",
+    b"[1,, 2]",
+    b"[1, 2,]",
+    b"[1, 2] 3",
+    b'[1, "2]',
+])
+def test_invalid(data):
+    with pytest.raises(ParseError):
+        read(data, 2)
+
+
+def test_valid_entries_before_invalid_one():
+    messages = iter(BatchReader(io.BytesIO(b"[1, 2, {]"), JsonCodec()))
+    assert next(messages) == 1
+    assert next(messages) == 2
+    with pytest.raises(ParseError):
+        next(messages)
@@ -0,0 +1,242 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from typedjsonrpc.batching import BatchMethodOptions, MicroBatcher, MicroBatcherInfo
+from typedjsonrpc.errors import (InternalError, InvalidParamsError, InvalidReturnTypeError,
+                                 ServerError)
+from typedjsonrpc.registry import Registry
+
+
+def _call(method, params, msg_id=None):
+    msg = {"jsonrpc": "2.0", "method": "test_batching." + method, "params": params}
+    if msg_id is not None:
+        msg["id"] = msg_id
+    return msg
+
+
+def _create_registry(executor=None):
+    registry = Registry(executor=executor)
+    invocations = []
+
+    @registry.batch_method(returns=str, user_id=int)
+    def get_name(calls):
+        """Returns user names."""
+        invocations.append(calls)
+        results = []
+        for call in calls:
+            if call["user_id"] < 0:
+                results.append(ServerError("no such user"))
+            elif call["user_id"] == 0:
+                results.append(0)
+            else:
+                results.append("user{}".format(call["user_id"]))
+        return results
+
+    @registry.method(returns=int, x=int)
+    def double(x):
+        return 2 * x
+
+    return registry, invocations
+
+
+@pytest.mark.parametrize("executor", [None, ThreadPoolExecutor(max_workers=2)])
+def test_batch_is_grouped(executor, create_request):
+    registry, invocations = _create_registry(executor)
+    response = json.loads(registry.dispatch(create_request([
+        _call("get_name", [1], 1),
+        _call("double", [1], 2),
+        _call("get_name", {"user_id": 2}, 3),
+        _call("get_name", [3]),
+        _call("get_name", ["4"], 4),
+        _call("get_name", [-1], 5),
+        _call("get_name", [0], 6),
+    ])))
+
+    assert invocations == [[{"user_id": 1}, {"user_id": 2}, {"user_id": 3}, {"user_id": -1},
+                            {"user_id": 0}]]
+    assert [item["id"] for item in response] == [1, 2, 3, 4, 5, 6]
+    assert [item.get("result") for item in response[:3]] == ["user1", 2, "user2"]
+    assert response[3]["error"]["code"] == InvalidParamsError.code
+    assert response[4]["error"]["code"] == ServerError.code
+    assert response[4]["error"]["data"] == "no such user"
+    assert response[5]["error"]["code"] == InvalidReturnTypeError.code
+
+
+def test_single_call(create_request):
+    registry, invocations = _create_registry()
+    response = json.loads(registry.dispatch(create_request(_call("get_name", [1], 1))))
+    assert response["result"] == "user1"
+    assert invocations == [[{"user_id": 1}]]
+
+    response = json.loads(registry.dispatch(create_request(_call("get_name", [-1], 1))))
+    assert response["error"]["code"] == ServerError.code
+
+
+def test_parameter_named_like_option(create_request):
+    registry = Registry()
+
+    @registry.batch_method(returns=int, micro_batcher=int)
+    def double(calls):
+        return [2 * call["micro_batcher"] for call in calls]
+
+    response = json.loads(registry.dispatch(create_request(_call("double", [4], 1))))
+    assert response["result"] == 8
+
+
+def test_failing_method(create_request):
+    registry = Registry()
+
+    @registry.batch_method(returns=int, x=int)
+    def fail(calls):
+        raise ValueError("failed")
+
+    @registry.batch_method(returns=int, x=int)
+    def too_few(calls):
+        return []
+
+    response = json.loads(registry.dispatch(create_request([
+        _call("fail", [1], 1),
+        _call("fail", [2], 2),
+        _call("too_few", [1], 3),
+        _call("too_few", [2], 4),
+    ])))
+    assert [item["id"] for item in response] == [1, 2, 3, 4]
+    assert [item["error"]["code"] for item in response] == [InternalError.code] * 2 + [
+        InvalidReturnTypeError.code] * 2
+
+
+def test_describe():
+    registry, _ = _create_registry()
+    description = [method for method in registry.describe()["methods"]
+                   if method["name"] == "test_batching.get_name"]
+    assert description == [{
+        "name": "test_batching.get_name",
+        "params": [{"name": "user_id", "type": "int"}],
+        "returns": "str",
+        "description": "Returns user names.",
+    }]
+
+
+def test_several_parameters_by_name(create_request):
+    registry = Registry()
+
+    @registry.batch_method(returns=int, base=int, exponent=int)
+    def power(calls):
+        return [call["base"] ** call["exponent"] for call in calls]
+
+    response = json.loads(registry.dispatch(create_request([
+        _call("power", {"base": 2, "exponent": 3}, 1),
+        _call("power", [2, 3], 2),
+        _call("power", {"exponent": 2, "base": 3}, 3),
+    ])))
+    assert response[0]["result"] == 8
+    assert response[1]["error"]["code"] == InvalidParamsError.code
+    assert response[2]["result"] == 9
+    description = [method for method in registry.describe()["methods"]
+                   if method["name"] == "test_batching.power"]
+    assert [param["name"] for param in description[0]["params"]] == ["base", "exponent"]
+
+
+def _dispatch_concurrently(registry, create_request, messages):
+    responses = [None] * len(messages)
+
+    def dispatch(index):
+        responses[index] = json.loads(registry.dispatch(create_request(messages[index])))
+
+    threads = [threading.Thread(target=dispatch, args=(i,)) for i in range(len(messages))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_micro_batcher_gathers_concurrent_calls(create_request):
+    registry = Registry()
+    micro_batcher = MicroBatcher(max_delay=10, max_size=4)
+    invocations = []
+
+    @registry.batch_method(returns=int, options=BatchMethodOptions(micro_batcher=micro_batcher),
+                           x=int)
+    def square(calls):
+        invocations.append(len(calls))
+        return [call["x"] ** 2 if call["x"] >= 0 else ValueError("negative") for call in calls]
+
+    start = time.time()
+    responses = _dispatch_concurrently(registry, create_request,
+                                       [_call("square", [i], i) for i in [1, 2, 3, -1]])
+    assert time.time() - start < 5
+
+    assert invocations == [4]
+    assert [response.get("result") for response in responses] == [1, 4, 9, None]
+    assert responses[3]["error"]["code"] == InternalError.code
+    assert micro_batcher.info() == MicroBatcherInfo(calls=4, invocations=1)
+
+
+def test_micro_batcher_window_expires(create_request):
+    registry = Registry()
+    micro_batcher = MicroBatcher(max_delay=0.01, max_size=100)
+    invocations = []
+
+    @registry.batch_method(returns=int, options=BatchMethodOptions(micro_batcher=micro_batcher),
+                           x=int)
+    def identity(calls):
+        invocations.append(len(calls))
+        return [call["x"] for call in calls]
+
+    response = json.loads(registry.dispatch(create_request(_call("identity", [7], 1))))
+    assert response["result"] == 7
+    assert invocations == [1]
+
+
+def test_micro_batcher_shares_failure(create_request):
+    registry = Registry()
+
+    micro_batcher = MicroBatcher(max_delay=10, max_size=3)
+
+    @registry.batch_method(returns=int, options=BatchMethodOptions(micro_batcher=micro_batcher),
+                           x=int)
+    def fail(calls):
+        raise ServerError("unavailable")
+
+    responses = _dispatch_concurrently(registry, create_request,
+                                       [_call("fail", [i], i) for i in range(3)])
+    assert [response["error"]["data"] for response in responses] == ["unavailable"] * 3
+
+
+def test_micro_batcher_cannot_be_shared():
+    registry = Registry()
+    micro_batcher = MicroBatcher()
+
+    @registry.batch_method(returns=int, options=BatchMethodOptions(micro_batcher=micro_batcher),
+                           x=int)
+    def first(calls):
+        return [0] * len(calls)
+
+    with pytest.raises(Exception):
+        @registry.batch_method(returns=int, options=BatchMethodOptions(micro_batcher=micro_batcher),
+                               x=int)
+        def second(calls):
+            return [0] * len(calls)
@@ -0,0 +1,250 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import threading
+import time
+
+import pytest
+
+from typedjsonrpc.cache import CacheInfo, ResultCache, SingleFlight, SingleFlightInfo, make_key
+from typedjsonrpc.errors import InvalidParamsError
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.registry import Registry
+
+
+def test_make_key():
+    assert make_key([1, {"a": [2]}]) == make_key([1, {"a": [2]}])
+    assert make_key({"a": 1, "b": 2}) == make_key({"b": 2, "a": 1})
+    assert len({make_key(1), make_key(1.0), make_key(True)}) == 3
+    with pytest.raises(TypeError):
+        make_key({1, 2})
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.info() == CacheInfo(hits=3, misses=1, size=2, max_entries=2)
+
+
+def test_ttl(clock):
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == (True, 1)
+    clock.now = 10
+    assert cache.get("a") == (False, None)
+    assert cache.info().size == 0
+
+
+def test_invalid_max_entries():
+    with pytest.raises(ValueError):
+        ResultCache(max_entries=0)
+
+
+def test_cached_method():
+    registry = Registry()
+    cache = ResultCache()
+    calls = []
+
+    @registry.method(returns=int, options=MethodOptions(cache=cache), x=int, y=int)
+    def add(x, y=1):
+        calls.append((x, y))
+        return x + y
+
+    assert add(1, 2) == 3
+    assert add(x=1, y=2) == 3
+    assert add(1, y=2) == 3
+    assert add(1) == 2
+    assert add(1, 1) == 2
+    assert calls == [(1, 2), (1, 1)]
+    assert registry.get_cache_info("test_cache.add") == CacheInfo(3, 2, 2, 128)
+
+    registry.invalidate_cache("test_cache.add")
+    assert add(1, 2) == 3
+    assert calls == [(1, 2), (1, 1), (1, 2)]
+
+
+def test_cached_method_through_dispatch(create_request):
+    registry = Registry()
+    calls = []
+
+    @registry.method(returns=list, options=MethodOptions(cache=ResultCache()), items=list)
+    def reverse(items):
+        calls.append(items)
+        return list(reversed(items))
+
+    request = create_request([
+        {"jsonrpc": "2.0", "method": "test_cache.reverse", "params": [[1, 2]], "id": 1},
+        {"jsonrpc": "2.0", "method": "test_cache.reverse", "params": {"items": [1, 2]}, "id": 2},
+        {"jsonrpc": "2.0", "method": "test_cache.reverse", "params": [[1, "2"]], "id": 3},
+    ])
+    response = json.loads(registry.dispatch(request))
+    assert [item["result"] for item in response] == [[2, 1], [2, 1], ["2", 1]]
+    assert calls == [[1, 2], [1, "2"]]
+
+
+def test_cache_is_not_used_for_invalid_calls():
+    registry = Registry()
+    cache = ResultCache()
+
+    @registry.method(returns=int, options=MethodOptions(cache=cache), x=int)
+    def double(x):
+        return x * 2
+
+    with pytest.raises(InvalidParamsError):
+        double("a")
+    assert cache.info() == CacheInfo(0, 0, 0, 128)
+
+
+def test_errors_are_not_cached():
+    registry = Registry()
+    calls = []
+
+    @registry.method(returns=int, options=MethodOptions(cache=ResultCache()), x=int)
+    def fail_once(x):
+        calls.append(x)
+        if len(calls) == 1:
+            raise ValueError("first call")
+        return x
+
+    with pytest.raises(ValueError):
+        fail_once(1)
+    assert fail_once(1) == 1
+    assert fail_once(1) == 1
+    assert calls == [1, 1]
+
+
+def test_key_function():
+    registry = Registry()
+    calls = []
+
+    cache = ResultCache(key=lambda name, **kwargs: name.lower())
+
+    @registry.method(returns=str, options=MethodOptions(cache=cache), name=str)
+    def greet(name):
+        calls.append(name)
+        return "Hello " + name.lower()
+
+    assert greet("Ada") == "Hello ada"
+    assert greet("ADA") == "Hello ada"
+    assert calls == ["Ada"]
+
+
+def test_varargs_are_part_of_the_key():
+    registry = Registry()
+
+    @registry.method(returns=int, options=MethodOptions(cache=ResultCache()), x=int)
+    def count(x, *args, **kwargs):
+        return x + len(args) + len(kwargs)
+
+    assert count(1) == 1
+    assert count(1, 2, 3) == 3
+    assert count(1, a=2) == 2
+
+
+def test_cache_cannot_be_shared():
+    registry = Registry()
+    cache = ResultCache()
+
+    @registry.method(returns=int, options=MethodOptions(cache=cache), x=int)
+    def first(x):
+        return x
+
+    with pytest.raises(Exception):
+        @registry.method(returns=int, options=MethodOptions(cache=cache), x=int)
+        def second(x):
+            return x
+
+
+def test_unknown_cache():
+    registry = Registry()
+    with pytest.raises(Exception):
+        registry.get_cache_info("test_cache.missing")
+    with pytest.raises(Exception):
+        registry.invalidate_cache("test_cache.missing")
+
+
+def _wait_for_shared(single_flight, count):
+    deadline = time.time() + 5
+    while single_flight.info().shared < count:
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def _run_concurrently(single_flight, func, count):
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(("result", single_flight.call("key", func)))
+        except ValueError as exc:
+            outcomes.append(("error", exc))
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_single_flight_shares_result():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait()
+        return [42]
+
+    threads, outcomes = _run_concurrently(single_flight, slow, 5)
+    _wait_for_shared(single_flight, 4)
+    assert single_flight.info() == SingleFlightInfo(executions=1, shared=4, in_flight=1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert outcomes == [("result", [42])] * 5
+    assert single_flight.call("key", lambda: 7) == 7
+    assert single_flight.info() == SingleFlightInfo(executions=2, shared=4, in_flight=0)
+
+
+def test_single_flight_shares_error():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("failed", 1)
+
+    threads, outcomes = _run_concurrently(single_flight, fail, 3)
+    _wait_for_shared(single_flight, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [kind for kind, _ in outcomes] == ["error"] * 3
+    assert all(exc.args == ("failed", 1) for _, exc in outcomes)
+    assert len(set(id(exc) for _, exc in outcomes)) == 3
@@ -0,0 +1,95 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+
+import pytest
+
+from typedjsonrpc.codec import Codec, JsonCodec, OrjsonCodec, UjsonCodec, get_available_codecs
+from typedjsonrpc.registry import Registry
+
+MESSAGE = {"jsonrpc": "2.0", "id": 1, "result": [u"été", 42, 4.2, None, True]}
+
+
+def test_json_codec():
+    codec = JsonCodec()
+    encoded = codec.encode(MESSAGE)
+    assert isinstance(encoded, bytes)
+    assert codec.decode(encoded) == MESSAGE
+    with pytest.raises(codec.encode_errors):
+        codec.encode(object())
+    with pytest.raises(codec.decode_errors):
+        codec.decode(b"{ not json }")
+
+
+def test_json_codec_custom_encoder():
+    class SetEncoder(json.JSONEncoder):
+        def default(self, o):
+            if isinstance(o, set):
+                return sorted(o)
+            return super(SetEncoder, self).default(o)
+
+    codec = JsonCodec(encoder=SetEncoder())
+    assert codec.decode(codec.encode({"values": {3, 1, 2}})) == {"values": [1, 2, 3]}
+
+
+@pytest.mark.parametrize("codec_type", [OrjsonCodec, UjsonCodec])
+def test_optional_codecs(codec_type):
+    try:
+        codec = codec_type()
+    except ImportError:
+        pytest.skip("{} is not installed".format(codec_type.name))
+    encoded = codec.encode(MESSAGE)
+    assert isinstance(encoded, bytes)
+    assert codec.decode(encoded) == MESSAGE
+    assert JsonCodec().decode(encoded) == MESSAGE
+    with pytest.raises(codec.decode_errors):
+        codec.decode(b"{ not json }")
+
+
+def test_get_available_codecs():
+    codecs = get_available_codecs()
+    assert isinstance(codecs[0], JsonCodec)
+    assert all(isinstance(codec, Codec) for codec in codecs)
+
+
+def test_registry_codec(create_request):
+    class UpperCaseCodec(JsonCodec):
+        def encode(self, obj):
+            return super(UpperCaseCodec, self).encode(obj).upper()
+
+    registry = Registry(codec=UpperCaseCodec())
+
+    @registry.method(returns=str)
+    def foo():
+        return "bar"
+
+    response = registry.dispatch(create_request({
+        "jsonrpc": "2.0",
+        "method": "test_codec.foo",
+        "id": "baz",
+    }))
+    assert json.loads(response) == {"JSONRPC": "2.0", "ID": "BAZ", "RESULT": "BAR"}
+
+
+def test_registry_default_codec_follows_encoder():
+    registry = Registry()
+    assert registry.codec.encoder is registry.json_encoder
+
+    registry.json_encoder = json.JSONEncoder(sort_keys=True)
+    assert registry.codec.encoder is registry.json_encoder
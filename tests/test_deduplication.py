@@ -0,0 +1,69 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+from typedjsonrpc.deduplication import deduplicate_messages, iter_shared_results, share_results
+
+
+def _get_key(message):
+    return message["method"] if message["method"] != "unique" else None
+
+
+def test_deduplicate_messages():
+    messages = [{"method": "foo", "id": 1},
+                {"method": "unique", "id": 2},
+                {"method": "foo", "id": 3},
+                {"method": "unique", "id": 4}]
+    unique_messages, sources = deduplicate_messages(messages, _get_key)
+    assert unique_messages == messages[:2] + messages[3:]
+    assert sources == [0, 1, 0, 2]
+
+
+def test_deduplicate_messages_prefers_requests():
+    messages = [{"method": "foo"}, {"method": "foo", "id": 1}]
+    unique_messages, sources = deduplicate_messages(messages, _get_key)
+    assert unique_messages == [messages[1]]
+    assert sources == [0, 0]
+
+
+def test_share_results():
+    messages = [{"method": "foo", "id": 1}, {"method": "foo"}, {"method": "foo", "id": 3}]
+    unique_messages, sources = deduplicate_messages(messages, _get_key)
+    results = share_results(messages, unique_messages, sources, [{"id": 1, "result": 5}])
+    assert results == [{"id": 1, "result": 5}, None, {"id": 3, "result": 5}]
+
+
+def test_share_results_without_duplicates():
+    messages = [{"method": "unique", "id": 1}]
+    unique_results = [{"id": 1, "result": 5}]
+    assert share_results(messages, messages, [0], unique_results) is unique_results
+
+
+def test_iter_shared_results_is_lazy():
+    messages = [{"method": "foo", "id": 1}, {"method": "unique", "id": 2},
+                {"method": "unique", "id": 3}]
+    unique_messages, sources = deduplicate_messages(messages, _get_key)
+    consumed = []
+
+    def _produce():
+        for message in unique_messages:
+            consumed.append(message["id"])
+            yield {"id": message["id"]}
+
+    results = iter_shared_results(messages, unique_messages, sources, _produce())
+    assert next(results) == {"id": 1}
+    assert consumed == [1]
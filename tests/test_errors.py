@@ -19,7 +19,9 @@ from __future__ import absolute_import, division, print_function
 import json
 import sys
 
-from typedjsonrpc.errors import Error, InternalError, get_status_code_from_error_code
+from typedjsonrpc.errors import (Error, InternalError, InvalidParamsError, OverloadedError,
+                                 ServerError, get_error_from_error_object,
+                                 get_status_code_from_error_code)
 
 
 class TestInternalError(object):
@@ -49,3 +51,31 @@ def test_get_status_code_from_error_code():
     for type_ in [Error] + Error.__subclasses__():
         status_code = get_status_code_from_error_code(type_.code)
         assert type_.status_code == status_code
+
+
+def test_get_status_code_from_error_code_subclass():
+    assert get_status_code_from_error_code(OverloadedError.code) == 503
+    assert get_status_code_from_error_code(ServerError.code) == 500
+
+
+def test_get_error_from_error_object():
+    error = get_error_from_error_object(InvalidParamsError({"foo": 1}).as_error_object())
+    assert type(error) is InvalidParamsError
+    assert error.data == {"foo": 1}
+
+    error = get_error_from_error_object({"code": 12, "message": "Custom", "data": None})
+    assert type(error) is Error
+    assert error.as_error_object() == {"code": 12, "message": "Custom", "data": None}
+
+
+def test_from_data():
+    class CustomError(Error):
+        code = 12
+        message = "Custom"
+
+        def __init__(self, user_id):
+            super(CustomError, self).__init__({"user_id": user_id})
+
+    error = CustomError.from_data({"user_id": 5})
+    assert type(error) is CustomError
+    assert error.as_error_object() == {"code": 12, "message": "Custom", "data": {"user_id": 5}}
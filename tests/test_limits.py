@@ -0,0 +1,159 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import threading
+import time
+
+import pytest
+
+from typedjsonrpc.errors import OverloadedError
+from typedjsonrpc.limits import AdaptiveLimiter, AdaptiveLimiterInfo, Bulkhead, BulkheadInfo
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.registry import Registry
+
+
+def _wait_until(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def test_bulkhead():
+    bulkhead = Bulkhead(max_concurrent=2)
+    assert bulkhead.acquire()
+    assert bulkhead.acquire()
+    assert not bulkhead.acquire()
+    bulkhead.release()
+    assert bulkhead.acquire()
+    assert bulkhead.info() == BulkheadInfo(active=2, waiting=0, rejected=1, max_concurrent=2,
+                                           max_waiting=0)
+
+
+def test_bulkhead_waiting():
+    bulkhead = Bulkhead(max_concurrent=1, max_waiting=1)
+    assert bulkhead.acquire()
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(bulkhead.acquire()))
+    thread.start()
+    _wait_until(lambda: bulkhead.info().waiting == 1)
+
+    assert not bulkhead.acquire()
+    assert not bulkhead.acquire(blocking=False)
+    bulkhead.release()
+    thread.join()
+    assert acquired == [True]
+    assert bulkhead.info() == BulkheadInfo(1, 0, 2, 1, 1)
+
+
+def test_bulkhead_timeout():
+    bulkhead = Bulkhead(max_concurrent=1, max_waiting=1, timeout=0.01)
+    assert bulkhead.acquire()
+    assert not bulkhead.acquire()
+    assert bulkhead.info().rejected == 1
+
+
+def test_invalid_bulkhead():
+    with pytest.raises(ValueError):
+        Bulkhead(max_concurrent=0)
+
+
+def test_registry_bulkhead(create_request):
+    registry = Registry()
+    bulkhead = Bulkhead(max_concurrent=1)
+    release = threading.Event()
+
+    @registry.method(returns=int, options=MethodOptions(bulkhead=bulkhead), x=int)
+    def slow(x):
+        release.wait()
+        return x
+
+    @registry.method(returns=int, options=MethodOptions(bulkhead=bulkhead), x=int)
+    def fast(x):
+        return x
+
+    def request(method, msg_id):
+        return create_request({"jsonrpc": "2.0", "method": "test_limits." + method,
+                               "params": [msg_id], "id": msg_id})
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(registry.dispatch_response(request("slow", 1))))
+    thread.start()
+    _wait_until(lambda: bulkhead.info().active == 1)
+
+    for method in ["slow", "fast"]:
+        result = registry.dispatch_response(request(method, 2))
+        assert result.status_code == 503
+        response = json.loads(result.body)
+        assert response["error"]["code"] == OverloadedError.code
+        assert response["error"]["data"] == "Too many concurrent calls to 'test_limits.{}'".format(
+            method)
+
+    release.set()
+    thread.join()
+    assert json.loads(results[0].body)["result"] == 1
+    assert json.loads(registry.dispatch(request("fast", 3)))["result"] == 3
+    assert bulkhead.info().active == 0
+
+
+def test_adaptive_limiter_rejects_beyond_limit(clock):
+    limiter = AdaptiveLimiter(latency_threshold=1, initial_limit=2, clock=clock)
+    tokens = [limiter.acquire(), limiter.acquire()]
+    assert None not in tokens
+    assert limiter.acquire() is None
+    assert limiter.info() == AdaptiveLimiterInfo(limit=2, in_flight=2, rejected=1)
+
+
+def test_adaptive_limiter_increases_when_fast_and_busy(clock):
+    limiter = AdaptiveLimiter(latency_threshold=1, initial_limit=4, max_limit=5, clock=clock)
+    tokens = [limiter.acquire() for _ in range(2)]
+    clock.now = 0.5
+    limiter.release(tokens[0])
+    assert limiter.info().limit == 5
+    limiter.release(tokens[1])
+    assert limiter.info().limit == 5
+
+    token = limiter.acquire()
+    limiter.release(token)
+    assert limiter.info() == AdaptiveLimiterInfo(limit=5, in_flight=0, rejected=0)
+
+
+def test_adaptive_limiter_backs_off_when_slow(clock):
+    limiter = AdaptiveLimiter(latency_threshold=1, initial_limit=10, min_limit=4,
+                              backoff_ratio=0.5, clock=clock)
+    tokens = [limiter.acquire() for _ in range(3)]
+    clock.now = 2
+    limiter.release(tokens[0])
+    assert limiter.info().limit == 5
+    limiter.release(tokens[1])
+    assert limiter.info().limit == 4
+    limiter.release(tokens[2])
+    assert limiter.info() == AdaptiveLimiterInfo(limit=4, in_flight=0, rejected=0)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"initial_limit": 0},
+    {"initial_limit": 5, "min_limit": 6},
+    {"initial_limit": 5, "max_limit": 4},
+    {"backoff_ratio": 1},
+])
+def test_invalid_adaptive_limiter(kwargs):
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(latency_threshold=1, **kwargs)
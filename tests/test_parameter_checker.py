@@ -19,7 +19,8 @@ from __future__ import absolute_import, division, print_function
 import pytest
 
 import typedjsonrpc.parameter_checker as parameter_checker
-from typedjsonrpc.errors import InvalidParamsError
+from typedjsonrpc.errors import InvalidParamsError, InvalidReturnTypeError
+from typedjsonrpc.method_info import CallPlan
 
 
 def test_list():
@@ -89,6 +90,22 @@ def test_no_defaults():
         parameter_checker.validate_params_match(foo, {"a": "bar", "b": "baz"})
 
 
+def test_call_plan():
+    def foo(a, b, c="baz", *args):
+        pass
+    call_plan = CallPlan.create(foo)
+
+    with pytest.raises(InvalidParamsError):
+        parameter_checker.check_params_match(call_plan, ["foo"])
+    parameter_checker.check_params_match(call_plan, ["foo", "bar", "bop", 42])
+
+    with pytest.raises(InvalidParamsError):
+        parameter_checker.check_params_match(call_plan, {"a": "foo", "c": "bar"})
+    with pytest.raises(InvalidParamsError):
+        parameter_checker.check_params_match(call_plan, {"a": "foo", "b": "bar", "d": 42})
+    parameter_checker.check_params_match(call_plan, {"a": "foo", "b": "bar"})
+
+
 class TestIsInstance(object):
     def test_strict_floats(self):
         assert parameter_checker._is_instance(1.0, float, strict_floats=True)
@@ -101,3 +118,45 @@ class TestIsInstance(object):
         assert parameter_checker._is_instance(1, float, strict_floats=False)
         # This is a long in Python 2
         assert parameter_checker._is_instance(1000000000000000000000, float, strict_floats=False)
+
+
+class TestParameterValidator(object):
+    @staticmethod
+    def _create_validator(strict_floats=True):
+        def foo(a, b, c=1.0, *args, **kwargs):
+            pass
+        call_plan = CallPlan.create(foo, {"a": str, "b": int, "c": float})
+        return parameter_checker.create_parameter_validator(call_plan, strict_floats)
+
+    def test_binds_values(self):
+        validate = self._create_validator()
+        assert validate(("foo", 42), {}) == ("foo", 42, 1.0)
+        assert validate(("foo",), {"b": 42, "c": 2.0}) == ("foo", 42, 2.0)
+        assert validate(("foo", 42, 2.0, "extra"), {"other": None}) == ("foo", 42, 2.0)
+
+    def test_missing(self):
+        validate = self._create_validator()
+        with pytest.raises(InvalidParamsError) as excinfo:
+            validate(("foo",), {})
+        assert excinfo.value.data == "Parameter 'b' is missing."
+
+    def test_wrong_type(self):
+        validate = self._create_validator()
+        with pytest.raises(InvalidParamsError):
+            validate((42, 42), {})
+        with pytest.raises(InvalidParamsError):
+            validate(("foo", 42, 1), {})
+
+    def test_non_strict_floats(self):
+        validate = self._create_validator(strict_floats=False)
+        assert validate(("foo", 42, 1), {}) == ("foo", 42, 1)
+        with pytest.raises(InvalidParamsError):
+            validate(("foo", 4.2), {})
+
+    def test_return_validator(self):
+        parameter_checker.create_return_validator(None, True)(None)
+        with pytest.raises(InvalidReturnTypeError):
+            parameter_checker.create_return_validator(None, True)(42)
+        parameter_checker.create_return_validator(float, False)(42)
+        with pytest.raises(InvalidReturnTypeError):
+            parameter_checker.create_return_validator(float, True)(42)
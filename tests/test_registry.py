@@ -16,15 +16,45 @@
 
 from __future__ import absolute_import, division, print_function
 
+import io
 import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import mock
 import pytest
 import six
 
-from typedjsonrpc.errors import (InternalError, InvalidParamsError, InvalidRequestError,
-                                 InvalidReturnTypeError, MethodNotFoundError, ParseError)
-from typedjsonrpc.registry import Registry
+from typedjsonrpc import context
+from typedjsonrpc.errors import (DeadlineExceededError, InternalError, InvalidParamsError,
+                                 InvalidRequestError, InvalidReturnTypeError, MethodNotFoundError,
+                                 MethodTimeoutError, ParseError)
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.registry import DispatchResult, Registry
+
+process_registry = Registry(process_executor=ProcessPoolExecutor(max_workers=1))
+
+
+@process_registry.method(returns=int, options=MethodOptions(executor="process"), x=int)
+def get_pid_plus(x):
+    return os.getpid() + x
+
+
+@process_registry.method(returns=int, options=MethodOptions(executor="process"))
+def raise_in_process():
+    raise ValueError("Failed in worker")
+
+
+@process_registry.method(returns=int, options=MethodOptions(executor="process"))
+def raise_error_in_process():
+    raise InvalidParamsError("Not in the worker")
+
+
+@process_registry.method(returns=int, options=MethodOptions(executor="process"))
+def return_wrong_type_in_process():
+    return "42"
 
 
 def test_register():
@@ -79,6 +109,22 @@ def test_method_correct_argtypes():
     assert stuff(42, "Answer") == "42Answer"
 
 
+def test_method_parameters_named_like_options():
+    registry = Registry()
+
+    @registry.method(returns=int, timeout=int, executor=int, options=int)
+    def add(timeout, executor, options):
+        return timeout + executor + options
+    assert add(1, 2, 3) == 6
+    with pytest.raises(InvalidParamsError):
+        add(1, 2, "3")
+
+    @registry.method(returns=int, options=MethodOptions(priority=1), timeout=int)
+    def identity(timeout):
+        return timeout
+    assert identity(4) == 4
+
+
 def test_method_args():
     registry = Registry()
 
@@ -105,6 +151,51 @@ def test_method_defaults():
     assert foo(5, "Hello") == "Hello"
 
 
+def test_method_call_plan():
+    registry = Registry()
+
+    @registry.method(returns=str, some_number=int, some_text=str)
+    def foo(some_number, some_text="Test", *args):
+        return some_text
+    call_plan = registry._name_to_method_info["test_registry.foo"].call_plan
+    assert call_plan.arg_names == ("some_number", "some_text")
+    assert call_plan.arg_indexes == {"some_number": 0, "some_text": 1}
+    assert call_plan.defaults == {"some_text": "Test"}
+    assert call_plan.required_names == ("some_number",)
+    assert call_plan.has_varargs
+    assert not call_plan.has_kwargs
+    assert call_plan.parameter_types == (("some_number", int), ("some_text", str))
+
+
+def test_method_process_executor():
+    assert get_pid_plus(1) not in (os.getpid() + 1, 1)
+    with pytest.raises(InvalidParamsError):
+        get_pid_plus("1")
+    with pytest.raises(InvalidReturnTypeError):
+        return_wrong_type_in_process()
+
+    with pytest.raises(InvalidParamsError) as excinfo:
+        raise_error_in_process()
+    assert excinfo.value.data == "Not in the worker"
+
+    with pytest.raises(InternalError) as excinfo:
+        raise_in_process()
+    assert "ValueError: Failed in worker" in excinfo.value.data["traceback"]
+    assert "raise_in_process" in excinfo.value.data["traceback"]
+
+
+def test_method_process_executor_invalid():
+    with pytest.raises(Exception):
+        Registry().method(returns=int, options=MethodOptions(executor="process"))
+    with pytest.raises(Exception):
+        Registry().method(returns=int, options=MethodOptions(executor="bogus"))
+
+    with pytest.raises(Exception):
+        @process_registry.method(returns=int, options=MethodOptions(executor="process"))
+        def nested():
+            return 42
+
+
 def test_method_wrong_type_declarations():
     registry = Registry()
 
@@ -258,6 +349,24 @@ class TestDispatch(object):
             "result": 3
         })
 
+    def test_no_introspection_on_dispatch(self):
+        registry = Registry()
+
+        @registry.method(returns=int, x=int, y=int)
+        def add(x, y):
+            return x + y
+
+        fake_request = self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "test_registry.add",
+            "params": [1, 2],
+            "id": "bogus",
+        })
+        with mock.patch("typedjsonrpc.method_info.inspect") as mock_inspect:
+            response = registry.dispatch(fake_request)
+        assert json.loads(response)["result"] == 3
+        assert not mock_inspect.mock_calls
+
     def test_invalid_method(self):
         registry = Registry()
 
@@ -596,6 +705,22 @@ class TestDispatch(object):
         fake_request = self._create_fake_request(json_data)
         assert registry.dispatch(fake_request) is None
 
+    def test_batched_input_failed_notification(self):
+        registry = Registry()
+
+        fake_request = self._create_fake_request([{
+            "jsonrpc": "2.0",
+            "method": "bogus",
+        }, {
+            "jsonrpc": "2.0",
+            "method": "rpc.describe",
+            "id": 1,
+        }])
+        response = json.loads(registry.dispatch(fake_request))
+        assert len(response) == 1
+        assert response[0]["id"] == 1
+        assert "result" in response[0]
+
     def test_batched_input_empty_array(self):
         registry = Registry()
 
@@ -606,6 +731,477 @@ class TestDispatch(object):
         fake_request = self._create_fake_request([])
         assert registry.dispatch(fake_request) is None
 
+    def test_batched_input_executor(self):
+        executor = ThreadPoolExecutor(max_workers=4)
+        registry = Registry(executor=executor)
+
+        @registry.method(returns=int, x=int, delay=float)
+        def slow_identity(x, delay):
+            time.sleep(delay)
+            return x
+
+        json_data = [{
+            "jsonrpc": "2.0",
+            "method": "test_registry.slow_identity",
+            "params": [i, 0.05 if i % 2 == 0 else 0.0],
+            "id": i,
+        } for i in range(6)]
+        json_data.append({
+            "jsonrpc": "2.0",
+            "method": "test_registry.slow_identity",
+            "params": [42, 0.0],
+        })
+        json_data.append({
+            "jsonrpc": "2.0",
+            "method": "test_registry.slow_identity",
+            "params": ["wrong", 0.0],
+            "id": 6,
+        })
+
+        fake_request = self._create_fake_request(json_data)
+        response = json.loads(registry.dispatch(fake_request))
+        executor.shutdown()
+
+        assert [msg["id"] for msg in response] == list(range(7))
+        assert [msg["result"] for msg in response[:6]] == list(range(6))
+        TestDispatch.assert_error(response[6], 6, InvalidParamsError)
+
+    def test_batched_input_executor_parallelism(self):
+        executor = ThreadPoolExecutor(max_workers=8)
+        registry = Registry(executor=executor, max_batch_parallelism=2)
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        @registry.method(returns=None)
+        def tracked():
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+        fake_request = self._create_fake_request([{
+            "jsonrpc": "2.0",
+            "method": "test_registry.tracked",
+            "id": i,
+        } for i in range(10)])
+        response = json.loads(registry.dispatch(fake_request))
+        executor.shutdown()
+
+        assert len(response) == 10
+        assert max_in_flight[0] == 2
+
+    def test_coalesce_calls(self):
+        registry = Registry(coalesce_calls=True)
+        release = threading.Event()
+        calls = []
+
+        @registry.method(returns=int, x=int)
+        def slow_double(x):
+            calls.append(x)
+            release.wait()
+            if x < 0:
+                raise InvalidParamsError("negative")
+            return x * 2
+
+        responses = []
+
+        def dispatch(msg_id, x):
+            fake_request = self._create_fake_request({
+                "jsonrpc": "2.0",
+                "method": "test_registry.slow_double",
+                "params": [x],
+                "id": msg_id,
+            })
+            responses.append(json.loads(registry.dispatch(fake_request)))
+
+        threads = [threading.Thread(target=dispatch, args=(i, -1 if i % 2 else 3))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while registry.get_coalescing_info().shared < 4:
+            assert time.time() < deadline
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(calls) == [-1, 3]
+        assert registry.get_coalescing_info().executions == 2
+        for response in responses:
+            if response["id"] % 2:
+                self.assert_error(response, response["id"], InvalidParamsError)
+                assert response["error"]["data"] == "negative"
+            else:
+                assert response["result"] == 6
+
+    def test_coalesce_calls_disabled(self):
+        registry = Registry()
+        with pytest.raises(Exception):
+            registry.get_coalescing_info()
+
+    def test_batched_input_idempotent(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=int, options=MethodOptions(idempotent=True), x=int)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        @registry.method(returns=int, x=int)
+        def increment(x):
+            calls.append(x)
+            return x + 1
+
+        fake_request = self._create_fake_request([
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2]},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2], "id": 1},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [3], "id": 2},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2], "id": 3},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": ["a"], "id": 4},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": ["a"], "id": 5},
+            {"jsonrpc": "2.0", "method": "test_registry.increment", "params": [2], "id": 6},
+            {"jsonrpc": "2.0", "method": "test_registry.increment", "params": [2], "id": 7},
+        ])
+        response = json.loads(registry.dispatch(fake_request))
+
+        assert calls == [2, 3, 2, 2]
+        assert [(item["id"], item.get("result")) for item in response] == [
+            (1, 4), (2, 9), (3, 4), (4, None), (5, None), (6, 3), (7, 3)]
+        self.assert_error(response[3], 4, InvalidParamsError)
+        self.assert_error(response[4], 5, InvalidParamsError)
+        assert registry.deduplicated_calls == 3
+
+    def test_batched_input_idempotent_invalid_twins(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=int, options=MethodOptions(idempotent=True), x=int)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        fake_request = self._create_fake_request([
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2], "id": 1},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2], "id": 1.5},
+            {"jsonrpc": "2.0", "method": "test_registry.square", "params": [2], "id": None},
+            {"jsonrpc": "1.0", "method": "test_registry.square", "params": [2], "id": 2},
+        ])
+        response = json.loads(registry.dispatch(fake_request))
+
+        assert calls == [2]
+        assert response[0] == {"jsonrpc": "2.0", "id": 1, "result": 4}
+        self.assert_error(response[1], 1.5, InvalidRequestError)
+        self.assert_error(response[2], None, InvalidRequestError)
+        self.assert_error(response[3], 2, InvalidRequestError)
+        assert registry.deduplicated_calls == 0
+
+    def test_batched_input_idempotent_notifications(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=None, options=MethodOptions(idempotent=True))
+        def ping():
+            calls.append(1)
+
+        fake_request = self._create_fake_request([
+            {"jsonrpc": "2.0", "method": "test_registry.ping"},
+            {"jsonrpc": "2.0", "method": "test_registry.ping"},
+        ])
+        assert registry.dispatch(fake_request) is None
+        assert calls == [1]
+        assert registry.deduplicated_calls == 1
+
+    def test_method_timeout(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        registry = Registry(timeout_executor=executor, default_timeout=5)
+        release = threading.Event()
+
+        @registry.method(returns=int, options=MethodOptions(timeout=0.01), x=int)
+        def stuck(x):
+            release.wait()
+            return x
+
+        @registry.method(returns=int, x=int)
+        def fast(x):
+            return x
+
+        def request(method):
+            return self._create_fake_request({
+                "jsonrpc": "2.0",
+                "method": "test_registry." + method,
+                "params": [1],
+                "id": 1,
+            })
+
+        result = registry.dispatch_response(request("stuck"))
+        release.set()
+        assert result.status_code == 504
+        self.assert_error(result.body, 1, MethodTimeoutError)
+        assert registry.timed_out_calls == 1
+        assert json.loads(registry.dispatch(request("fast")))["result"] == 1
+        assert registry.timed_out_calls == 1
+        executor.shutdown()
+
+    def test_expired_deadline(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=int, x=int)
+        def record(x):
+            calls.append(x)
+            return x
+
+        fake_request = self._create_fake_request([
+            {"jsonrpc": "2.0", "method": "test_registry.record", "params": [1], "id": 1},
+            {"jsonrpc": "2.0", "method": "test_registry.record", "params": [2]},
+            {"jsonrpc": "2.0", "id": 3},
+        ])
+        context.set_deadline(time.time() - 1)
+        try:
+            responses = json.loads(registry.dispatch(fake_request))
+        finally:
+            context.set_deadline(None)
+        assert calls == []
+        assert len(responses) == 2
+        self.assert_error(json.dumps(responses[0]), 1, DeadlineExceededError)
+        self.assert_error(json.dumps(responses[1]), 3, InvalidRequestError)
+
+    def test_remaining_time(self):
+        registry = Registry()
+
+        @registry.method(returns=bool)
+        def has_time():
+            return 0 < context.get_remaining_time() <= 10
+
+        fake_request = self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "test_registry.has_time",
+            "id": 1,
+        })
+        assert context.get_remaining_time() is None
+        context.set_deadline(time.time() + 10)
+        try:
+            assert json.loads(registry.dispatch(fake_request))["result"] is True
+        finally:
+            context.set_deadline(None)
+
+    def test_method_timeout_capped_by_deadline(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        registry = Registry(timeout_executor=executor)
+        release = threading.Event()
+
+        @registry.method(returns=int, options=MethodOptions(timeout=5))
+        def stuck():
+            release.wait()
+            return 1
+
+        fake_request = self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "test_registry.stuck",
+            "id": 1,
+        })
+        context.set_deadline(time.time() + 0.01)
+        try:
+            result = registry.dispatch_response(fake_request)
+        finally:
+            context.set_deadline(None)
+            release.set()
+        assert result.status_code == 504
+        self.assert_error(result.body, 1, DeadlineExceededError)
+        executor.shutdown()
+
+    def test_method_timeout_requires_executor(self):
+        registry = Registry()
+        with pytest.raises(Exception):
+            @registry.method(returns=int, options=MethodOptions(timeout=1))
+            def foo():
+                return 1
+
+    def test_dispatch_response(self):
+        registry = Registry()
+
+        @registry.method(returns=int)
+        def foo():
+            return 42
+
+        result = registry.dispatch_response(self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "test_registry.foo",
+            "id": 1,
+        }))
+        assert json.loads(result.body)["result"] == 42
+        assert result == DispatchResult(result.chunks, False, None)
+        assert result.content_length == len(result.body)
+        assert result.status_code == 200
+
+        result = registry.dispatch_response(self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "bogus",
+            "id": 1,
+        }))
+        assert result.error_code == MethodNotFoundError.code
+        assert result.status_code == 404
+
+        result = registry.dispatch_response(self._create_fake_request([{
+            "jsonrpc": "2.0",
+            "method": "bogus",
+            "id": 1,
+        }, {
+            "jsonrpc": "2.0",
+            "method": "bogus",
+            "id": 2,
+        }]))
+        assert result.is_batch
+        assert result.error_code is None
+        assert len(json.loads(result.body)) == 2
+        assert all(isinstance(chunk, bytes) for chunk in result.chunks)
+        assert result.status_code == 200
+
+        result = registry.dispatch_response(self._create_fake_request({
+            "jsonrpc": "2.0",
+            "method": "test_registry.foo",
+        }))
+        assert result == DispatchResult(None, False, None)
+        assert result.status_code == 204
+
+    def test_dispatch_response_stream(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=int, options=MethodOptions(idempotent=True), x=int)
+        def identity(x):
+            calls.append(x)
+            return x
+
+        fake_request = self._create_fake_request([
+            {"jsonrpc": "2.0", "method": "test_registry.identity", "params": [1], "id": 1},
+            {"jsonrpc": "2.0", "method": "test_registry.identity", "params": [2]},
+            {"jsonrpc": "2.0", "method": "test_registry.identity", "params": [1], "id": 3},
+            {"jsonrpc": "2.0", "method": "test_registry.identity", "params": [4], "id": 4},
+            {"jsonrpc": "2.0", "method": "test_registry.missing", "id": 5},
+        ])
+        result = registry.dispatch_response(fake_request, stream=True)
+        assert result.is_batch and result.status_code == 200
+        assert result.content_length is None
+        assert calls == []
+
+        chunks = iter(result.chunks)
+        assert next(chunks) == b"["
+        assert json.loads(next(chunks).decode("utf-8"))["result"] == 1
+        assert calls == [1]
+        rest = b"".join(chunks)
+        assert calls == [1, 2, 4]
+
+        response = json.loads("[" + rest[1:].decode("utf-8"))
+        assert [item["id"] for item in response] == [3, 4, 5]
+        assert [item.get("result") for item in response] == [1, 4, None]
+        self.assert_error(response[2], 5, MethodNotFoundError)
+
+    def test_dispatch_response_stream_single(self):
+        registry = Registry()
+
+        @registry.method(returns=int)
+        def one():
+            return 1
+
+        fake_request = self._create_fake_request(
+            {"jsonrpc": "2.0", "method": "test_registry.one", "id": 1})
+        result = registry.dispatch_response(fake_request, stream=True)
+        assert isinstance(result.chunks, list)
+        assert json.loads(result.body)["result"] == 1
+
+    @staticmethod
+    def _create_fake_stream_request(data):
+        class FakeStreamRequest(object):
+            stream = io.BytesIO(data)
+
+            def get_data(self, as_text=False):
+                raise AssertionError("The body should be read from the stream")
+        return FakeStreamRequest()
+
+    def test_dispatch_response_incremental(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=int, x=int)
+        def identity(x):
+            calls.append(x)
+            return x
+
+        batch = [{"jsonrpc": "2.0", "method": "test_registry.identity", "params": [i], "id": i}
+                 for i in range(3)]
+        data = json.dumps(batch).encode("utf-8")
+        fake_request = self._create_fake_stream_request(data[:-1] + b', {"id": ]')
+
+        result = registry.dispatch_response(fake_request, incremental=True)
+        assert result.is_batch and result.content_length is None
+        chunks = iter(result.chunks)
+        assert next(chunks) == b"["
+        assert json.loads(next(chunks).decode("utf-8"))["result"] == 0
+        assert calls == [0]
+        response = json.loads((b"[" + b"".join(chunks)[1:]).decode("utf-8"))
+        assert calls == [0, 1, 2]
+        assert [item.get("result") for item in response] == [1, 2, None]
+        self.assert_error(response[2], None, ParseError)
+
+    def test_dispatch_response_incremental_notifications(self):
+        registry = Registry()
+        calls = []
+
+        @registry.method(returns=None, x=int)
+        def notify(x):
+            calls.append(x)
+
+        batch = [{"jsonrpc": "2.0", "method": "test_registry.notify", "params": [i]}
+                 for i in range(3)]
+        fake_request = self._create_fake_stream_request(json.dumps(batch).encode("utf-8"))
+        result = registry.dispatch_response(fake_request, incremental=True)
+        assert result.chunks is None
+        assert result.status_code == 204
+        assert calls == [0, 1, 2]
+
+    def test_dispatch_response_incremental_single(self):
+        registry = Registry()
+
+        @registry.method(returns=int)
+        def one():
+            return 1
+
+        for data in [{"jsonrpc": "2.0", "method": "test_registry.one", "id": 1},
+                     [{"jsonrpc": "2.0", "method": "test_registry.one", "id": 1}]]:
+            fake_request = self._create_fake_stream_request(json.dumps(data).encode("utf-8"))
+            result = registry.dispatch_response(fake_request, incremental=True)
+            assert json.loads(result.body) == {"jsonrpc": "2.0", "id": 1, "result": 1}
+
+        fake_request = self._create_fake_stream_request(b"[{")
+        result = registry.dispatch_response(fake_request, incremental=True)
+        assert result.status_code == 400
+        self.assert_error(result.body, None, ParseError)
+
+    def test_dispatch_response_encoder_exception(self):
+        registry = Registry()
+        original_encode = registry.json_encoder.encode
+
+        def fake_encode(input):
+            if "result" in input:
+                raise InternalError("Could not parse the input data.")
+            else:
+                return original_encode(input)
+
+        with mock.patch('typedjsonrpc.registry.Registry.json_encoder.encode', fake_encode):
+            result = registry.dispatch_response(self._create_fake_request({
+                "jsonrpc": "2.0",
+                "method": "rpc.describe",
+                "id": "foo",
+            }))
+        assert result.error_code == InternalError.code
+        assert result.status_code == 500
+
     def test_non_serializable_exception(self):
         registry = Registry()
 
@@ -0,0 +1,163 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import time
+
+import pytest
+
+from typedjsonrpc import context
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.registry import Registry
+from typedjsonrpc.scheduling import PriorityExecutor, PriorityExecutorInfo
+
+
+def _block(executor):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait()
+    executor.submit(blocker)
+    started.wait()
+    return release
+
+
+def _wait_for_queue(executor, queued):
+    for _ in range(500):
+        if executor.info().queued == queued:
+            return
+        time.sleep(0.01)
+    raise AssertionError("Expected {} queued calls, but found {}"
+                         .format(queued, executor.info().queued))
+
+
+def _wait_for_idle(executor):
+    for _ in range(500):
+        if executor.info().idle_workers:
+            return
+        time.sleep(0.01)
+    raise AssertionError("No worker became idle")
+
+
+class TestPriorityExecutor(object):
+    def test_results_and_exceptions(self):
+        executor = PriorityExecutor(max_workers=2)
+
+        def fail():
+            raise ValueError("failed")
+
+        assert executor.submit(lambda x: x + 1, 1).result() == 2
+        with pytest.raises(ValueError):
+            executor.submit(fail).result()
+        executor.shutdown()
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: 1)
+
+    def test_idle_worker_is_reused(self):
+        executor = PriorityExecutor(max_workers=4)
+        for i in range(5):
+            assert executor.submit(lambda x: x, i).result() == i
+            _wait_for_idle(executor)
+        assert executor.info().workers == 1
+        release = _block(executor)
+        assert executor.submit(lambda: 1).result() == 1
+        assert executor.info().workers == 2
+        release.set()
+        executor.shutdown()
+
+    def test_invalid_max_workers(self):
+        with pytest.raises(ValueError):
+            PriorityExecutor(max_workers=0)
+
+    def test_queue_order(self):
+        executor = PriorityExecutor(max_workers=1)
+        release = _block(executor)
+        order = []
+        for name, priority, deadline in [("bulk-1", 0, None),
+                                         ("bulk-2", 0, None),
+                                         ("later", 5, 20.0),
+                                         ("interactive", 10, None),
+                                         ("no-deadline", 5, None),
+                                         ("sooner", 5, 10.0)]:
+            executor.submit_prioritized(priority, deadline, order.append, name)
+        assert executor.info() == PriorityExecutorInfo(queued=6, workers=1, idle_workers=0,
+                                                       max_workers=1)
+        release.set()
+        executor.shutdown()
+        assert order == ["interactive", "sooner", "later", "no-deadline", "bulk-1", "bulk-2"]
+
+    def test_cancelled_call_is_skipped(self):
+        executor = PriorityExecutor(max_workers=1)
+        release = _block(executor)
+        order = []
+        future = executor.submit(order.append, 1)
+        executor.submit(order.append, 2)
+        assert future.cancel()
+        release.set()
+        executor.shutdown()
+        assert order == [2]
+
+
+class TestRegistryScheduling(object):
+    def test_mixed_load(self, create_request):
+        executor = PriorityExecutor(max_workers=1)
+        registry = Registry(executor=executor)
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        @registry.method(returns=int, item=int)
+        def export(item):
+            if item == 0:
+                started.set()
+                release.wait()
+            order.append(("export", item))
+            return item
+
+        @registry.method(returns=int, options=MethodOptions(priority=10), item=int)
+        def lookup(item):
+            order.append(("lookup", item))
+            return item
+
+        def dispatch(method, items, priority=None):
+            context.set_priority(priority)
+            registry.dispatch(create_request([{
+                "jsonrpc": "2.0",
+                "method": "test_scheduling." + method,
+                "params": [item],
+                "id": item,
+            } for item in items]))
+
+        threads = [threading.Thread(target=dispatch, args=("export", [0, 1, 2, 3]))]
+        threads[0].start()
+        started.wait()
+        _wait_for_queue(executor, 3)
+        threads.append(threading.Thread(target=dispatch, args=("lookup", [0, 1])))
+        threads[1].start()
+        _wait_for_queue(executor, 5)
+        threads.append(threading.Thread(target=dispatch, args=("export", [10, 11], 20)))
+        threads[2].start()
+        _wait_for_queue(executor, 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+        executor.shutdown()
+        assert order == [("export", 0), ("export", 10), ("export", 11), ("lookup", 0),
+                         ("lookup", 1), ("export", 1), ("export", 2), ("export", 3)]
@@ -17,16 +17,28 @@
 from __future__ import absolute_import, division, print_function
 
 import json
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 import six
 import werkzeug.debug
 from webtest import TestApp
 from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder, run_wsgi_app
 
 import typedjsonrpc.errors
-from typedjsonrpc.registry import Registry
-from typedjsonrpc.server import DebuggedJsonRpcApplication, Response, Server, current_request
+from typedjsonrpc.context import (DEADLINE_HEADER, TIMEOUT_HEADER, deadline_from_headers,
+                                  get_deadline, get_deadline_headers)
+from typedjsonrpc.limits import AdaptiveLimiter, AdaptiveLimiterInfo
+from typedjsonrpc.registry import DispatchResult, Registry
+from typedjsonrpc.server import (DebuggedJsonRpcApplication, PreforkRunner, Response, Server,
+                                 current_request)
+from typedjsonrpc.streaming import Stream
 
 if six.PY3:
     import unittest.mock as mock
@@ -96,6 +108,14 @@ class TestDebuggedJsonRpcApplication(object):
         assert werkzeug.debug.DebuggedApplication.debug_application.called
 
 
+def _create_dispatch_result(output):
+    if output is None:
+        return DispatchResult(None, False, None)
+    is_batch = isinstance(output, list)
+    error_code = None if is_batch or "result" in output else output["error"]["code"]
+    return DispatchResult([json.dumps(output).encode("utf-8")], is_batch, error_code)
+
+
 class TestServer(object):
 
     @staticmethod
@@ -103,7 +123,7 @@ class TestServer(object):
         mock_registry = mock.Mock()
         mock_registry.json_encoder = json.JSONEncoder()
         mock_registry.json_decoder = json.JSONDecoder()
-        mock_registry.dispatch.return_value = json.dumps({
+        mock_registry.dispatch_response.return_value = _create_dispatch_result({
             "jsonrpc": "2.0",
             "id": "foo",
             "result": "bar"
@@ -136,7 +156,7 @@ class TestServer(object):
         server = Server(mock_registry, "/foo")
         mock_start_response = mock.Mock()
         server(environ, mock_start_response)
-        mock_registry.dispatch.assert_called_once_with(mock.ANY)
+        mock_registry.dispatch_response.assert_called_once_with(mock.ANY)
 
     def test_before_first_request_funcs(self):
         environ = {
@@ -161,7 +181,7 @@ class TestServer(object):
 
     def test_http_status_code_empty_response(self):
         mock_registry = self._create_mock_registry()
-        mock_registry.dispatch.return_value = None
+        mock_registry.dispatch_response.return_value = _create_dispatch_result(None)
         server = Server(mock_registry, "/foo")
         app = TestApp(server)
         app.post("/foo", status=204)
@@ -175,7 +195,7 @@ class TestServer(object):
     def test_http_status_code_batched_response_half_success(self):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
-        mock_registry.dispatch.return_value = json.dumps([
+        mock_registry.dispatch_response.return_value = _create_dispatch_result([
             {
                 "jsonrpc": "2.0",
                 "id": "foo",
@@ -192,7 +212,7 @@ class TestServer(object):
     def test_http_status_code_batched_response_all_failed(self):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
-        mock_registry.dispatch.return_value = json.dumps([
+        mock_registry.dispatch_response.return_value = _create_dispatch_result([
             {
                 "jsonrpc": "2.0",
                 "id": "foo",
@@ -209,7 +229,7 @@ class TestServer(object):
     def test_http_status_code_method_not_found(self):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
-        mock_registry.dispatch.return_value = json.dumps({
+        mock_registry.dispatch_response.return_value = _create_dispatch_result({
             "jsonrpc": "2.0",
             "id": "foo",
             "error": typedjsonrpc.errors.MethodNotFoundError().as_error_object()
@@ -220,7 +240,7 @@ class TestServer(object):
     def test_http_status_code_parse_error(self):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
-        mock_registry.dispatch.return_value = json.dumps({
+        mock_registry.dispatch_response.return_value = _create_dispatch_result({
             "jsonrpc": "2.0",
             "id": "foo",
             "error": typedjsonrpc.errors.ParseError().as_error_object()
@@ -231,7 +251,7 @@ class TestServer(object):
     def test_http_status_code_invalid_request_error(self):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
-        mock_registry.dispatch.return_value = json.dumps({
+        mock_registry.dispatch_response.return_value = _create_dispatch_result({
             "jsonrpc": "2.0",
             "id": "foo",
             "error": typedjsonrpc.errors.InvalidRequestError().as_error_object()
@@ -250,7 +270,7 @@ class TestServer(object):
         mock_registry = self._create_mock_registry()
         server = Server(mock_registry, "/foo")
         for error_type in other_error_types:
-            mock_registry.dispatch.return_value = json.dumps({
+            mock_registry.dispatch_response.return_value = _create_dispatch_result({
                 "jsonrpc": "2.0",
                 "id": "foo",
                 "error": error_type().as_error_object()
@@ -258,6 +278,231 @@ class TestServer(object):
             app = TestApp(server)
             app.post("/foo", status=500)
 
+    def test_batched_response_body(self):
+        registry = Registry()
+        server = Server(registry)
+
+        @registry.method(returns=six.text_type, x=six.text_type)
+        def echo(x):
+            return x
+
+        app = TestApp(server)
+        response = app.post_json("/api", [{
+            "jsonrpc": "2.0",
+            "method": "test_server.echo",
+            "params": [u"\u00e9t\u00e9 {}".format(i)],
+            "id": i,
+        } for i in range(3)], status=200)
+        assert response.content_length == len(response.body)
+        assert [msg["result"] for msg in response.json] == [u"\u00e9t\u00e9 {}".format(i)
+                                                            for i in range(3)]
+
+    @pytest.mark.parametrize("executor", [None, ThreadPoolExecutor(max_workers=2)])
+    def test_streamed_batch(self, executor):
+        registry = Registry(executor=executor)
+        server = Server(registry, stream_batches=True)
+
+        @registry.method(returns=six.text_type, x=int)
+        def get_header(x):
+            return u"{} {}".format(current_request.headers["X-Test"], x)
+
+        environ = EnvironBuilder(path="/api", method="POST", headers={"X-Test": "foo"},
+                                 content_type="application/json",
+                                 data=json.dumps([{
+                                     "jsonrpc": "2.0",
+                                     "method": "test_server.get_header",
+                                     "params": [i],
+                                     "id": i,
+                                 } for i in range(5)] + [{
+                                     "jsonrpc": "2.0",
+                                     "method": "test_server.get_header",
+                                     "params": [5],
+                                 }])).get_environ()
+        app_iter, status, headers = run_wsgi_app(server, environ)
+        assert status == "200 OK"
+        assert "Content-Length" not in headers
+        body = b"".join(app_iter).decode("utf-8")
+        assert [msg["result"] for msg in json.loads(body)] == ["foo {}".format(i)
+                                                               for i in range(5)]
+
+    def test_incremental_batch(self):
+        registry = Registry()
+        server = Server(registry, incremental_batches=True)
+
+        @registry.method(returns=int, x=int)
+        def double(x):
+            return 2 * x
+
+        app = TestApp(server)
+        response = app.post_json("/api", [{
+            "jsonrpc": "2.0",
+            "method": "test_server.double",
+            "params": [i],
+            "id": i,
+        } for i in range(3)], status=200)
+        assert [msg["result"] for msg in response.json] == [0, 2, 4]
+
+    def test_streamed_batch_notifications(self):
+        registry = Registry()
+        server = Server(registry, stream_batches=True)
+        calls = []
+
+        @registry.method(returns=None)
+        def ping():
+            calls.append(1)
+
+        app = TestApp(server)
+        app.post_json("/api", [{"jsonrpc": "2.0", "method": "test_server.ping"}] * 2, status=204)
+        assert calls == [1, 1]
+
+    def test_streamed_result(self):
+        registry = Registry()
+        server = Server(registry)
+
+        @registry.method(returns=Stream(six.text_type), count=int)
+        def get_headers(count):
+            for _ in range(count):
+                yield current_request.headers["X-Test"]
+
+        environ = EnvironBuilder(path="/api", method="POST", headers={"X-Test": "foo"},
+                                 content_type="application/json",
+                                 data=json.dumps({
+                                     "jsonrpc": "2.0",
+                                     "method": "test_server.get_headers",
+                                     "params": [3],
+                                     "id": 1,
+                                 })).get_environ()
+        app_iter, status, headers = run_wsgi_app(server, environ)
+        assert status == "200 OK"
+        assert "Content-Length" not in headers
+        body = b"".join(app_iter).decode("utf-8")
+        assert json.loads(body)["result"] == ["foo"] * 3
+
+
+class TestLimiter(object):
+    def test_requests_beyond_limit_are_rejected(self):
+        registry = Registry()
+        limiter = AdaptiveLimiter(latency_threshold=10, initial_limit=1)
+        server = Server(registry, limiter=limiter)
+        responses = []
+
+        @registry.method(returns=six.text_type)
+        def nested():
+            response = TestApp(server).post_json("/api", {
+                "jsonrpc": "2.0",
+                "method": "test_server.nested",
+                "id": 2,
+            }, status=503)
+            responses.append(response.json)
+            return u"ok"
+
+        app = TestApp(server)
+        response = app.post_json("/api", {
+            "jsonrpc": "2.0",
+            "method": "test_server.nested",
+            "id": 1,
+        }, status=200)
+        assert response.json["result"] == "ok"
+        assert responses[0]["id"] is None
+        assert responses[0]["error"]["code"] == typedjsonrpc.errors.OverloadedError.code
+        assert limiter.info() == AdaptiveLimiterInfo(limit=2, in_flight=0, rejected=1)
+
+    def test_buffered_response_is_released_after_dispatch(self):
+        registry = Registry()
+        limiter = AdaptiveLimiter(latency_threshold=10, initial_limit=1)
+        server = Server(registry, limiter=limiter)
+
+        @registry.method(returns=int, x=int)
+        def double(x):
+            return 2 * x
+
+        environ = EnvironBuilder(path="/api", method="POST", content_type="application/json",
+                                 data=json.dumps({
+                                     "jsonrpc": "2.0",
+                                     "method": "test_server.double",
+                                     "params": [2],
+                                     "id": 1,
+                                 })).get_environ()
+        app_iter, status, _ = run_wsgi_app(server, environ)
+        assert status == "200 OK"
+        assert limiter.info().in_flight == 0
+        assert json.loads(b"".join(app_iter).decode("utf-8"))["result"] == 4
+
+    def test_streamed_response_counts_until_sent(self):
+        registry = Registry()
+        limiter = AdaptiveLimiter(latency_threshold=10, initial_limit=1)
+        server = Server(registry, stream_batches=True, limiter=limiter)
+
+        @registry.method(returns=int, x=int)
+        def double(x):
+            return 2 * x
+
+        def create_environ():
+            return EnvironBuilder(path="/api", method="POST", content_type="application/json",
+                                  data=json.dumps([{
+                                      "jsonrpc": "2.0",
+                                      "method": "test_server.double",
+                                      "params": [i],
+                                      "id": i,
+                                  } for i in range(2)])).get_environ()
+
+        app_iter, status, _ = run_wsgi_app(server, create_environ())
+        assert status == "200 OK"
+        assert limiter.info().in_flight == 1
+        _, status, _ = run_wsgi_app(server, create_environ())
+        assert status.startswith("503")
+
+        body = b"".join(app_iter).decode("utf-8")
+        app_iter.close()
+        assert [msg["result"] for msg in json.loads(body)] == [0, 2]
+        assert limiter.info() == AdaptiveLimiterInfo(limit=2, in_flight=0, rejected=1)
+
+
+class TestDeadline(object):
+    def test_deadline_from_headers(self):
+        now = time.time()
+        assert deadline_from_headers({}) is None
+        assert deadline_from_headers({DEADLINE_HEADER: "12.5"}) == 12.5
+        assert now + 2 <= deadline_from_headers({TIMEOUT_HEADER: "2"}) <= time.time() + 2
+        assert deadline_from_headers({DEADLINE_HEADER: "12.5", TIMEOUT_HEADER: "2"}) == 12.5
+        assert deadline_from_headers({DEADLINE_HEADER: "soon"}) is None
+        assert deadline_from_headers({DEADLINE_HEADER: "nan", TIMEOUT_HEADER: "inf"}) is None
+        assert deadline_from_headers({DEADLINE_HEADER: "-inf", TIMEOUT_HEADER: "2"}) >= now + 2
+
+    def test_deadline_passed_to_method(self):
+        registry = Registry()
+        server = Server(registry)
+
+        @registry.method(returns=dict)
+        def get_headers():
+            return get_deadline_headers()
+
+        app = TestApp(server)
+        deadline = time.time() + 60
+        response = app.post_json("/api", {
+            "jsonrpc": "2.0",
+            "method": "test_server.get_headers",
+            "id": 1,
+        }, headers={DEADLINE_HEADER: repr(deadline)})
+        assert float(response.json["result"][DEADLINE_HEADER]) == pytest.approx(deadline)
+        assert get_deadline() is None
+
+    def test_expired_deadline(self):
+        registry = Registry()
+        server = Server(registry)
+
+        @registry.method(returns=six.text_type)
+        def foo():
+            return "bar"
+
+        app = TestApp(server)
+        response = app.post_json("/api", {
+            "jsonrpc": "2.0",
+            "method": "test_server.foo",
+            "id": 1,
+        }, headers={TIMEOUT_HEADER: "-1"}, status=504)
+        assert response.json["error"]["code"] == typedjsonrpc.errors.DeadlineExceededError.code
+
 
 class TestCurrentRequest(object):
     def test_current_request_set(self):
@@ -282,14 +527,14 @@ class TestCurrentRequest(object):
         registry = Registry()
         server = Server(registry)
 
-        def fake_dispatch(request):
+        def fake_dispatch_response(request):
             assert current_request == request
-            return json.dumps({
+            return _create_dispatch_result({
                 "jsonrpc": "2.0",
                 "id": "foo",
                 "result": "bar"
             })
-        registry.dispatch = fake_dispatch
+        registry.dispatch_response = fake_dispatch_response
         environ = {
             "SERVER_NAME": "localhost",
             "SERVER_PORT": "5060",
@@ -299,3 +544,160 @@ class TestCurrentRequest(object):
         }
         mock_start_response = mock.Mock()
         server(environ, mock_start_response)
+
+    def test_current_request_in_executor(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        registry = Registry(executor=executor)
+        server = Server(registry)
+
+        @registry.method(returns=six.text_type)
+        def get_header():
+            return current_request.headers["X-Test"]
+
+        app = TestApp(server)
+        response = app.post_json("/api", [{
+            "jsonrpc": "2.0",
+            "method": "test_server.get_header",
+            "id": i,
+        } for i in range(4)], headers={"X-Test": "foo"})
+        executor.shutdown()
+        assert [msg["result"] for msg in response.json] == ["foo"] * 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+class TestPreforkRunner(object):
+    @staticmethod
+    def _start(runner):
+        runner.bind()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                runner.run()
+            finally:
+                os._exit(0)
+        return pid
+
+    @staticmethod
+    def _get_pid(address, method="get_pid", params=()):
+        body = json.dumps({"jsonrpc": "2.0", "method": "test_server." + method,
+                           "params": list(params), "id": 1})
+        for _ in range(100):
+            try:
+                response = six.moves.urllib.request.urlopen(
+                    "http://{}:{}/api".format(*address), body.encode("utf-8"), timeout=5)
+            except six.moves.urllib.error.URLError:
+                time.sleep(0.05)
+            else:
+                return json.loads(response.read().decode("utf-8"))["result"]
+        raise AssertionError("The runner did not respond")
+
+    @staticmethod
+    def _wait_for(condition):
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.05)
+        raise AssertionError("The condition was not met in time")
+
+    @staticmethod
+    def _create_server():
+        registry = Registry()
+
+        @registry.method(returns=int)
+        def get_pid():
+            return os.getpid()
+
+        @registry.method(returns=int, started_path=six.text_type, release_path=six.text_type)
+        def get_pid_when_released(started_path, release_path):
+            open(started_path, "w").close()
+            while not os.path.exists(release_path):
+                time.sleep(0.01)
+            return os.getpid()
+        return Server(registry)
+
+    @staticmethod
+    def _stop(pid):
+        os.kill(pid, signal.SIGTERM)
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+    def test_serves_from_workers_and_restarts(self):
+        runner = PreforkRunner(self._create_server(), "127.0.0.1", 0, workers=1, threads=2)
+        runner_pid = self._start(runner)
+        try:
+            worker_pid = self._get_pid(runner.address)
+            assert worker_pid not in (os.getpid(), runner_pid)
+            os.kill(runner_pid, signal.SIGHUP)
+            for _ in range(100):
+                new_worker_pid = self._get_pid(runner.address)
+                if new_worker_pid != worker_pid:
+                    break
+                time.sleep(0.05)
+            assert new_worker_pid not in (worker_pid, os.getpid(), runner_pid)
+        finally:
+            self._stop(runner_pid)
+
+    def test_restart_finishes_requests_in_flight(self, tmpdir):
+        started_path = six.text_type(tmpdir.join("started"))
+        release_path = six.text_type(tmpdir.join("release"))
+        runner = PreforkRunner(self._create_server(), "127.0.0.1", 0, workers=1, threads=2)
+        runner_pid = self._start(runner)
+        try:
+            worker_pid = self._get_pid(runner.address)
+            results = []
+            request_thread = threading.Thread(target=lambda: results.append(self._get_pid(
+                runner.address, "get_pid_when_released", [started_path, release_path])))
+            request_thread.start()
+            self._wait_for(lambda: os.path.exists(started_path))
+
+            os.kill(runner_pid, signal.SIGHUP)
+            self._wait_for(lambda: self._get_pid(runner.address) != worker_pid)
+            open(release_path, "w").close()
+            request_thread.join(5)
+            assert results == [worker_pid]
+        finally:
+            self._stop(runner_pid)
+
+    @pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="requires SO_REUSEPORT")
+    def test_reuse_port(self):
+        runner = PreforkRunner(self._create_server(), "127.0.0.1", 0, workers=2,
+                               reuse_port=True)
+        runner_pid = self._start(runner)
+        try:
+            pids = set(self._get_pid(runner.address) for _ in range(4))
+            assert pids and runner_pid not in pids
+        finally:
+            self._stop(runner_pid)
+
+    def test_failing_post_fork_stops_runner(self, capfd):
+        def post_fork():
+            raise ValueError("post_fork failed")
+
+        runner = PreforkRunner(self._create_server(), "127.0.0.1", 0, workers=2,
+                               post_fork=post_fork)
+        runner.bind()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                runner.run()
+            except RuntimeError:
+                exit_code = 2
+            finally:
+                os._exit(exit_code)
+        for _ in range(200):
+            exited_pid, status = os.waitpid(pid, os.WNOHANG)
+            if exited_pid == pid:
+                break
+            time.sleep(0.05)
+        else:
+            self._stop(pid)
+            raise AssertionError("The runner kept replacing failing workers")
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 2
+        assert "ValueError: post_fork failed" in capfd.readouterr().err
+
+    def test_invalid_options(self):
+        with pytest.raises(ValueError):
+            PreforkRunner(self._create_server(), "127.0.0.1", 0, workers=0)
+        with pytest.raises(ValueError):
+            PreforkRunner(self._create_server(), "127.0.0.1", 0, threads=0)
@@ -0,0 +1,316 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import six
+
+from typedjsonrpc import context
+from typedjsonrpc.errors import (DeadlineExceededError, Error, InternalError, InvalidParamsError,
+                                 MethodNotFoundError, ParseError)
+from typedjsonrpc.registry import Registry
+from typedjsonrpc.sockets import LengthPrefixedFraming, LineFraming, SocketClient, SocketServer
+from typedjsonrpc.streaming import Stream
+
+
+def _create_registry():
+    registry = Registry()
+    notifications = []
+    release = threading.Event()
+
+    @registry.method(returns=int, x=int, y=int)
+    def add(x, y):
+        return x + y
+
+    @registry.method(returns=int)
+    def get_thread():
+        return threading.current_thread().ident
+
+    @registry.method(returns=type(None), value=six.text_type)
+    def record(value):
+        notifications.append(value)
+
+    @registry.method(returns=type(None))
+    def fail():
+        raise Error("custom")
+
+    @registry.method(returns=int, x=int)
+    def slow(x):
+        notifications.append(x)
+        release.wait(10)
+        return x
+
+    @registry.method(returns=six.text_type, value=six.text_type)
+    def echo(value):
+        return value
+
+    @registry.method(returns=Stream(int))
+    def fail_while_streaming():
+        yield 1
+        raise ValueError("broken")
+
+    registry.notifications = notifications
+    registry.release = release
+    return registry
+
+
+@pytest.fixture
+def serve():
+    servers = []
+    executors = []
+
+    def _serve(address, framing=None, max_in_flight=16, multiplexed=False):
+        executor = ThreadPoolExecutor(max_workers=4) if multiplexed else None
+        if executor is not None:
+            executors.append(executor)
+        server = SocketServer(_create_registry(), address, framing, executor, max_in_flight)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield _serve
+    for server in servers:
+        server.registry.release.set()
+        server.shutdown()
+        server.close()
+    for executor in executors:
+        executor.shutdown()
+
+
+class TestFraming(object):
+    def test_line_framing(self):
+        framing = LineFraming(max_frame_size=8)
+        wfile = io.BytesIO()
+        framing.write_frame(wfile, b"[1,2]")
+        rfile = io.BytesIO(wfile.getvalue() + b"\r\n\n{}\r\n" + b"x" * 9 + b"\n")
+        assert framing.read_frame(rfile) == b"[1,2]"
+        assert framing.read_frame(rfile) == b"{}"
+        with pytest.raises(ParseError):
+            framing.read_frame(rfile)
+
+    def test_line_framing_end_of_stream(self):
+        framing = LineFraming(max_frame_size=8)
+        rfile = io.BytesIO(b"[1]\n{}")
+        assert framing.read_frame(rfile) == b"[1]"
+        assert framing.read_frame(rfile) == b"{}"
+        assert framing.read_frame(rfile) is None
+        assert framing.read_frame(io.BytesIO(b"{}\n \r")) == b"{}"
+        assert framing.read_frame(io.BytesIO(b" \r")) is None
+        with pytest.raises(ParseError):
+            framing.read_frame(io.BytesIO(b"x" * 9))
+
+    def test_length_prefixed_framing(self):
+        framing = LengthPrefixedFraming(max_frame_size=8)
+        wfile = io.BytesIO()
+        framing.write_frame(wfile, b"{\n}")
+        framing.write_frame(wfile, b"x" * 9)
+        rfile = io.BytesIO(wfile.getvalue())
+        assert framing.read_frame(rfile) == b"{\n}"
+        with pytest.raises(ParseError):
+            framing.read_frame(rfile)
+        assert framing.read_frame(io.BytesIO(wfile.getvalue()[:5])) is None
+
+
+class TestSocketServer(object):
+    def test_tcp(self, serve):
+        server = serve(("127.0.0.1", 0))
+        with SocketClient(server.address) as client:
+            assert client.call("test_sockets.add", 1, 2) == 3
+            assert client.call("test_sockets.add", x=3, y=4) == 7
+            assert client.call("test_sockets.get_thread") == client.call("test_sockets.get_thread")
+
+    @pytest.mark.skipif(not socket.has_ipv6, reason="requires IPv6")
+    def test_tcp_ipv6(self, serve):
+        server = serve(("::1", 0))
+        with SocketClient(server.address) as client:
+            assert client.call("test_sockets.add", 1, 2) == 3
+
+    @pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets")
+    def test_unix(self, serve):
+        directory = tempfile.mkdtemp()
+        try:
+            server = serve(os.path.join(directory, "rpc.sock"), LengthPrefixedFraming())
+            with SocketClient(server.address, LengthPrefixedFraming()) as client:
+                assert client.call("test_sockets.add", 1, 2) == 3
+        finally:
+            shutil.rmtree(directory)
+
+    def test_errors(self, serve):
+        server = serve(("127.0.0.1", 0))
+        with SocketClient(server.address) as client:
+            with pytest.raises(InvalidParamsError):
+                client.call("test_sockets.add", 1, "2")
+            with pytest.raises(MethodNotFoundError):
+                client.call("test_sockets.missing")
+            with pytest.raises(Error) as excinfo:
+                client.call("test_sockets.fail")
+            assert excinfo.value.code == Error.code
+            with pytest.raises(ValueError):
+                client.call("test_sockets.add", 1, y=2)
+            assert client.call("test_sockets.add", 1, 2) == 3
+
+    def test_notifications_and_batches(self, serve):
+        server = serve(("127.0.0.1", 0))
+        with SocketClient(server.address) as client:
+            client.notify("test_sockets.record", "foo")
+            assert client.call("test_sockets.add", 1, 2) == 3
+        assert server.registry.notifications == ["foo"]
+
+        connection = socket.create_connection(server.address)
+        rfile = connection.makefile("rb")
+        connection.sendall(json.dumps([
+            {"jsonrpc": "2.0", "method": "test_sockets.add", "params": [1, 2], "id": 1},
+            {"jsonrpc": "2.0", "method": "test_sockets.record", "params": ["bar"]},
+        ]).encode("utf-8") + b"\n" + b"not json\n")
+        assert json.loads(rfile.readline().decode("utf-8")) == [
+            {"jsonrpc": "2.0", "result": 3, "id": 1},
+        ]
+        assert json.loads(rfile.readline().decode("utf-8"))["error"]["code"] == ParseError.code
+        rfile.close()
+        connection.close()
+
+    def test_frame_too_large(self, serve):
+        server = serve(("127.0.0.1", 0), LineFraming(max_frame_size=16))
+        connection = socket.create_connection(server.address)
+        rfile = connection.makefile("rb")
+        connection.sendall(b"x" * 32 + b"\n")
+        assert json.loads(rfile.readline().decode("utf-8"))["error"]["code"] == ParseError.code
+        assert rfile.readline() == b""
+        rfile.close()
+        connection.close()
+
+    def test_client_deadline(self, serve):
+        server = serve(("127.0.0.1", 0))
+        with SocketClient(server.address) as client:
+            context.set_deadline(time.time() - 1)
+            try:
+                with pytest.raises(DeadlineExceededError):
+                    client.call("test_sockets.add", 1, 2)
+            finally:
+                context.set_deadline(None)
+
+
+class TestMultiplexing(object):
+    @staticmethod
+    def _send(connection, msg_id, method, *params):
+        connection.sendall(json.dumps({
+            "jsonrpc": "2.0",
+            "method": "test_sockets." + method,
+            "params": list(params),
+            "id": msg_id,
+        }).encode("utf-8") + b"\n")
+
+    def test_responses_out_of_order(self, serve):
+        server = serve(("127.0.0.1", 0), multiplexed=True)
+        connection = socket.create_connection(server.address)
+        rfile = connection.makefile("rb")
+        self._send(connection, 1, "slow", 1)
+        self._send(connection, 2, "add", 1, 2)
+        assert json.loads(rfile.readline().decode("utf-8"))["id"] == 2
+        server.registry.release.set()
+        assert json.loads(rfile.readline().decode("utf-8"))["id"] == 1
+        rfile.close()
+        connection.close()
+
+    def test_max_in_flight(self, serve):
+        server = serve(("127.0.0.1", 0), max_in_flight=1, multiplexed=True)
+        connection = socket.create_connection(server.address)
+        rfile = connection.makefile("rb")
+        self._send(connection, 1, "slow", 1)
+        self._send(connection, 2, "slow", 2)
+        time.sleep(0.1)
+        assert server.registry.notifications == [1]
+        server.registry.release.set()
+        assert [json.loads(rfile.readline().decode("utf-8"))["id"] for _ in range(2)] == [1, 2]
+        assert server.registry.notifications == [1, 2]
+        rfile.close()
+        connection.close()
+
+    def test_concurrent_client_calls(self, serve):
+        server = serve(("127.0.0.1", 0), multiplexed=True)
+        with SocketClient(server.address) as client:
+            results = []
+            thread = threading.Thread(target=lambda: results.append(client.call(
+                "test_sockets.slow", 1)))
+            thread.start()
+            assert client.call("test_sockets.add", 1, 2) == 3
+            assert results == []
+            server.registry.release.set()
+            thread.join()
+            assert results == [1]
+
+    @pytest.mark.parametrize("multiplexed", [False, True])
+    def test_stream_fails(self, serve, multiplexed):
+        server = serve(("127.0.0.1", 0), multiplexed=multiplexed)
+        with SocketClient(server.address, timeout=5) as client:
+            with pytest.raises(InternalError):
+                client.call("test_sockets.fail_while_streaming")
+            assert client.call("test_sockets.add", 1, 2) == 3
+
+    def test_concurrent_large_client_calls(self, serve):
+        server = serve(("127.0.0.1", 0), max_in_flight=1, multiplexed=True)
+        value = u"x" * (8 * 1024 * 1024)
+        with SocketClient(server.address, timeout=10) as client:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(client.call(
+                "test_sockets.echo", value))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            assert results == [value] * 4
+
+    def test_client_timeout(self, serve):
+        server = serve(("127.0.0.1", 0), multiplexed=True)
+        with SocketClient(server.address, timeout=0.05) as client:
+            with pytest.raises(socket.timeout):
+                client.call("test_sockets.slow", 1)
+            server.registry.release.set()
+            assert client.call("test_sockets.add", 1, 2) == 3
+
+    def test_client_connection_closed(self, serve):
+        server = serve(("127.0.0.1", 0))
+        client = SocketClient(server.address)
+        assert client.call("test_sockets.add", 1, 2) == 3
+        results = []
+
+        def call():
+            try:
+                client.call("test_sockets.slow", 1)
+            except socket.error as exc:
+                results.append(exc)
+        thread = threading.Thread(target=call)
+        thread.start()
+        while not server.registry.notifications:
+            time.sleep(0.01)
+        client.close()
+        thread.join()
+        assert len(results) == 1
+        assert client.call("test_sockets.add", 1, 2) == 3
+        client.close()
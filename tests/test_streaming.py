@@ -0,0 +1,215 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import time
+
+import pytest
+
+from typedjsonrpc import context
+from typedjsonrpc.codec import JsonCodec
+from typedjsonrpc.errors import InternalError, InvalidReturnTypeError
+from typedjsonrpc.limits import Bulkhead
+from typedjsonrpc.method_info import MethodOptions
+from typedjsonrpc.registry import Registry
+from typedjsonrpc.streaming import Stream, StreamResult
+
+
+def _call(method, params=None, msg_id=1):
+    msg = {"jsonrpc": "2.0", "method": "test_streaming." + method}
+    if params is not None:
+        msg["params"] = params
+    if msg_id is not None:
+        msg["id"] = msg_id
+    return msg
+
+
+def test_stream_name():
+    assert Stream(int).__name__ == "Stream[int]"
+
+
+def test_stream_result_type_check():
+    result = StreamResult(iter([1, "2"]), lambda item: None)
+    assert list(result) == [1, "2"]
+    with pytest.raises(InvalidReturnTypeError):
+        StreamResult("12", lambda item: None)
+    with pytest.raises(InvalidReturnTypeError):
+        StreamResult(12, lambda item: None)
+
+
+def test_stream_encoded_incrementally(create_request):
+    registry = Registry()
+    produced = []
+
+    @registry.method(returns=Stream(int), count=int)
+    def count_up(count):
+        for i in range(count):
+            produced.append(i)
+            yield i
+
+    result = registry.dispatch_response(create_request(_call("count_up", [3])))
+    assert result.status_code == 200
+    assert result.content_length is None
+    chunks = iter(result.chunks)
+    next(chunks)
+    next(chunks)
+    assert produced == [0]
+    next(chunks)
+    assert produced == [0, 1]
+    list(chunks)
+    assert produced == [0, 1, 2]
+    response = json.loads(registry.dispatch(create_request(_call("count_up", [3]))))
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": [0, 1, 2]}
+    response = json.loads(registry.dispatch(create_request(_call("count_up", [0]))))
+    assert response["result"] == []
+
+
+def test_stream_envelope_uses_codec(create_request):
+    encoder = json.JSONEncoder(separators=(",", ":"), sort_keys=True)
+    registry = Registry(codec=JsonCodec(encoder=encoder))
+
+    @registry.method(returns=Stream(int), count=int)
+    def count_up(count):
+        for i in range(count):
+            yield i
+
+    result = registry.dispatch_response(create_request(_call("count_up", [2])))
+    assert result.body == '{"id":1,"jsonrpc":"2.0","result":[0,1]}'
+
+
+def test_stream_keeps_request_state(create_request):
+    registry = Registry()
+
+    @registry.method(returns=Stream(int))
+    def priority():
+        yield context.get_priority()
+        yield context.get_priority()
+
+    context.set_priority(5)
+    try:
+        result = registry.dispatch_response(create_request(_call("priority")))
+    finally:
+        context.set_priority(None)
+    assert json.loads(result.body)["result"] == [5, 5]
+
+
+def test_stream_error_before_first_item(create_request):
+    registry = Registry()
+
+    @registry.method(returns=Stream(int))
+    def fail():
+        raise ValueError("failed")
+        yield  # pylint: disable=unreachable
+
+    response = json.loads(registry.dispatch(create_request(_call("fail"))))
+    assert response["error"]["code"] == InternalError.code
+    assert "result" not in response
+
+
+def test_stream_wrong_item_type(create_request):
+    registry = Registry()
+
+    @registry.method(returns=Stream(int))
+    def wrong_first():
+        yield "1"
+
+    @registry.method(returns=Stream(int))
+    def wrong_later():
+        yield 1
+        yield "2"
+
+    response = json.loads(registry.dispatch(create_request(_call("wrong_first"))))
+    assert response["error"]["code"] == InvalidReturnTypeError.code
+    result = registry.dispatch_response(create_request(_call("wrong_later")))
+    with pytest.raises(InvalidReturnTypeError):
+        b"".join(result.chunks)
+
+
+def test_stream_in_batch(create_request):
+    registry = Registry()
+
+    @registry.method(returns=Stream(int), count=int)
+    def count_up(count):
+        for i in range(count):
+            yield i
+
+    @registry.method(returns=int)
+    def one():
+        return 1
+
+    result = registry.dispatch_response(create_request([
+        _call("count_up", [2], 1),
+        _call("one", msg_id=2),
+        _call("count_up", [3], None),
+    ]))
+    assert result.is_batch
+    response = json.loads(result.body)
+    assert [msg["result"] for msg in response] == [[0, 1], 1]
+
+
+def test_stream_notification_is_consumed(create_request):
+    registry = Registry()
+    produced = []
+
+    @registry.method(returns=Stream(int))
+    def produce():
+        for i in range(3):
+            produced.append(i)
+            yield i
+
+    assert registry.dispatch(create_request(_call("produce", msg_id=None))) is None
+    assert produced == [0, 1, 2]
+
+
+def test_stream_invalid_options():
+    registry = Registry()
+    with pytest.raises(Exception):
+        registry.method(returns=Stream(int), options=MethodOptions(idempotent=True))
+    with pytest.raises(Exception):
+        registry.method(returns=Stream(int), options=MethodOptions(cache=object()))
+    with pytest.raises(Exception):
+        registry.method(returns=Stream(int), options=MethodOptions(bulkhead=Bulkhead(1)))
+    with pytest.raises(Exception):
+        registry.method(returns=Stream(int), options=MethodOptions(timeout=1.0))
+
+
+def test_stream_ignores_default_timeout(create_request):
+    registry = Registry(default_timeout=0.01)
+
+    @registry.method(returns=Stream(int))
+    def produce():
+        yield 1
+        time.sleep(0.05)
+        yield 2
+
+    response = json.loads(registry.dispatch(create_request(_call("produce"))))
+    assert response["result"] == [1, 2]
+
+
+def test_stream_describe(create_request):
+    registry = Registry()
+
+    @registry.method(returns=Stream(int))
+    def produce():
+        yield 1
+
+    description = json.loads(registry.dispatch(create_request(_call("produce"))))
+    assert description["result"] == [1]
+    methods = registry.describe()["methods"]
+    assert [method["returns"] for method in methods
+            if method["name"] == "test_streaming.produce"] == ["Stream[int]"]
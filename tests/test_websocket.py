@@ -0,0 +1,230 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import socket
+import struct
+import threading
+
+import pytest
+import six
+
+from typedjsonrpc.registry import Registry
+from typedjsonrpc.server import current_request
+from typedjsonrpc.websocket import WebSocketServer, create_accept_key
+
+
+class WebSocketConnection(object):
+    """A minimal WebSocket client for the tests."""
+
+    def __init__(self, address, path="/api", headers=None, origin=None):
+        self.socket = socket.create_connection(address)
+        self.rfile = self.socket.makefile("rb")
+        lines = ["GET {} HTTP/1.1".format(path), "Host: localhost"]
+        if origin is not None:
+            lines.append("Origin: {}".format(origin))
+        lines.extend("{}: {}".format(name, value) for name, value in (headers or {
+            "Upgrade": "websocket",
+            "Connection": "keep-alive, Upgrade",
+            "Sec-WebSocket-Key": "dGhlIHNhbXBsZSBub25jZQ==",
+            "Sec-WebSocket-Version": "13",
+        }).items())
+        self.socket.sendall("\r\n".join(lines + ["", ""]).encode("latin-1"))
+        self.status = self.rfile.readline().decode("latin-1").split(" ", 2)[1]
+        self.headers = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            self.headers[name.lower()] = value.strip()
+
+    def send_frame(self, opcode, payload, fin=True):
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", (0x80 if fin else 0) | opcode, 0x80 | length)
+        else:
+            header = struct.pack(">BBH", (0x80 if fin else 0) | opcode, 0x80 | 126, length)
+        masked = bytes(bytearray(byte ^ six.indexbytes(mask, index % 4)
+                                 for index, byte in enumerate(bytearray(payload))))
+        self.socket.sendall(header + mask + masked)
+
+    def send_json(self, data):
+        self.send_frame(0x1, json.dumps(data).encode("utf-8"))
+
+    def receive_frame(self):
+        first, second = struct.unpack(">BB", self.rfile.read(2))
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack(">H", self.rfile.read(2))
+        elif length == 127:
+            length, = struct.unpack(">Q", self.rfile.read(8))
+        return first & 0x0F, self.rfile.read(length)
+
+    def receive_json(self):
+        opcode, payload = self.receive_frame()
+        assert opcode == 0x1
+        return json.loads(payload.decode("utf-8"))
+
+    def close(self):
+        self.rfile.close()
+        self.socket.close()
+
+
+def _create_registry():
+    registry = Registry()
+
+    @registry.method(returns=int, x=int, y=int)
+    def add(x, y):
+        return x + y
+
+    @registry.method(returns=six.text_type)
+    def subscribe():
+        current_request.session.notify("test_websocket.update", value=1)
+        return current_request.headers["host"]
+    return registry
+
+
+def _start(server):
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+
+@pytest.fixture
+def server():
+    server = WebSocketServer(_create_registry(), ("127.0.0.1", 0), max_message_size=1024)
+    _start(server)
+    yield server
+    server.shutdown()
+    server.close()
+
+
+@pytest.fixture
+def server_with_allowed_origin():
+    server = WebSocketServer(_create_registry(), ("127.0.0.1", 0),
+                             allowed_origins=["https://dashboard.example.com/"])
+    _start(server)
+    yield server
+    server.shutdown()
+    server.close()
+
+
+def test_create_accept_key():
+    assert create_accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+
+def test_calls(server):
+    connection = WebSocketConnection(server.address)
+    assert connection.status == "101"
+    assert connection.headers["sec-websocket-accept"] == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+    for i in range(3):
+        connection.send_json({"jsonrpc": "2.0", "method": "test_websocket.add",
+                              "params": [i, 1], "id": i})
+        assert connection.receive_json() == {"jsonrpc": "2.0", "result": i + 1, "id": i}
+    connection.send_json([
+        {"jsonrpc": "2.0", "method": "test_websocket.add", "params": [1, 2], "id": "a"},
+        {"jsonrpc": "2.0", "method": "test_websocket.add", "params": [1, 2]},
+    ])
+    assert connection.receive_json() == [{"jsonrpc": "2.0", "result": 3, "id": "a"}]
+    connection.send_frame(0x1, b"not json")
+    assert connection.receive_json()["error"]["code"] == -32700
+    connection.close()
+
+
+def test_fragmented_message_and_ping(server):
+    connection = WebSocketConnection(server.address)
+    message = json.dumps({"jsonrpc": "2.0", "method": "test_websocket.add", "params": [1, 2],
+                          "id": 1}).encode("utf-8")
+    connection.send_frame(0x1, message[:10], fin=False)
+    connection.send_frame(0x9, b"ping")
+    connection.send_frame(0x0, message[10:])
+    assert connection.receive_frame() == (0xA, b"ping")
+    assert connection.receive_json()["result"] == 3
+    connection.close()
+
+
+def test_push_notifications(server):
+    connection = WebSocketConnection(server.address)
+    other = WebSocketConnection(server.address)
+    connection.send_json({"jsonrpc": "2.0", "method": "test_websocket.subscribe", "id": 1})
+    assert connection.receive_json() == {"jsonrpc": "2.0", "method": "test_websocket.update",
+                                         "params": {"value": 1}}
+    assert connection.receive_json() == {"jsonrpc": "2.0", "result": "localhost", "id": 1}
+    assert server.broadcast("test_websocket.tick", 2) == 2
+    for client in (connection, other):
+        assert client.receive_json() == {"jsonrpc": "2.0", "method": "test_websocket.tick",
+                                         "params": [2]}
+    connection.close()
+    other.close()
+
+
+def test_close(server):
+    connection = WebSocketConnection(server.address)
+    connection.send_frame(0x8, struct.pack(">H", 1001))
+    assert connection.receive_frame() == (0x8, struct.pack(">H", 1001))
+    assert connection.rfile.read() == b""
+    connection.close()
+
+
+def test_message_too_big(server):
+    connection = WebSocketConnection(server.address)
+    connection.send_frame(0x1, b" " * 2000)
+    opcode, payload = connection.receive_frame()
+    assert opcode == 0x8 and struct.unpack(">H", payload[:2])[0] == 1009
+    connection.close()
+
+
+def test_unmasked_frame(server):
+    connection = WebSocketConnection(server.address)
+    connection.socket.sendall(struct.pack(">BB", 0x81, 2) + b"{}")
+    opcode, payload = connection.receive_frame()
+    assert opcode == 0x8 and struct.unpack(">H", payload[:2])[0] == 1002
+    connection.close()
+
+
+@pytest.mark.parametrize("path, headers, status", [
+    ("/other", None, "404"),
+    ("/api", {"Connection": "close"}, "426"),
+    ("/api", {"Upgrade": "websocket", "Connection": "Upgrade"}, "400"),
+])
+def test_rejected_handshake(server, path, headers, status):
+    connection = WebSocketConnection(server.address, path, headers)
+    assert connection.status == status
+    connection.close()
+
+
+@pytest.mark.parametrize("origin, status", [
+    (None, "101"),
+    ("http://localhost", "101"),
+    ("https://dashboard.example.com", "101"),
+    ("https://evil.example.com", "403"),
+    ("null", "403"),
+])
+def test_origin(server_with_allowed_origin, origin, status):
+    connection = WebSocketConnection(server_with_allowed_origin.address, origin=origin)
+    assert connection.status == status
+    connection.close()
+
+
+def test_other_origin_rejected_by_default(server):
+    connection = WebSocketConnection(server.address, origin="https://dashboard.example.com")
+    assert connection.status == "403"
+    connection.close()
@@ -0,0 +1,136 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Contains an ASGI server for typedjsonrpc endpoints with coroutine methods.
+
+This module requires Python 3.5 or newer.
+"""
+from .server import DEFAULT_API_ENDPOINT_NAME
+
+__all__ = ["AsgiRequest", "AsgiServer"]
+
+
+class AsgiRequest(object):  # pylint: disable=too-few-public-methods
+    """The request object which :class:`AsgiServer` passes to the registry.
+
+    :attribute scope: The ASGI connection scope
+    :type scope: dict[str, object]
+    :attribute headers: The request headers with lower-case names
+    :type headers: dict[str, str]
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, scope, body):
+        """
+        :param scope: The ASGI connection scope
+        :type scope: dict[str, object]
+        :param body: The complete request body
+        :type body: bytes
+        """
+        self.scope = scope
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                        for name, value in scope.get("headers", [])}
+        self._body = body
+
+    def get_data(self, as_text=False):
+        """Returns the request body.
+
+        :param as_text: If True, the body is decoded as UTF-8
+        :type as_text: bool
+        :rtype: bytes | str
+        """
+        if as_text:
+            return self._body.decode("utf-8")
+        return self._body
+
+
+class AsgiServer(object):  # pylint: disable=too-few-public-methods
+    """An ASGI-compatible server for typedjsonrpc endpoints.
+
+    This is the counterpart of :class:`typedjsonrpc.server.Server` for an
+    :class:`typedjsonrpc.async_registry.AsyncRegistry`. It responds with the same HTTP status
+    codes.
+
+    :attribute registry: The registry for this server
+    :type registry: typedjsonrpc.async_registry.AsyncRegistry
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, registry, endpoint=DEFAULT_API_ENDPOINT_NAME):
+        """
+        :param registry: The JSON-RPC registry to use
+        :type registry: typedjsonrpc.async_registry.AsyncRegistry
+        :param endpoint: The endpoint to publish JSON-RPC endpoints. Default "/api".
+        :type endpoint: str
+        """
+        self.registry = registry
+        self._endpoint = endpoint
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._handle_http(scope, receive, send)
+        else:
+            raise ValueError("Unsupported ASGI scope type '{}'".format(scope["type"]))
+
+    async def _handle_http(self, scope, receive, send):
+        if scope["path"] != self._endpoint:
+            await self._send_response(send, 404)
+            return
+        body = await self._read_body(receive)
+        dispatch_result = await self.registry.dispatch_response(AsgiRequest(scope, body))
+        if dispatch_result.chunks is None:
+            await self._send_response(send, 204)
+        else:
+            await self._send_response(send, dispatch_result.status_code, dispatch_result.chunks,
+                                      dispatch_result.content_length)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _send_response(send, status, chunks=(), content_length=0):
+        headers = []
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("ascii")))
+        if chunks:
+            headers.append((b"content-type", b"application/json"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _handle_lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
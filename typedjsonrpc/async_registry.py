@@ -0,0 +1,218 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Logic for storing and calling jsonrpc methods which are coroutines.
+
+This module requires Python 3.5 or newer.
+"""
+import asyncio
+import functools
+import inspect
+
+import wrapt
+
+from . import context
+from .deduplication import share_results
+from .errors import DeadlineExceededError, MethodTimeoutError
+from .registry import Registry
+from .responses import collect_results, create_result_response
+from .streaming import StreamResult
+
+__all__ = ["AsyncRegistry"]
+
+
+class AsyncRegistry(Registry):
+    """A registry whose methods may be ``async def`` coroutine functions.
+
+    Methods are registered with the same :meth:`typedjsonrpc.registry.Registry.method` decorator
+    and are type-checked in the same way. :meth:`dispatch` is a coroutine which dispatches the
+    entries of a batch concurrently with :func:`asyncio.gather`.
+
+    Regular functions can still be registered. They are run in the event loop's default executor,
+    so that they don't block the event loop. This includes methods registered with
+    ``executor="process"`` and batch methods which wait for a
+    :class:`typedjsonrpc.batching.MicroBatcher`. The items of streamed results are produced and
+    encoded in the default executor as well, and the whole response is encoded before it is
+    returned.
+
+    Timeouts of coroutine methods are enforced with :func:`asyncio.wait_for`, which cancels the
+    method, and don't need a ``timeout_executor``. Regular functions with a timeout are run in the
+    ``timeout_executor`` and awaited, so that they don't block the event loop.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._coroutine_method_names = set()
+        super(AsyncRegistry, self).__init__(*args, **kwargs)
+
+    async def dispatch(self, request):
+        """Takes a request and dispatches its data to a jsonrpc method.
+
+        :param request: A request with json data
+        :type request: typedjsonrpc.asgi.AsgiRequest | werkzeug.wrappers.Request
+        :return: json output of the corresponding method
+        :rtype: str
+        """
+        return (await self.dispatch_response(request)).body
+
+    async def dispatch_response(self, request, stream=False, incremental=False):
+        """Takes a request and dispatches its data to a jsonrpc method.
+
+        The entries of a batch are always read at once and answered together once all of them are
+        done, so ``stream`` and ``incremental`` are ignored.
+
+        :param request: A request with json data
+        :type request: typedjsonrpc.asgi.AsgiRequest | werkzeug.wrappers.Request
+        :param stream: Ignored
+        :type stream: bool
+        :param incremental: Ignored
+        :type incremental: bool
+        :return: The encoded response and its outcome
+        :rtype: typedjsonrpc.responses.DispatchResult
+        """
+        try:
+            messages = self._get_request_messages(request)
+            unique_messages, sources = self._deduplicate_messages(messages)
+            unique_results = await self._dispatch_messages_async(unique_messages)
+            results = share_results(messages, unique_messages, sources, unique_results)
+            result = collect_results(messages, results)
+        except Exception as exc:  # pylint: disable=broad-except
+            result = self._handle_exception(exc)
+        dispatch_result = self._create_dispatch_result(result)
+        if dispatch_result.chunks is not None and not isinstance(dispatch_result.chunks, list):
+            # Encoding streamed results advances their generators, which may block.
+            chunks = await self._run_in_executor(list, (dispatch_result.chunks,), {})
+            dispatch_result = dispatch_result._replace(chunks=chunks)
+        return dispatch_result
+
+    async def _dispatch_messages_async(self, messages):
+        """Dispatches the messages concurrently and returns their responses in order.
+
+        Calls to batch methods are made first, in the executor, with one invocation per method.
+
+        :param messages: The parsed request messages
+        :type messages: list[object]
+        :return: The response for each message, or None for notifications
+        :rtype: list[dict[str, object] | None]
+        """
+        grouped_results = {}
+        if self._name_to_batch_method:
+            grouped_results = await self._run_in_executor(self._dispatch_grouped_calls,
+                                                          (messages,), {})
+        dispatched_results = iter(await asyncio.gather(*[
+            self._dispatch_and_handle_async(message)
+            for index, message in enumerate(messages) if index not in grouped_results]))
+        return [grouped_results[index] if index in grouped_results else next(dispatched_results)
+                for index in range(len(messages))]
+
+    async def _dispatch_and_handle_async(self, msg):
+        is_notification = isinstance(msg, dict) and "id" not in msg
+        try:
+            method_info, args, kwargs = self._prepare_call(msg)
+            bulkhead = self._name_to_bulkhead.get(method_info.name)
+            if bulkhead is not None:
+                # Waiting for a place would block the event loop.
+                self._acquire_bulkhead(bulkhead, method_info.name, blocking=False)
+            try:
+                if method_info.name in self._coroutine_method_names:
+                    result = await method_info.method(*args, **kwargs)
+                else:
+                    result = await self._run_in_executor(method_info.method, args, kwargs)
+                    if inspect.isawaitable(result):
+                        result = await result
+            finally:
+                if bulkhead is not None:
+                    bulkhead.release()
+            if isinstance(result, StreamResult):
+                await self._run_in_executor(Registry._start_stream, (result, is_notification), {})
+            if not is_notification:
+                return create_result_response(msg["id"], result)
+        except Exception as exc:  # pylint: disable=broad-except
+            return self._handle_exception(exc, is_notification, self._get_id_if_known(msg))
+
+    @staticmethod
+    def _run_in_executor(method, args, kwargs):
+        return asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(context.call_with_state, context.copy_current_state(), method,
+                                    *args, **kwargs))
+
+    def _register(self, name, method, method_signature, call_plan):
+        if asyncio.iscoroutinefunction(method):
+            self._coroutine_method_names.add(name)
+        super(AsyncRegistry, self)._register(name, method, method_signature, call_plan)
+
+    def _create_return_handling(self, method, invoke, returns, name):
+        invoke, validate_return = super(AsyncRegistry, self)._create_return_handling(
+            method, invoke, returns, name)
+        # Regular functions with a timeout are awaited through a coroutine.
+        if asyncio.iscoroutinefunction(invoke):
+            self._coroutine_method_names.add(name)
+        else:
+            self._coroutine_method_names.discard(name)
+        return invoke, validate_return
+
+    def _create_timeout_invoker(self, invoke, timeout, name):
+        if asyncio.iscoroutinefunction(invoke):
+            start = invoke
+        elif self._timeout_executor is None:
+            raise Exception("timeout requires a registry with a timeout_executor")
+        else:
+            def start(*args, **kwargs):
+                return asyncio.wrap_future(self._timeout_executor.submit(
+                    context.call_with_state, context.copy_current_state(), invoke, *args, **kwargs))
+
+        async def invoke_with_timeout(*args, **kwargs):
+            remaining = context.get_remaining_time()
+            try:
+                return await asyncio.wait_for(
+                    start(*args, **kwargs),
+                    timeout if remaining is None else min(timeout, remaining))
+            except asyncio.TimeoutError:
+                self._record_timeout(name, timeout)
+                if remaining is not None and remaining < timeout:
+                    raise DeadlineExceededError("The deadline of the request passed during "
+                                                "the call")
+                raise MethodTimeoutError("'{}' did not finish within {} seconds"
+                                         .format(name, timeout))
+        return invoke_with_timeout
+
+    @staticmethod
+    def _create_type_check_wrapper(method, invoke, validate_parameters, validate_return,
+                                   cache=None):
+        if not asyncio.iscoroutinefunction(invoke):
+            return Registry._create_type_check_wrapper(method, invoke, validate_parameters,
+                                                       validate_return, cache)
+
+        @wrapt.decorator
+        async def type_check_wrapper(method, instance,  # pylint: disable=unused-argument
+                                     args, kwargs):
+            if instance is not None:
+                raise Exception("Instance shouldn't be set.")
+
+            values = validate_parameters(args, kwargs)
+            key = None if cache is None else cache.make_key(values, args, kwargs)
+            if key is not None:
+                found, result = cache.get(key)
+                if found:
+                    return result
+            result = await invoke(*args, **kwargs)
+            validate_return(result)
+            if key is not None:
+                cache.put(key, result)
+            return result
+
+        return type_check_wrapper(method, None, None, None)
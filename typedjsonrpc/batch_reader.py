@@ -0,0 +1,166 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Incremental reading of JSON-RPC batches from a stream."""
+from __future__ import absolute_import, division, print_function
+
+import re
+
+from .errors import ParseError
+
+__all__ = ["BatchReader", "DEFAULT_CHUNK_SIZE"]
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_STRING, _INCOMPLETE_STRING = 1, 2
+_TOKEN = re.compile(br'("[^"\\]*(?:\\.[^"\\]*)*")|(")|([][{},])', re.DOTALL)
+_WHITESPACE = b" \t\n\r"
+
+_COMMA, _START, _END = ord(","), ord("["), ord("]")
+_OPENING = (_START, ord("{"))
+_CLOSING = (_END, ord("}"))
+
+
+class BatchReader(object):  # pylint: disable=too-few-public-methods
+    """Reads the entries of a JSON-RPC batch one at a time from a file-like object.
+
+    Only the entry which is currently being decoded is kept in memory. The boundaries of the
+    entries are found without decoding them, so that every entry can be decoded with any codec.
+
+    If the stream does not contain a batch, iterating the reader yields the complete request as
+    its only message.
+
+    :attribute is_batch: Whether the stream contains a batch, or None until iteration started
+    :type is_batch: bool | None
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, stream, codec, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param stream: The stream to read the request from
+        :type stream: io.RawIOBase
+        :param codec: The codec to decode the messages with
+        :type codec: typedjsonrpc.codec.Codec
+        :param chunk_size: The number of bytes to read from the stream at once
+        :type chunk_size: int
+        """
+        self.is_batch = None
+        self._stream = stream
+        self._codec = codec
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._is_exhausted = False
+
+    def __iter__(self):
+        """Yields the decoded messages.
+
+        :rtype: collections.Iterator[object]
+        :raises typedjsonrpc.errors.ParseError: If the stream does not contain valid JSON. Messages
+            before the invalid part have already been yielded.
+        """
+        self.is_batch = self._next_non_whitespace() == _START
+        if not self.is_batch:
+            while self._read():
+                pass
+            yield self._decode(bytes(self._buffer), "Could not parse request data '{}'")
+            return
+
+        del self._buffer[0]
+        if self._next_non_whitespace() == _END:
+            del self._buffer[0]
+            self._check_end()
+            return
+        while True:
+            entry, delimiter = self._read_entry()
+            yield self._decode(entry, "Could not parse batch entry '{}'")
+            if delimiter != _COMMA:
+                self._check_end()
+                return
+
+    def _read(self):
+        """Appends the next chunk of the stream to the buffer.
+
+        :return: Whether there was anything left to read
+        :rtype: bool
+        """
+        if self._is_exhausted:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._is_exhausted = True
+            return False
+        self._buffer.extend(chunk)
+        return True
+
+    def _next_non_whitespace(self):
+        """Drops leading whitespace from the buffer and returns the next byte.
+
+        :return: The next byte, or None at the end of the stream
+        :rtype: int | None
+        """
+        while True:
+            stripped = self._buffer.lstrip(_WHITESPACE)
+            del self._buffer[:len(self._buffer) - len(stripped)]
+            if self._buffer:
+                return self._buffer[0]
+            if not self._read():
+                return None
+
+    def _read_entry(self):
+        """Removes the next entry of the batch and the delimiter following it from the buffer.
+
+        :return: The encoded entry and the delimiter, which is a comma or a closing bracket
+        :rtype: (bytes, int)
+        """
+        position = 0
+        depth = 0
+        while True:
+            match = _TOKEN.search(self._buffer, position)
+            if match is None or match.lastindex == _INCOMPLETE_STRING:
+                # Either nothing or only the beginning of a string is left in the buffer.
+                position = len(self._buffer) if match is None else match.start()
+                self._read_more()
+                continue
+            position = match.end()
+            if match.lastindex == _STRING:
+                continue
+            char = self._buffer[match.start()]
+            if char in _OPENING:
+                depth += 1
+            elif depth > 0:
+                if char in _CLOSING:
+                    depth -= 1
+            elif char == _END or char == _COMMA:
+                entry = bytes(self._buffer[:match.start()])
+                del self._buffer[:position]
+                return entry, char
+            else:
+                raise ParseError("Unexpected '}' in batch")
+
+    def _read_more(self):
+        if not self._read():
+            raise ParseError("Unexpected end of batch")
+
+    def _check_end(self):
+        if self._next_non_whitespace() is not None:
+            raise ParseError("Unexpected data after the end of the batch")
+
+    def _decode(self, data, error_message):
+        try:
+            return self._codec.decode(data)
+        except Exception:
+            raise ParseError(error_message.format(data.decode("utf-8", "replace")))
@@ -0,0 +1,361 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Methods which handle many calls in a single invocation."""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import time
+from collections import namedtuple
+from threading import Condition, Event
+
+import six
+
+from .cache import copy_exception
+from .errors import InvalidParamsError, InvalidReturnTypeError
+from .method_info import CallPlan
+from .responses import create_result_response
+
+__all__ = ["BatchMethod", "BatchMethodOptions", "MicroBatcher", "MicroBatcherInfo",
+           "dispatch_group", "group_calls"]
+
+
+class BatchMethod(object):
+    """A method whose implementation receives the arguments of many calls at once.
+
+    The implementation takes a list with a dict of validated arguments for each call and returns a
+    list with one result for each call. A result which is an :class:`Exception` instance is
+    reported as the error of its call.
+
+    Calling a batch method directly makes a single call.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, name, method, call_plan,  # pylint: disable=too-many-arguments
+                 validate_parameters, validate_return, micro_batcher=None):
+        """
+        :param name: The name the method is registered with
+        :type name: str
+        :param method: The implementation
+        :type method: (list[dict[str, object]]) -> list[object]
+        :param call_plan: The call plan of a single call
+        :type call_plan: typedjsonrpc.method_info.CallPlan
+        :param validate_parameters: The validator for the parameters of a single call
+        :type validate_parameters: (tuple[object], dict[str, object]) -> tuple[object]
+        :param validate_return: The validator for the result of a single call
+        :type validate_return: (object) -> None
+        :param micro_batcher: If set, single calls which arrive at about the same time are
+            gathered by it into one invocation
+        :type micro_batcher: MicroBatcher | None
+        """
+        self.name = name
+        self.method = method
+        self.call_plan = call_plan
+        self.__doc__ = method.__doc__
+        self._validate_parameters = validate_parameters
+        self._validate_return = validate_return
+        self._micro_batcher = micro_batcher
+        if micro_batcher is not None:
+            micro_batcher.bind(self)
+
+    @staticmethod
+    def create_call_plan(parameter_types):
+        """Returns the call plan for a single call with the given parameters.
+
+        All parameters are required. The keyword arguments which declare them have no reliable
+        order before Python 3.6, so the parameters are ordered by name.
+
+        :param parameter_types: The types of the parameters
+        :type parameter_types: dict[str, type]
+        :rtype: typedjsonrpc.method_info.CallPlan
+        """
+        arg_names = tuple(sorted(parameter_types))
+        return CallPlan(arg_names=arg_names,
+                        arg_indexes={name: index for index, name in enumerate(arg_names)},
+                        defaults={},
+                        required_names=arg_names,
+                        has_varargs=False,
+                        has_kwargs=False,
+                        parameter_types=tuple((name, parameter_types[name])
+                                              for name in arg_names))
+
+    def bind(self, args, kwargs):
+        """Validates the arguments of a single call.
+
+        :param args: The positional arguments
+        :type args: tuple[object]
+        :param kwargs: The keyword arguments
+        :type kwargs: dict[str, object]
+        :return: The arguments by name
+        :rtype: dict[str, object]
+        :raises typedjsonrpc.errors.InvalidParamsError: If the arguments are invalid, or if they
+            are positional while the method has more than one parameter
+        """
+        if args and len(self.call_plan.arg_names) > 1:
+            raise InvalidParamsError("Batch method '{}' takes its parameters by name"
+                                     .format(self.name))
+        values = self._validate_parameters(args, kwargs)
+        return dict(zip(self.call_plan.arg_names, values))
+
+    def call_many(self, calls):
+        """Invokes the implementation once for all calls.
+
+        :param calls: The arguments of each call as returned by :meth:`bind`
+        :type calls: list[dict[str, object]]
+        :return: The result of each call, where errors are :class:`Exception` instances
+        :rtype: list[object]
+        :raises typedjsonrpc.errors.InvalidReturnTypeError: If the implementation does not return
+            one result for each call
+        """
+        results = self.method(calls)
+        if not isinstance(results, list) or len(results) != len(calls):
+            raise InvalidReturnTypeError("Batch method '{}' must return a list of {} results"
+                                         .format(self.name, len(calls)))
+        return [self._check_result(result) for result in results]
+
+    def _check_result(self, result):
+        if isinstance(result, Exception):
+            return result
+        try:
+            self._validate_return(result)
+        except InvalidReturnTypeError as exc:
+            return exc
+        return result
+
+    def __call__(self, *args, **kwargs):
+        arguments = self.bind(args, kwargs)
+        if self._micro_batcher is not None:
+            result = self._micro_batcher.call(arguments)
+        else:
+            result = self.call_many([arguments])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class BatchMethodOptions(namedtuple("BatchMethodOptions", ["micro_batcher"])):
+    """How :meth:`typedjsonrpc.registry.Registry.batch_method` runs a batch method.
+
+    :attribute micro_batcher: If set, concurrent single calls to the method, for example from
+        separate HTTP requests, are gathered into one invocation by it
+    :type micro_batcher: MicroBatcher | None
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __new__(cls, micro_batcher=None):
+        return super(BatchMethodOptions, cls).__new__(cls, micro_batcher)
+
+
+class MicroBatcherInfo(namedtuple("MicroBatcherInfo", ["calls", "invocations"])):
+    """Statistics of a :class:`MicroBatcher`.
+
+    :attribute calls: The number of calls which were made through the micro-batcher
+    :type calls: int
+    :attribute invocations: The number of times the batch method was invoked for them
+    :type invocations: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class _Window(object):
+    """The calls which are made with one invocation of a batch method."""
+
+    def __init__(self):
+        self.calls = []
+        self.done = Event()
+        self._results = []
+        self._error = None
+        self._traceback = None
+
+    def invoke(self, batch_method):
+        """Makes the calls and wakes up the callers which wait for them.
+
+        :param batch_method: The batch method
+        :type batch_method: BatchMethod
+        """
+        try:
+            self._results = batch_method.call_many(self.calls)
+        except Exception:  # pylint: disable=broad-except
+            _, self._error, self._traceback = sys.exc_info()
+        finally:
+            self.done.set()
+
+    def get_result(self, index, is_first):
+        """Returns the result of a call once the calls are done.
+
+        :param index: The index of the call
+        :type index: int
+        :param is_first: Whether the caller made the first call, which receives the original
+            exception if the invocation failed. The other callers receive a copy.
+        :type is_first: bool
+        :rtype: object
+        """
+        if self._error is not None:
+            error = self._error if is_first else copy_exception(self._error)
+            six.reraise(type(error), error, self._traceback)
+        return self._results[index]
+
+
+class MicroBatcher(object):
+    """Gathers concurrent single calls to a batch method into one invocation.
+
+    The first call opens a window which is closed after ``max_delay`` seconds or as soon as it
+    holds ``max_size`` calls. All calls in the window are then made with one invocation of the
+    batch method by the thread of the first call, and every caller receives its own result.
+
+    Pass an instance as the ``micro_batcher`` of a :class:`BatchMethodOptions`. Each method needs
+    its own instance.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, max_delay=0.002, max_size=64):
+        """
+        :param max_delay: The number of seconds to wait for more calls after the first one
+        :type max_delay: float
+        :param max_size: The maximum number of calls in one invocation
+        :type max_size: int
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self._batch_method = None
+        self._condition = Condition()
+        self._open_window = None
+        self._calls = 0
+        self._invocations = 0
+
+    def bind(self, batch_method):
+        """Attaches the micro-batcher to a batch method.
+
+        :param batch_method: The batch method
+        :type batch_method: BatchMethod
+        """
+        if self._batch_method is not None:
+            raise Exception("A MicroBatcher cannot be shared between methods")
+        self._batch_method = batch_method
+
+    def call(self, arguments):
+        """Makes a single call as part of the current window.
+
+        :param arguments: The validated arguments of the call
+        :type arguments: dict[str, object]
+        :return: The result of the call, which is an :class:`Exception` instance for errors
+        :rtype: object
+        """
+        with self._condition:
+            window = self._open_window
+            is_first = window is None
+            if is_first:
+                window = self._open_window = _Window()
+            index = len(window.calls)
+            window.calls.append(arguments)
+            self._calls += 1
+            if len(window.calls) >= self.max_size:
+                self._open_window = None
+                self._condition.notify_all()
+
+        if is_first:
+            self._close(window)
+            window.invoke(self._batch_method)
+        else:
+            window.done.wait()
+        return window.get_result(index, is_first)
+
+    def _close(self, window):
+        deadline = time.time() + self.max_delay
+        with self._condition:
+            while self._open_window is window:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._open_window = None
+                else:
+                    self._condition.wait(remaining)
+            self._invocations += 1
+
+    def info(self):
+        """Returns statistics about the calls.
+
+        :rtype: MicroBatcherInfo
+        """
+        with self._condition:
+            return MicroBatcherInfo(self._calls, self._invocations)
+
+
+def group_calls(messages, name_to_batch_method):
+    """Finds the entries of a batch which call the same batch method.
+
+    :param messages: The parsed request messages
+    :type messages: list[object]
+    :param name_to_batch_method: The registered batch methods by name
+    :type name_to_batch_method: dict[str, BatchMethod]
+    :return: Each batch method which more than one message calls, with these messages and their
+        indexes
+    :rtype: list[(BatchMethod, list[(int, dict[str, object])])]
+
+    .. versionadded:: 0.5.0
+    """
+    calls_by_name = {}
+    for index, message in enumerate(messages):
+        name = message.get("method") if isinstance(message, dict) else None
+        if isinstance(name, six.string_types) and name in name_to_batch_method:
+            calls_by_name.setdefault(name, []).append((index, message))
+    groups = []
+    for name, indexed_messages in calls_by_name.items():
+        if len(indexed_messages) > 1:
+            groups.append((name_to_batch_method[name], indexed_messages))
+    return groups
+
+
+def dispatch_group(batch_method, calls, handle_exception):
+    """Makes all calls to one batch method with a single invocation.
+
+    :param batch_method: The batch method
+    :type batch_method: BatchMethod
+    :param calls: The message of each call with its arguments as returned by
+        :meth:`BatchMethod.bind`
+    :type calls: list[(dict[str, object], dict[str, object])]
+    :param handle_exception: Creates the error response for the exception which is currently being
+        handled, given the exception, whether the message is a notification and its id
+    :type handle_exception: (Exception, bool, object) -> dict[str, object] | None
+    :return: The response of each call, or None for notifications
+    :rtype: list[dict[str, object] | None]
+
+    .. versionadded:: 0.5.0
+    """
+    try:
+        outcomes = batch_method.call_many([arguments for _, arguments in calls])
+    except Exception as exc:  # pylint: disable=broad-except
+        error_response = handle_exception(exc, False, None)
+        return [dict(error_response, id=message["id"]) if "id" in message else None
+                for message, _ in calls]
+
+    responses = []
+    for (message, _), outcome in zip(calls, outcomes):
+        if "id" not in message:
+            responses.append(None)
+        elif isinstance(outcome, Exception):
+            try:
+                raise outcome
+            except Exception as exc:  # pylint: disable=broad-except
+                responses.append(handle_exception(exc, False, message["id"]))
+        else:
+            responses.append(create_result_response(message["id"], outcome))
+    return responses
@@ -0,0 +1,282 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Caching and sharing of the results of registered methods."""
+from __future__ import absolute_import, division, print_function
+
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from threading import Event, Lock
+
+import six
+
+__all__ = ["CacheInfo", "ResultCache", "SingleFlight", "SingleFlightInfo", "copy_exception",
+           "make_key"]
+
+
+class CacheInfo(namedtuple("CacheInfo", ["hits", "misses", "size", "max_entries"])):
+    """Statistics of a :class:`ResultCache`.
+
+    :attribute hits: The number of calls which were answered from the cache
+    :type hits: int
+    :attribute misses: The number of calls which ran the method
+    :type misses: int
+    :attribute size: The number of entries in the cache
+    :type size: int
+    :attribute max_entries: The maximum number of entries in the cache
+    :type max_entries: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class ResultCache(object):  # pylint: disable=too-many-instance-attributes
+    """A thread-safe LRU cache with an optional time to live for the results of one method.
+
+    Pass an instance as the ``cache`` option of :meth:`typedjsonrpc.registry.Registry.method`.
+    Each method needs its own instance. Cached results are returned to every caller as they are,
+    so they should not be mutated.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, max_entries=128, ttl=None, key=None, clock=time.time):
+        """
+        :param max_entries: The maximum number of results to keep. The least recently used result
+            is evicted when the cache is full.
+        :type max_entries: int
+        :param ttl: The number of seconds for which a result is valid, or None to keep results
+            until they are evicted
+        :type ttl: float | None
+        :param key: A function which is called with the arguments of a call and returns a hashable
+            cache key. By default, the key is made from the validated parameter values.
+        :type key: ((T) -> collections.Hashable) | None
+        :param clock: The function which returns the current time in seconds
+        :type clock: () -> float
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._key = key
+        self._clock = clock
+        self._call_plan = None
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def bind(self, call_plan):
+        """Attaches the cache to the method described by the call plan.
+
+        :param call_plan: The call plan of the method
+        :type call_plan: typedjsonrpc.method_info.CallPlan
+        """
+        if self._call_plan is not None:
+            raise Exception("A ResultCache cannot be shared between methods")
+        self._call_plan = call_plan
+
+    def make_key(self, values, args, kwargs):
+        """Returns the cache key for a call.
+
+        :param values: The validated values of the method's named parameters
+        :type values: tuple[object]
+        :param args: The positional arguments of the call
+        :type args: tuple[object]
+        :param kwargs: The keyword arguments of the call
+        :type kwargs: dict[str, object]
+        :return: The key, or None if the call cannot be cached
+        :rtype: collections.Hashable | None
+        """
+        try:
+            if self._key is not None:
+                key = self._key(*args, **kwargs)
+                hash(key)
+                return key
+            extra_args = args[len(self._call_plan.arg_names):]
+            extra_kwargs = {name: value for name, value in kwargs.items()
+                            if name not in self._call_plan.arg_indexes}
+            return make_key((values, extra_args, extra_kwargs))
+        except TypeError:
+            return None
+
+    def get(self, key):
+        """Looks up a result and counts the lookup as a hit or a miss.
+
+        :param key: The cache key
+        :type key: collections.Hashable
+        :return: Whether the result was found and the result
+        :rtype: (bool, object)
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries[key] = entry
+                    self._hits += 1
+                    return True, value
+            self._misses += 1
+            return False, None
+
+    def put(self, key, value):
+        """Stores a result.
+
+        :param key: The cache key
+        :type key: collections.Hashable
+        :param value: The result
+        :type value: object
+        """
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Removes all results from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Returns statistics about the cache.
+
+        :rtype: CacheInfo
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, len(self._entries), self.max_entries)
+
+
+class SingleFlightInfo(namedtuple("SingleFlightInfo", ["executions", "shared", "in_flight"])):
+    """Statistics of a :class:`SingleFlight`.
+
+    :attribute executions: The number of calls which were executed
+    :type executions: int
+    :attribute shared: The number of calls which received the outcome of another call instead of
+        being executed
+    :type shared: int
+    :attribute in_flight: The number of calls which are currently being executed
+    :type in_flight: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class _Flight(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Makes concurrent calls with the same key share a single execution.
+
+    The first caller for a key executes the call. Callers which arrive with the same key while it
+    is still running wait for it and receive its result, or a copy of the exception it raised.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._flights = {}
+        self._executions = 0
+        self._shared = 0
+
+    def call(self, key, func):
+        """Calls ``func`` unless a call with the same key is already running.
+
+        :param key: The key identifying identical calls
+        :type key: collections.Hashable
+        :param func: The function making the call
+        :type func: () -> T
+        :return: The result of the call
+        :rtype: T
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+                self._executions += 1
+            else:
+                self._shared += 1
+
+        if not is_leader:
+            flight.done.wait()
+            if flight.exc_info is not None:
+                exc_type, exc_value, exc_traceback = flight.exc_info
+                six.reraise(exc_type, copy_exception(exc_value), exc_traceback)
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def info(self):
+        """Returns statistics about the calls.
+
+        :rtype: SingleFlightInfo
+        """
+        with self._lock:
+            return SingleFlightInfo(self._executions, self._shared, len(self._flights))
+
+
+def copy_exception(exc):
+    """Copies an exception so that every caller can handle and modify its own instance.
+
+    :param exc: The exception to copy
+    :type exc: BaseException
+    :rtype: BaseException
+
+    .. versionadded:: 0.5.0
+    """
+    copied = exc.__class__.__new__(exc.__class__)
+    copied.args = exc.args
+    copied.__dict__.update(exc.__dict__)
+    return copied
+
+
+def make_key(value):
+    """Converts a JSON-compatible value into a hashable key.
+
+    Lists and dicts are converted recursively and the type of every value is part of the key, so
+    ``1``, ``1.0`` and ``True`` produce different keys.
+
+    :param value: The value to convert
+    :type value: object
+    :return: The key
+    :rtype: collections.Hashable
+    :raises TypeError: If the value contains an unhashable object which is not a list or dict
+
+    .. versionadded:: 0.5.0
+    """
+    if isinstance(value, (list, tuple)):
+        return (value.__class__, tuple(make_key(item) for item in value))
+    if isinstance(value, dict):
+        return (dict, frozenset((make_key(key), make_key(item)) for key, item in value.items()))
+    hash(value)
+    return (value.__class__, value)
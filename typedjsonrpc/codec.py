@@ -0,0 +1,172 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Codecs which convert between JSON-RPC messages and their encoded form."""
+from __future__ import absolute_import, division, print_function
+
+import json
+
+import six
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # pylint: disable=invalid-name
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None  # pylint: disable=invalid-name
+
+__all__ = ["Codec", "JsonCodec", "OrjsonCodec", "UjsonCodec", "get_available_codecs"]
+
+
+class Codec(object):
+    """Base class for codecs.
+
+    A codec encodes JSON-compatible objects to UTF-8 encoded bytes and decodes bytes back to
+    objects.
+
+    .. versionadded:: 0.5.0
+    """
+
+    name = None
+    """The name of the codec"""
+
+    encode_errors = (TypeError, ValueError, OverflowError)
+    """The exception types raised by :meth:`encode` for objects which cannot be encoded"""
+
+    decode_errors = (ValueError,)
+    """The exception types raised by :meth:`decode` for data which cannot be decoded"""
+
+    def encode(self, obj):
+        """Encodes an object.
+
+        :param obj: The object to encode
+        :type obj: object
+        :return: The UTF-8 encoded JSON
+        :rtype: bytes
+        """
+        raise NotImplementedError()
+
+    def decode(self, data):
+        """Decodes an object.
+
+        :param data: The UTF-8 encoded JSON
+        :type data: bytes
+        :return: The decoded object
+        :rtype: object
+        """
+        raise NotImplementedError()
+
+
+class JsonCodec(Codec):
+    """A codec which uses the :mod:`json` module from the standard library.
+
+    :attribute encoder: The encoder to use
+    :type encoder: json.JSONEncoder
+    :attribute decoder: The decoder to use
+    :type decoder: json.JSONDecoder
+
+    .. versionadded:: 0.5.0
+    """
+
+    name = "json"
+
+    def __init__(self, encoder=None, decoder=None):
+        """
+        :param encoder: The encoder to use. Defaults to :class:`json.JSONEncoder`.
+        :type encoder: json.JSONEncoder | None
+        :param decoder: The decoder to use. Defaults to :class:`json.JSONDecoder`.
+        :type decoder: json.JSONDecoder | None
+        """
+        self.encoder = encoder if encoder is not None else json.JSONEncoder()
+        self.decoder = decoder if decoder is not None else json.JSONDecoder()
+
+    def encode(self, obj):
+        encoded = self.encoder.encode(obj)
+        if isinstance(encoded, six.binary_type):
+            return encoded
+        return encoded.encode("utf-8")
+
+    def decode(self, data):
+        # The decoder only accepts text, so bytes are always copied into a str first.
+        if isinstance(data, six.binary_type):
+            data = data.decode("utf-8")
+        return self.decoder.decode(data)
+
+
+class OrjsonCodec(Codec):
+    """A codec which uses `orjson <https://github.com/ijl/orjson>`_.
+
+    Raises :class:`ImportError` if orjson is not installed.
+
+    .. versionadded:: 0.5.0
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        self.encode_errors = (orjson.JSONEncodeError,)
+        self.decode_errors = (orjson.JSONDecodeError,)
+
+    def encode(self, obj):
+        return orjson.dumps(obj)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(Codec):
+    """A codec which uses `ujson <https://github.com/ultrajson/ultrajson>`_.
+
+    Raises :class:`ImportError` if ujson is not installed.
+
+    .. versionadded:: 0.5.0
+    """
+
+    name = "ujson"
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("ujson is not installed")
+
+    def encode(self, obj):
+        encoded = ujson.dumps(obj, ensure_ascii=False)
+        if isinstance(encoded, six.binary_type):
+            return encoded
+        return encoded.encode("utf-8")
+
+    def decode(self, data):
+        return ujson.loads(data)
+
+
+def get_available_codecs():
+    """Returns an instance of every codec whose dependencies are installed.
+
+    :rtype: list[Codec]
+
+    .. versionadded:: 0.5.0
+    """
+    codecs = [JsonCodec()]
+    for codec_type in [OrjsonCodec, UjsonCodec]:
+        try:
+            codecs.append(codec_type())
+        except ImportError:
+            pass
+    return codecs
@@ -0,0 +1,224 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Request-scoped state which is shared between the server and the registry."""
+from __future__ import absolute_import, division, print_function
+
+import math
+import time
+
+from werkzeug.local import Local, LocalManager, LocalProxy
+
+__all__ = ["DEADLINE_HEADER", "PRIORITY_HEADER", "TIMEOUT_HEADER", "current_request",
+           "copy_current_state", "call_with_state", "deadline_from_headers", "get_deadline",
+           "get_deadline_headers", "get_priority", "get_remaining_time", "priority_from_headers",
+           "set_deadline", "set_priority"]
+
+DEADLINE_HEADER = "X-Request-Deadline"
+"""The header with the absolute deadline of a request in seconds since the epoch.
+
+.. versionadded:: 0.5.0
+"""
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+"""The header with the number of seconds the client waits for the response to a request.
+
+.. versionadded:: 0.5.0
+"""
+
+PRIORITY_HEADER = "X-Request-Priority"
+"""The header with an integer priority which overrides the priority of the methods a request calls.
+
+.. versionadded:: 0.5.0
+"""
+
+_CURRENT_REQUEST_KEY = "current_request"
+_DEADLINE_KEY = "deadline"
+_PRIORITY_KEY = "priority"
+_STATE_KEYS = (_CURRENT_REQUEST_KEY, _DEADLINE_KEY, _PRIORITY_KEY)
+
+_local = Local()  # pylint: disable=invalid-name
+_LOCAL_MANAGER = LocalManager([_local])
+
+current_request = LocalProxy(_local, _CURRENT_REQUEST_KEY)  # pylint: disable=invalid-name
+"""A thread-local which stores the current request object when dispatching requests for
+:class:`typedjsonrpc.server.Server`.
+
+Stores a :class:`werkzeug.wrappers.Request`.
+
+.. versionadded:: 0.2.0
+"""
+
+
+def copy_current_state():
+    """Returns a snapshot of the request-scoped state of the current thread.
+
+    :return: The values of the request-scoped state by key
+    :rtype: dict[str, object]
+
+    .. versionadded:: 0.5.0
+    """
+    state = {}
+    for key in _STATE_KEYS:
+        try:
+            state[key] = getattr(_local, key)
+        except AttributeError:
+            pass
+    return state
+
+
+def call_with_state(state, func, *args, **kwargs):
+    """Calls a function with the given request-scoped state bound to the current thread.
+
+    This is used to make state such as :data:`current_request` available to methods which are
+    dispatched on another thread. The previous state of the thread is restored afterwards.
+
+    :param state: A snapshot as returned by :func:`copy_current_state`
+    :type state: dict[str, object]
+    :param func: The function to call
+    :type func: (T) -> U
+    :rtype: U
+
+    .. versionadded:: 0.5.0
+    """
+    previous_state = copy_current_state()
+    _set_state(state)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _set_state(previous_state)
+
+
+def get_deadline():
+    """Returns the deadline of the request which is currently being handled.
+
+    :return: The deadline in seconds since the epoch, or None if the request has no deadline
+    :rtype: float | None
+
+    .. versionadded:: 0.5.0
+    """
+    return getattr(_local, _DEADLINE_KEY, None)
+
+
+def get_remaining_time():
+    """Returns how much time is left until the deadline of the current request.
+
+    :return: The remaining number of seconds, which is 0 once the deadline has passed, or None if
+        the request has no deadline
+    :rtype: float | None
+
+    .. versionadded:: 0.5.0
+    """
+    deadline = get_deadline()
+    if deadline is not None:
+        return max(0.0, deadline - time.time())
+
+
+def set_deadline(deadline):
+    """Sets the deadline of the request which is currently being handled.
+
+    :param deadline: The deadline in seconds since the epoch, or None to remove the deadline
+    :type deadline: float | None
+
+    .. versionadded:: 0.5.0
+    """
+    _set_state(dict(copy_current_state(), **{_DEADLINE_KEY: deadline}))
+
+
+def deadline_from_headers(headers):
+    """Determines the deadline of a request from its :data:`DEADLINE_HEADER` and
+    :data:`TIMEOUT_HEADER`. If both are given, the earlier deadline is used. Invalid values,
+    including values which are not finite, are ignored.
+
+    :param headers: The headers of the request
+    :type headers: werkzeug.datastructures.Headers | dict[str, str]
+    :return: The deadline in seconds since the epoch, or None if the request has no deadline
+    :rtype: float | None
+
+    .. versionadded:: 0.5.0
+    """
+    deadlines = []
+    for name, offset in [(DEADLINE_HEADER, 0.0), (TIMEOUT_HEADER, time.time())]:
+        try:
+            value = float(headers[name])
+        except (KeyError, ValueError):
+            continue
+        if not math.isnan(value) and not math.isinf(value):
+            deadlines.append(offset + value)
+    return min(deadlines) if deadlines else None
+
+
+def get_deadline_headers():
+    """Returns the headers which pass the deadline of the current request on to another service.
+
+    :rtype: dict[str, str]
+
+    .. versionadded:: 0.5.0
+    """
+    deadline = get_deadline()
+    if deadline is None:
+        return {}
+    return {DEADLINE_HEADER: "{:.3f}".format(deadline)}
+
+
+def get_priority():
+    """Returns the priority of the request which is currently being handled.
+
+    :return: The priority, or None if the request doesn't override the priority of its methods
+    :rtype: int | None
+
+    .. versionadded:: 0.5.0
+    """
+    return getattr(_local, _PRIORITY_KEY, None)
+
+
+def set_priority(priority):
+    """Sets the priority of the request which is currently being handled.
+
+    :param priority: The priority, or None to use the priority of the called methods
+    :type priority: int | None
+
+    .. versionadded:: 0.5.0
+    """
+    _set_state(dict(copy_current_state(), **{_PRIORITY_KEY: priority}))
+
+
+def priority_from_headers(headers):
+    """Determines the priority of a request from its :data:`PRIORITY_HEADER`. An invalid value is
+    ignored.
+
+    :param headers: The headers of the request
+    :type headers: werkzeug.datastructures.Headers | dict[str, str]
+    :return: The priority, or None if the request has no valid priority
+    :rtype: int | None
+
+    .. versionadded:: 0.5.0
+    """
+    try:
+        return int(headers[PRIORITY_HEADER])
+    except (KeyError, ValueError):
+        return None
+
+
+def _set_state(state):
+    for key in _STATE_KEYS:
+        if state.get(key) is not None:
+            setattr(_local, key, state[key])
+        else:
+            try:
+                delattr(_local, key)
+            except AttributeError:
+                pass
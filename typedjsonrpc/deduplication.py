@@ -0,0 +1,111 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sharing of responses between identical entries of a batch."""
+from __future__ import absolute_import, division, print_function
+
+from collections import Counter
+
+__all__ = ["deduplicate_messages", "iter_shared_results", "share_results"]
+
+
+def deduplicate_messages(messages, get_key):
+    """Finds the entries of a batch which are identical calls.
+
+    :param messages: The parsed request messages
+    :type messages: list[object]
+    :param get_key: Returns the key of a message, which is equal for identical calls, or None if
+        the message must be dispatched on its own
+    :type get_key: (object) -> collections.Hashable | None
+    :return: The messages which have to be dispatched, and for each of the original messages
+        the index of the dispatched message whose response it shares
+    :rtype: (list[object], list[int])
+
+    .. versionadded:: 0.5.0
+    """
+    unique_messages = []
+    sources = []
+    key_to_index = {}
+    for message in messages:
+        key = get_key(message)
+        index = key_to_index.get(key) if key is not None else None
+        if index is None:
+            index = len(unique_messages)
+            unique_messages.append(message)
+            if key is not None:
+                key_to_index[key] = index
+        elif "id" in message and "id" not in unique_messages[index]:
+            # Dispatch a request rather than a notification so that there is a response.
+            unique_messages[index] = message
+        sources.append(index)
+    return unique_messages, sources
+
+
+def share_results(messages, unique_messages, sources, unique_results):
+    """Gives every message the response of the dispatched message it was deduplicated into.
+
+    :param messages: The parsed request messages
+    :type messages: list[object]
+    :param unique_messages: The messages which were dispatched
+    :type unique_messages: list[object]
+    :param sources: The index of the dispatched message for each message
+    :type sources: list[int]
+    :param unique_results: The responses of the dispatched messages in order
+    :type unique_results: list[dict[str, object] | None]
+    :return: The response for each message, or None for notifications
+    :rtype: list[dict[str, object] | None]
+
+    .. versionadded:: 0.5.0
+    """
+    if len(unique_messages) == len(messages):
+        return unique_results
+    return list(iter_shared_results(messages, unique_messages, sources, unique_results))
+
+
+def iter_shared_results(messages, unique_messages, sources, unique_results):
+    """Gives every message the response of the dispatched message it was deduplicated into while
+    the responses are produced.
+
+    Responses are only kept for as long as a later message still shares them.
+
+    :param messages: The parsed request messages
+    :type messages: list[object]
+    :param unique_messages: The messages which were dispatched
+    :type unique_messages: list[object]
+    :param sources: The index of the dispatched message for each message
+    :type sources: list[int]
+    :param unique_results: The responses of the dispatched messages in order
+    :type unique_results: collections.Iterable[dict[str, object] | None]
+    :return: The response for each message, or None for notifications
+    :rtype: collections.Iterator[dict[str, object] | None]
+
+    .. versionadded:: 0.5.0
+    """
+    unique_results = iter(unique_results)
+    remaining_uses = Counter(sources)
+    pending = {}
+    next_index = 0
+    for message, index in zip(messages, sources):
+        while next_index <= index:
+            pending[next_index] = next(unique_results, None)
+            next_index += 1
+        result = pending[index]
+        remaining_uses[index] -= 1
+        if remaining_uses[index] == 0:
+            del pending[index]
+        if message is not unique_messages[index]:
+            result = dict(result, id=message["id"]) if "id" in message else None
+        yield result
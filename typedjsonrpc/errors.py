@@ -45,6 +45,21 @@ class Error(Exception):
             "data": self.data
         }
 
+    @classmethod
+    def from_data(cls, data):
+        """Recreates an error of this class from its data, for example after it was sent to another
+        process. Subclasses whose constructor takes other parameters are recreated as well.
+
+        :param data: The data of the error
+        :type data: object
+        :rtype: Error
+
+        .. versionadded:: 0.5.0
+        """
+        error = cls.__new__(cls)
+        Error.__init__(error, data)
+        return error
+
 
 class ParseError(Error):
     """Invalid JSON was received by the server / JSON could not be parsed.
@@ -101,20 +116,24 @@ class InternalError(Error):
 
         :param exc_info: The exception info for the wrapped exception
         :type exc_info: (type, object, traceback)
-        :type json_encoder: json.JSONEncoder
+        :param json_encoder: The encoder or codec used to check which values are serializable
+        :type json_encoder: json.JSONEncoder | typedjsonrpc.codec.Codec
         :type debug_url: str | None
         :rtype: InternalError
 
         .. versionadded:: 0.1.0
         .. versionchanged:: 0.2.0
             Stringifies non-JSON-serializable objects
+        .. versionchanged:: 0.5.0
+            Accepts a codec
         """
         exc = exc_info[1]
         data = exc.__dict__.copy()
+        encode_errors = getattr(json_encoder, "encode_errors", TypeError)
         for key, value in data.items():
             try:
                 json_encoder.encode(value)
-            except TypeError:
+            except encode_errors:
                 data[key] = repr(value)
         data["traceback"] = "".join(traceback.format_exception(*exc_info))
         if debug_url is not None:
@@ -142,10 +161,51 @@ class InvalidReturnTypeError(Error):
     status_code = 500
 
 
-_error_code_map = {  # pylint: disable=invalid-name
-    type_.code: type_
-    for type_ in [Error] + Error.__subclasses__()  # pylint: disable=no-member
-}
+class OverloadedError(ServerError):
+    """The method is already handling as many calls as it is allowed to.
+
+    .. versionadded:: 0.5.0
+    """
+    code = -32002
+    message = "Overloaded"
+    status_code = 503
+
+
+class MethodTimeoutError(ServerError):
+    """The method did not finish within its timeout.
+
+    .. versionadded:: 0.5.0
+    """
+    code = -32003
+    message = "Method timed out"
+    status_code = 504
+
+
+class DeadlineExceededError(ServerError):
+    """The deadline of the request passed before the method was called.
+
+    .. versionadded:: 0.5.0
+    """
+    code = -32004
+    message = "Deadline exceeded"
+    status_code = 504
+
+
+def _create_error_code_map():
+    """Maps the code of every error class to the class, preferring base classes for shared codes.
+
+    :rtype: dict[int, type]
+    """
+    error_code_map = {}
+    types = [Error]
+    while types:
+        type_ = types.pop(0)
+        error_code_map.setdefault(type_.code, type_)
+        types.extend(type_.__subclasses__())
+    return error_code_map
+
+
+_error_code_map = _create_error_code_map()  # pylint: disable=invalid-name
 
 
 def get_status_code_from_error_code(error_code):
@@ -154,3 +214,24 @@ def get_status_code_from_error_code(error_code):
     .. versionadded:: 0.4.0
     """
     return _error_code_map[error_code].status_code
+
+
+def get_error_from_error_object(error_object):
+    """Creates the error which matches an error object, for example one received by a client.
+
+    Errors with a code that no error class uses are returned as an :class:`Error` with the code
+    and message of the error object.
+
+    :param error_object: The error object of a response
+    :type error_object: dict[str, object]
+    :rtype: Error
+
+    .. versionadded:: 0.5.0
+    """
+    error_type = _error_code_map.get(error_object.get("code"), Error)
+    error = error_type.from_data(error_object.get("data"))
+    if error_type is Error:
+        error.code = error_object.get("code")
+        error.message = error_object.get("message")
+        error.args = (error.code, error.message, error.data)
+    return error
@@ -0,0 +1,135 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Running the bodies of registered methods on executors."""
+from __future__ import absolute_import, division, print_function
+
+import importlib
+import inspect
+import sys
+
+from . import context
+from .codec import JsonCodec
+from .errors import DeadlineExceededError, Error, InternalError, MethodTimeoutError
+
+__all__ = ["call_in_process", "create_process_invoker", "create_timeout_invoker"]
+
+
+def call_in_process(module_name, method_name, args, kwargs):
+    """Calls a registered method inside a worker process.
+
+    :param module_name: The name of the module which defines the method
+    :type module_name: str
+    :param method_name: The name of the method in its module
+    :type method_name: str
+    :param args: The positional arguments
+    :type args: tuple[object]
+    :param kwargs: The keyword arguments
+    :type kwargs: dict[str, object]
+    :return: ``(True, result)`` on success, otherwise ``(False, (error type, error data))`` where
+        other exceptions are converted with :meth:`typedjsonrpc.errors.InternalError.from_error`
+    :rtype: (bool, object)
+
+    .. versionadded:: 0.5.0
+    """
+    try:
+        method = getattr(importlib.import_module(module_name), method_name)
+        method = getattr(method, "__wrapped__", method)
+        return True, method(*args, **kwargs)
+    except Error as exc:
+        return False, (type(exc), exc.data)
+    except Exception:  # pylint: disable=broad-except
+        error = InternalError.from_error(sys.exc_info(), JsonCodec())
+        return False, (InternalError, error.data)
+
+
+def create_process_invoker(method, process_executor, logger):
+    """Creates a function which calls the given method in a process executor.
+
+    The method is looked up by module and name in the worker process, so only the arguments and
+    the outcome of the call have to be pickled.
+
+    :param method: The method to call
+    :type method: function
+    :param process_executor: The process pool which runs the method
+    :type process_executor: concurrent.futures.ProcessPoolExecutor
+    :param logger: The logger for errors which the method raised in a worker process
+    :type logger: logging.Logger
+    :rtype: function
+    :raises Exception: If the method can't be looked up by name or is a coroutine function
+
+    .. versionadded:: 0.5.0
+    """
+    is_nested = bool(method.__code__.co_flags & inspect.CO_NESTED)
+    if is_nested or getattr(method, "__qualname__", method.__name__) != method.__name__:
+        raise Exception("executor='process' requires a function defined at the top level of "
+                        "its module")
+    is_coroutine_function = getattr(inspect, "iscoroutinefunction", None)
+    if is_coroutine_function is not None and is_coroutine_function(method):
+        raise Exception("executor='process' can't be used with coroutine functions")
+
+    def _invoke(*args, **kwargs):
+        future = process_executor.submit(call_in_process, method.__module__, method.__name__,
+                                         args, kwargs)
+        succeeded, outcome = future.result()
+        if succeeded:
+            return outcome
+        error_type, data = outcome
+        if error_type is InternalError:
+            logger.error("Error in worker process for %s.%s:\n%s",
+                         method.__module__, method.__name__, data["traceback"])
+        raise error_type.from_data(data)
+    return _invoke
+
+
+def create_timeout_invoker(invoke, timeout, name, timeout_executor, on_timeout):
+    """Creates a function which runs a method in the timeout executor and waits for it.
+
+    The thread which handles the request waits for the method, so a timeout only limits how long
+    that thread is held. A method which took too long can't be stopped: it keeps running and
+    occupies a thread of the timeout executor until it returns.
+
+    :param invoke: The function which runs the body of the method
+    :type invoke: function
+    :param timeout: The number of seconds to wait for the method
+    :type timeout: float
+    :param name: The name the method is registered with
+    :type name: str
+    :param timeout_executor: The executor which runs the method
+    :type timeout_executor: concurrent.futures.Executor
+    :param on_timeout: Called with the name and the timeout when a call times out
+    :type on_timeout: (str, float) -> None
+    :rtype: function
+
+    .. versionadded:: 0.5.0
+    """
+    # concurrent.futures is only available on Python 2 with the futures backport.
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+
+    def _invoke_with_timeout(*args, **kwargs):
+        future = timeout_executor.submit(context.call_with_state, context.copy_current_state(),
+                                         invoke, *args, **kwargs)
+        remaining = context.get_remaining_time()
+        try:
+            return future.result(timeout if remaining is None else min(timeout, remaining))
+        except FutureTimeoutError:
+            future.cancel()
+            on_timeout(name, timeout)
+            if remaining is not None and remaining < timeout:
+                raise DeadlineExceededError("The deadline of the request passed during the call")
+            raise MethodTimeoutError("'{}' did not finish within {} seconds"
+                                     .format(name, timeout))
+    return _invoke_with_timeout
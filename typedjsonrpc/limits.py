@@ -0,0 +1,218 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Limits on the number of calls which are handled at the same time."""
+from __future__ import absolute_import, division, print_function
+
+import time
+from collections import namedtuple
+from threading import Condition, Lock
+
+__all__ = ["AdaptiveLimiter", "AdaptiveLimiterInfo", "Bulkhead", "BulkheadInfo"]
+
+
+class BulkheadInfo(namedtuple("BulkheadInfo", ["active", "waiting", "rejected", "max_concurrent",
+                                               "max_waiting"])):
+    """Statistics of a :class:`Bulkhead`.
+
+    :attribute active: The number of calls which are currently running
+    :type active: int
+    :attribute waiting: The number of calls which are currently waiting to run
+    :type waiting: int
+    :attribute rejected: The number of calls which were rejected so far
+    :type rejected: int
+    :attribute max_concurrent: The maximum number of calls which may run at the same time
+    :type max_concurrent: int
+    :attribute max_waiting: The maximum number of calls which may wait to run
+    :type max_waiting: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class Bulkhead(object):
+    """Limits how many calls of one or more methods run at the same time.
+
+    Pass an instance as the ``bulkhead`` of a :class:`typedjsonrpc.method_info.MethodOptions`.
+    Methods which share an instance share its limit. Calls which exceed the limit wait in a
+    bounded queue, and are rejected with :class:`typedjsonrpc.errors.OverloadedError` if the queue
+    is full or they have waited for ``timeout`` seconds.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, max_concurrent, max_waiting=0, timeout=None):
+        """
+        :param max_concurrent: The maximum number of calls which may run at the same time
+        :type max_concurrent: int
+        :param max_waiting: The maximum number of calls which may wait for a running call to end
+        :type max_waiting: int
+        :param timeout: The maximum number of seconds a call waits, or None to wait until it runs
+        :type timeout: float | None
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._condition = Condition()
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    def acquire(self, blocking=True):
+        """Reserves a place for a call.
+
+        :param blocking: Whether the call may wait in the queue
+        :type blocking: bool
+        :return: Whether the call may run. If so, :meth:`release` must be called after it.
+        :rtype: bool
+        """
+        with self._condition:
+            if self._active < self.max_concurrent:
+                self._active += 1
+                return True
+            if not blocking or self._waiting >= self.max_waiting:
+                self._rejected += 1
+                return False
+            self._waiting += 1
+            try:
+                if self._wait_for_place():
+                    self._active += 1
+                    return True
+                self._rejected += 1
+                return False
+            finally:
+                self._waiting -= 1
+
+    def _wait_for_place(self):
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        while self._active >= self.max_concurrent:
+            if deadline is None:
+                self._condition.wait()
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._condition.wait(remaining)
+        return True
+
+    def release(self):
+        """Ends a call which was allowed to run by :meth:`acquire`."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def info(self):
+        """Returns statistics about the calls.
+
+        :rtype: BulkheadInfo
+        """
+        with self._condition:
+            return BulkheadInfo(self._active, self._waiting, self._rejected, self.max_concurrent,
+                                self.max_waiting)
+
+
+class AdaptiveLimiterInfo(namedtuple("AdaptiveLimiterInfo", ["limit", "in_flight", "rejected"])):
+    """Statistics of an :class:`AdaptiveLimiter`.
+
+    :attribute limit: The current maximum number of requests in flight
+    :type limit: int
+    :attribute in_flight: The number of requests which are currently being handled
+    :type in_flight: int
+    :attribute rejected: The number of requests which were rejected so far
+    :type rejected: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class AdaptiveLimiter(object):  # pylint: disable=too-many-instance-attributes
+    """Limits the number of requests in flight to a limit which adapts to the observed latency.
+
+    The limit is adjusted with additive increase and multiplicative decrease (AIMD): a request
+    which is handled within ``latency_threshold`` seconds while at least half of the limit is in
+    use raises the limit by one, and a slower request multiplies it by ``backoff_ratio``. Requests
+    beyond the limit are rejected right away instead of queueing up.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, latency_threshold,  # pylint: disable=too-many-arguments
+                 initial_limit=20, min_limit=1, max_limit=1000, backoff_ratio=0.9, clock=time.time):
+        """
+        :param latency_threshold: The number of seconds above which a request counts as slow
+        :type latency_threshold: float
+        :param initial_limit: The limit to start with
+        :type initial_limit: int
+        :param min_limit: The lowest the limit can get
+        :type min_limit: int
+        :param max_limit: The highest the limit can get
+        :type max_limit: int
+        :param backoff_ratio: The factor to reduce the limit by after a slow request
+        :type backoff_ratio: float
+        :param clock: The function which returns the current time in seconds
+        :type clock: () -> float
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("The limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+        self.latency_threshold = latency_threshold
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self._clock = clock
+        self._lock = Lock()
+        self._limit = initial_limit
+        self._in_flight = 0
+        self._rejected = 0
+
+    def acquire(self):
+        """Admits a request if the limit allows it.
+
+        :return: A token to pass to :meth:`release` once the request is handled, or None if the
+            request is rejected
+        :rtype: float | None
+        """
+        with self._lock:
+            if self._in_flight >= self._limit:
+                self._rejected += 1
+                return None
+            self._in_flight += 1
+        return self._clock()
+
+    def release(self, token):
+        """Records that an admitted request is handled and adjusts the limit to its latency.
+
+        :param token: The token returned by :meth:`acquire`
+        :type token: float
+        """
+        latency = self._clock() - token
+        with self._lock:
+            if latency > self.latency_threshold:
+                self._limit = max(self.min_limit, int(self._limit * self.backoff_ratio))
+            elif self._in_flight * 2 >= self._limit:
+                self._limit = min(self.max_limit, self._limit + 1)
+            self._in_flight -= 1
+
+    def info(self):
+        """Returns the current limit and load.
+
+        :rtype: AdaptiveLimiterInfo
+        """
+        with self._lock:
+            return AdaptiveLimiterInfo(self._limit, self._in_flight, self._rejected)
@@ -17,12 +17,15 @@
 """Data structures for wrapping methods and information about them."""
 from __future__ import absolute_import, division, print_function
 
+import inspect
 from collections import namedtuple
 
-__all__ = ["MethodInfo", "MethodSignature"]
+import six
 
+__all__ = ["CallPlan", "MethodInfo", "MethodOptions", "MethodSignature"]
 
-class MethodInfo(namedtuple("MethodInfo", ["name", "method", "signature"])):
+
+class MethodInfo(namedtuple("MethodInfo", ["name", "method", "signature", "call_plan"])):
     """An object wrapping a method and information about it.
 
     :attribute name: Name of the function
@@ -31,6 +34,8 @@ class MethodInfo(namedtuple("MethodInfo", ["name", "method", "signature"])):
     :type method: function
     :attribute signature: A description of the types this method takes as parameters and returns
     :type signature: MethodSignature
+    :attribute call_plan: The precomputed description of how to call the method
+    :type call_plan: CallPlan
     """
 
     def describe(self):
@@ -77,6 +82,46 @@ class MethodInfo(namedtuple("MethodInfo", ["name", "method", "signature"])):
         return self.method.__doc__
 
 
+class MethodOptions(namedtuple("MethodOptions", ["executor", "cache", "idempotent", "bulkhead",
+                                                 "timeout", "priority"])):
+    """How :meth:`typedjsonrpc.registry.Registry.method` runs a method.
+
+    The options are kept apart from the parameter types of the method so that a parameter can have
+    any name.
+
+    :attribute executor: Where the body of the method runs. If ``"process"``, it runs in the
+        registry's ``process_executor`` while type checking stays in the calling process. The
+        method must then be defined at the top level of its module.
+    :type executor: str | None
+    :attribute cache: If set, results are stored in this cache and calls with the same validated
+        parameters are answered from it
+    :type cache: typedjsonrpc.cache.ResultCache | None
+    :attribute idempotent: If True, entries of a batch which call the method with the same params
+        are executed once and share the response
+    :type idempotent: bool
+    :attribute bulkhead: If set, it limits how many dispatched calls of the method run at the same
+        time. Calls beyond the limit fail with :class:`typedjsonrpc.errors.OverloadedError`. Calls
+        dispatched by an :class:`typedjsonrpc.async_registry.AsyncRegistry` never wait for a place.
+    :type bulkhead: typedjsonrpc.limits.Bulkhead | None
+    :attribute timeout: The number of seconds after which a call fails with
+        :class:`typedjsonrpc.errors.MethodTimeoutError`. The method then runs in the registry's
+        ``timeout_executor`` and is abandoned rather than stopped when it takes too long. Defaults
+        to the registry's ``default_timeout``.
+    :type timeout: float | None
+    :attribute priority: The priority of calls which wait for the registry's executor if it is a
+        :class:`typedjsonrpc.scheduling.PriorityExecutor`. Higher priorities run first. A request
+        can override it with the ``X-Request-Priority`` header.
+    :type priority: int
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __new__(cls, executor=None, cache=None,  # pylint: disable=too-many-arguments
+                idempotent=False, bulkhead=None, timeout=None, priority=0):
+        return super(MethodOptions, cls).__new__(cls, executor, cache, idempotent, bulkhead,
+                                                 timeout, priority)
+
+
 class MethodSignature(namedtuple("MethodSignature", ["parameter_types", "return_type"])):
     """Represents the types which a function takes as input and output.
 
@@ -100,3 +145,59 @@ class MethodSignature(namedtuple("MethodSignature", ["parameter_types", "return_
         """
         ordered_pairs = [(name, parameter_types[name]) for name in parameter_names]
         return MethodSignature(ordered_pairs, return_type)
+
+
+class CallPlan(namedtuple("CallPlan", ["arg_names", "arg_indexes", "defaults", "required_names",
+                                       "has_varargs", "has_kwargs", "parameter_types"])):
+    """An immutable description of how to call a method.
+
+    Call plans are computed once when a method is registered so that dispatching a call never has
+    to introspect the method again.
+
+    :attribute arg_names: The names of the method's named arguments in declaration order
+    :type arg_names: tuple[str]
+    :attribute arg_indexes: The position of each named argument by name
+    :type arg_indexes: dict[str, int]
+    :attribute defaults: The default values by argument name
+    :type defaults: dict[str, object]
+    :attribute required_names: The names of the arguments which do not have a default value
+    :type required_names: tuple[str]
+    :attribute has_varargs: Whether the method accepts ``*args``
+    :type has_varargs: bool
+    :attribute has_kwargs: Whether the method accepts ``**kwargs``
+    :type has_kwargs: bool
+    :attribute parameter_types: The declared types in argument order as (name, type) pairs
+    :type parameter_types: tuple[(str, type)]
+
+    .. versionadded:: 0.5.0
+    """
+
+    @staticmethod
+    def create(method, parameter_types=None):
+        """Returns a call plan for the given method.
+
+        :param method: The method to describe
+        :type method: function
+        :param parameter_types: The declared types of the method's parameters, if any
+        :type parameter_types: dict[str, type] | None
+        :rtype: CallPlan
+        """
+        if six.PY2:
+            argspec = inspect.getargspec(method)  # pylint: disable=deprecated-method
+            kwargs_name = argspec.keywords
+        else:
+            argspec = inspect.getfullargspec(method)  # pylint: disable=no-member
+            kwargs_name = argspec.varkw
+        arg_names = tuple(argspec.args)
+        default_values = argspec.defaults or ()
+        required_count = len(arg_names) - len(default_values)
+        if parameter_types is None:
+            parameter_types = {}
+        return CallPlan(arg_names=arg_names,
+                        arg_indexes={name: index for index, name in enumerate(arg_names)},
+                        defaults=dict(zip(arg_names[required_count:], default_values)),
+                        required_names=arg_names[:required_count],
+                        has_varargs=argspec.varargs is not None,
+                        has_kwargs=kwargs_name is not None,
+                        parameter_types=tuple((name, parameter_types[name])
+                                              for name in arg_names if name in parameter_types))
@@ -17,11 +17,10 @@
 """Logic for checking parameter declarations and parameter types."""
 from __future__ import absolute_import, division, print_function
 
-import inspect
-
 import six
 
 from .errors import InvalidParamsError, InvalidReturnTypeError
+from .method_info import CallPlan
 
 
 def validate_params_match(method, parameters):
@@ -32,27 +31,35 @@ def validate_params_match(method, parameters):
     :param parameters: The parameters to use in the call
     :type parameters: dict[str, object] | list[object]
     """
-    argspec = inspect.getargspec(method)  # pylint: disable=deprecated-method
-    default_length = len(argspec.defaults) if argspec.defaults is not None else 0
+    check_params_match(CallPlan.create(method), parameters)
+
+
+def check_params_match(call_plan, parameters):
+    """Validates that the given parameters are exactly the parameters described by a call plan.
 
+    :param call_plan: The call plan of the method to be called
+    :type call_plan: typedjsonrpc.method_info.CallPlan
+    :param parameters: The parameters to use in the call
+    :type parameters: dict[str, object] | list[object]
+
+    .. versionadded:: 0.5.0
+    """
     if isinstance(parameters, list):
-        if len(parameters) > len(argspec.args) and argspec.varargs is None:
+        if len(parameters) > len(call_plan.arg_names) and not call_plan.has_varargs:
             raise InvalidParamsError("Too many parameters")
 
-        remaining_parameters = len(argspec.args) - len(parameters)
-        if remaining_parameters > default_length:
+        if len(parameters) < len(call_plan.required_names):
             raise InvalidParamsError("Not enough parameters")
 
     elif isinstance(parameters, dict):
-        missing_parameters = [key for key in argspec.args if key not in parameters]
-        default_parameters = set(argspec.args[len(argspec.args) - default_length:])
-        for key in missing_parameters:
-            if key not in default_parameters:
+        for key in call_plan.required_names:
+            if key not in parameters:
                 raise InvalidParamsError("Parameter {} has not been satisfied".format(key))
 
-        extra_params = [key for key in parameters if key not in argspec.args]
-        if len(extra_params) > 0 and argspec.keywords is None:
-            raise InvalidParamsError("Too many parameters")
+        if not call_plan.has_kwargs:
+            for key in parameters:
+                if key not in call_plan.arg_indexes:
+                    raise InvalidParamsError("Too many parameters")
 
 
 def check_types(parameters, parameter_types, strict_floats):
@@ -73,6 +80,94 @@ def check_types(parameters, parameter_types, strict_floats):
                                      .format(parameters[name], name, parameter_type))
 
 
+def create_parameter_validator(call_plan, strict_floats, name="<method>"):
+    """Generates a function which binds and type-checks the arguments of a call.
+
+    The generated function takes the ``args`` tuple and ``kwargs`` dict of a call and returns the
+    values of the typed parameters in argument order. Its source is specialized for the call plan,
+    so a call is checked by straight-line code without iterating over the declared types.
+
+    :param call_plan: The call plan of the method to validate
+    :type call_plan: typedjsonrpc.method_info.CallPlan
+    :param strict_floats: If False, treat integers as floats
+    :type strict_floats: bool
+    :param name: The name of the method, used to label the generated code
+    :type name: str
+    :return: The validator
+    :rtype: (tuple[object], dict[str, object]) -> tuple[object]
+
+    .. versionadded:: 0.5.0
+    """
+    namespace = {
+        "_missing": _raise_missing_parameter,
+        "_invalid": _raise_invalid_parameter,
+    }
+    lines = ["def validate(args, kwargs):",
+             "    nargs = len(args)"]
+    values = []
+    for index, (parameter_name, parameter_type) in enumerate(call_plan.parameter_types):
+        value = "v{}".format(index)
+        position = call_plan.arg_indexes[parameter_name]
+        namespace["t{}".format(index)] = _instance_check_types(parameter_type, strict_floats)
+        namespace["p{}".format(index)] = parameter_type
+        lines.append("    if {!r} in kwargs:".format(parameter_name))
+        lines.append("        {} = kwargs[{!r}]".format(value, parameter_name))
+        lines.append("    elif nargs > {}:".format(position))
+        lines.append("        {} = args[{}]".format(value, position))
+        if parameter_name in call_plan.defaults:
+            namespace["d{}".format(index)] = call_plan.defaults[parameter_name]
+            lines.append("    else:")
+            lines.append("        {} = d{}".format(value, index))
+        else:
+            lines.append("    else:")
+            lines.append("        _missing({!r})".format(parameter_name))
+        lines.append("    if not isinstance({0}, t{1}):".format(value, index))
+        lines.append("        _invalid({0}, {1!r}, p{2})".format(value, parameter_name, index))
+        values.append(value)
+    lines.append("    return ({})".format("".join(value + ", " for value in values)))
+
+    code = compile("\n".join(lines) + "\n", "<typedjsonrpc validator for {}>".format(name), "exec")
+    six.exec_(code, namespace)
+    return namespace["validate"]
+
+
+def create_return_validator(expected_type, strict_floats):
+    """Creates a function which checks that a return value has the correct type.
+
+    :param expected_type: Expected return type
+    :type expected_type: type
+    :param strict_floats: If False, treat integers as floats
+    :type strict_floats: bool
+    :return: The validator
+    :rtype: (object) -> None
+
+    .. versionadded:: 0.5.0
+    """
+    if expected_type is None:
+        def _validate_none(value):
+            if value is not None:
+                raise InvalidReturnTypeError("Returned value is '{}' but None was expected"
+                                             .format(value))
+        return _validate_none
+
+    instance_check_types = _instance_check_types(expected_type, strict_floats)
+
+    def _validate(value):
+        if not isinstance(value, instance_check_types):
+            raise InvalidReturnTypeError("Type of return value '{}' does not match expected type {}"
+                                         .format(value, expected_type))
+    return _validate
+
+
+def _raise_missing_parameter(name):
+    raise InvalidParamsError("Parameter '{}' is missing.".format(name))
+
+
+def _raise_invalid_parameter(value, name, parameter_type):
+    raise InvalidParamsError("Value '{}' for parameter '{}' is not of expected type {}."
+                             .format(value, name, parameter_type))
+
+
 def check_type_declaration(parameter_names, parameter_types):
     """Checks that exactly the given parameter names have declared types.
 
@@ -109,6 +204,15 @@ def check_return_type(value, expected_type, strict_floats):
                                      .format(value, expected_type))
 
 
+def _instance_check_types(expected_type, strict_floats):
+    """Returns the second argument to pass to :func:`isinstance` for the expected type."""
+    if expected_type is float and not strict_floats:
+        return six.integer_types + (float,)
+    if expected_type in six.integer_types:
+        return six.integer_types
+    return expected_type
+
+
 def _is_instance(value, expected_type, strict_floats):
     if expected_type is float and not strict_floats:
         return isinstance(value, (six.integer_types, float))
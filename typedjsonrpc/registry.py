@@ -17,20 +17,38 @@
 """Logic for storing and calling jsonrpc methods."""
 from __future__ import absolute_import, division, print_function
 
+import functools
 import inspect
+import itertools
 import json
 import logging
 import sys
+import threading
+from collections import deque
 
 import six
 import wrapt
 from werkzeug.debug.tbtools import get_current_traceback
 
 import typedjsonrpc.parameter_checker as parameter_checker
-from .errors import Error, InternalError, InvalidRequestError, MethodNotFoundError, ParseError
-from .method_info import MethodInfo, MethodSignature
-
-__all__ = ["Registry"]
+from . import context
+from .batch_reader import BatchReader
+from .batching import BatchMethod, BatchMethodOptions, dispatch_group, group_calls
+from .cache import SingleFlight, make_key
+from .codec import JsonCodec
+from .deduplication import deduplicate_messages, iter_shared_results, share_results
+from .errors import (DeadlineExceededError, Error, InternalError, InvalidRequestError,
+                     MethodNotFoundError, OverloadedError, ParseError)
+from .executors import create_process_invoker, create_timeout_invoker
+from .method_info import CallPlan, MethodInfo, MethodOptions, MethodSignature
+from .responses import (DispatchResult, collect_results, create_error_response,
+                        create_result_response, iter_error_responses)
+from .streaming import (Stream, StreamResult, check_stream_options, create_stream_invoker,
+                        iter_encoded_stream)
+
+__all__ = ["DispatchResult", "Registry"]
+
+DEFAULT_MAX_BATCH_PARALLELISM = 8
 
 
 def _get_default_logger():
@@ -41,6 +59,20 @@ def _get_default_logger():
     return logger
 
 
+class _CompletedFuture(object):  # pylint: disable=too-few-public-methods
+    """Stands in for a future whose result is already known."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        """Returns the known result.
+
+        :rtype: object
+        """
+        return self._result
+
+
 class Registry(object):
     """The registry for storing and calling jsonrpc methods.
 
@@ -68,22 +100,95 @@ class Registry(object):
 
     def __init__(self,
                  debug=False,
-                 strict_floats=True):
+                 strict_floats=True,
+                 executor=None,
+                 max_batch_parallelism=DEFAULT_MAX_BATCH_PARALLELISM,
+                 process_executor=None,
+                 codec=None,
+                 coalesce_calls=False,
+                 timeout_executor=None,
+                 default_timeout=None):
         """
         :param debug: If True, the registry records tracebacks for debugging purposes
         :type debug: bool
         :param strict_floats: If True, the registry does not allow ints as float parameters
         :type strict_floats: bool
+        :param executor: If set, the entries of a batch are dispatched concurrently on this
+            executor. A :class:`typedjsonrpc.scheduling.PriorityExecutor` runs them by the priority
+            of their method and the deadline of their request.
+        :type executor: concurrent.futures.Executor | None
+        :param max_batch_parallelism: The maximum number of entries of a single batch which are
+            submitted to the executor at the same time
+        :type max_batch_parallelism: int
+        :param process_executor: The process pool which runs methods registered with
+            ``executor="process"``
+        :type process_executor: concurrent.futures.ProcessPoolExecutor | None
+        :param codec: The codec for requests and responses. Defaults to a
+            :class:`typedjsonrpc.codec.JsonCodec` using :attr:`json_encoder` and
+            :attr:`json_decoder`.
+        :type codec: typedjsonrpc.codec.Codec | None
+        :param coalesce_calls: If True, dispatched calls of a method with the same parameters
+            which run at the same time share a single execution and its result or error. This is
+            only safe if the registered methods have no side effects. Calls dispatched by an
+            :class:`typedjsonrpc.async_registry.AsyncRegistry` are not coalesced.
+        :type coalesce_calls: bool
+        :param timeout_executor: The executor which runs methods with a timeout, so that the calling
+            thread can stop waiting for them. It must not be the same as ``executor``.
+        :type timeout_executor: concurrent.futures.Executor | None
+        :param default_timeout: The timeout in seconds of methods registered with :meth:`method`
+            which don't specify their own
+        :type default_timeout: float | None
 
         .. versionchanged:: 0.4.0 Added strict_floats option
+        .. versionchanged:: 0.5.0 Added executor, max_batch_parallelism, process_executor, codec,
+            coalesce_calls, timeout_executor and default_timeout options
         """
+        if max_batch_parallelism < 1:
+            raise ValueError("max_batch_parallelism must be at least 1")
         self._name_to_method_info = {}
+        self._name_to_cache = {}
+        self._idempotent_method_names = set()
+        self._name_to_batch_method = {}
+        self._name_to_bulkhead = {}
+        self._name_to_priority = {}
+        self._stream_method_names = set()
         self._register_describe()
         self.debug = debug
         self._strict_floats = strict_floats
+        self._executor = executor
+        self._max_batch_parallelism = max_batch_parallelism
+        self._process_executor = process_executor
+        self._codec = codec
+        self._default_codec = JsonCodec(self.json_encoder, self.json_decoder)
+        self._single_flight = SingleFlight() if coalesce_calls else None
+        self._timeout_executor = timeout_executor
+        self._default_timeout = default_timeout
+        self._counter_lock = threading.Lock()
+        self._deduplicated_calls = 0
+        self._timed_out_calls = 0
         self._logger = _get_default_logger()
         self.tracebacks = {}
 
+    @property
+    def codec(self):
+        """The codec for requests and responses.
+
+        Unless a codec was given to the registry, this is a :class:`typedjsonrpc.codec.JsonCodec`
+        which uses the current :attr:`json_encoder` and :attr:`json_decoder`.
+
+        :rtype: typedjsonrpc.codec.Codec
+
+        .. versionadded:: 0.5.0
+        """
+        if self._codec is not None:
+            return self._codec
+        default_codec = self._default_codec
+        is_current = (default_codec.encoder is self.json_encoder,
+                      default_codec.decoder is self.json_decoder)
+        if not all(is_current):
+            default_codec = self._default_codec = JsonCodec(self.json_encoder, self.json_decoder)
+        return default_codec
+
     def _register_describe(self):
         def _describe():
             return self.describe()
@@ -102,74 +207,389 @@ class Registry(object):
 
         .. versionadded:: 0.1.0
         """
+        return self.dispatch_response(request).body
+
+    def dispatch_response(self, request, stream=False, incremental=False):
+        """Takes a request and dispatches its data to a jsonrpc method.
+
+        Unlike :meth:`dispatch`, this also describes the outcome of the request so that callers do
+        not have to parse the encoded response.
+
+        :param request: a werkzeug request with json data
+        :type request: werkzeug.wrappers.Request
+        :param stream: If True, the entries of a batch are dispatched and encoded one by one while
+            the chunks of the result are consumed, so that the first response can be sent before
+            the last entry is done
+        :type stream: bool
+        :param incremental: If True and the request has a ``stream``, the entries of a batch are
+            read from it one at a time while they are dispatched. The response is then always
+            streamed, and identical entries are not deduplicated.
+        :type incremental: bool
+        :return: The encoded response and its outcome
+        :rtype: typedjsonrpc.responses.DispatchResult
+
+        .. versionadded:: 0.5.0
+        """
         def _wrapped():
-            messages = self._get_request_messages(request)
-            results = [self._dispatch_and_handle_errors(message) for message in messages]
-            non_notification_results = [x for x in results if x is not None]
-            if len(non_notification_results) == 0:
-                return None
-            elif len(messages) == 1:
-                return non_notification_results[0]
-            else:
-                return non_notification_results
+            if incremental and getattr(request, "stream", None) is not None:
+                return self._dispatch_incrementally(request.stream)
+            return self._dispatch_parsed_messages(self._get_request_messages(request), stream)
+
+        result, is_error = self._handle_exceptions(_wrapped)
+        return self._create_dispatch_result(result) if is_error else result
+
+    def _dispatch_parsed_messages(self, messages, stream):
+        if stream and len(messages) > 1 and self._has_response(messages):
+            return self._create_streamed_result(messages)
+        unique_messages, sources = self._deduplicate_messages(messages)
+        results = share_results(messages, unique_messages, sources,
+                                self._dispatch_messages(unique_messages))
+        return self._create_dispatch_result(collect_results(messages, results))
+
+    def _dispatch_incrementally(self, stream):
+        """Dispatches the entries of a batch while they are read from the stream.
+
+        An entry which cannot be parsed ends the batch. Its error is the last response. The entries
+        are dispatched until the first response is produced, so that a batch which only contains
+        notifications has no response, like it does when it is read at once.
+
+        :param stream: The stream of the request body
+        :type stream: io.RawIOBase
+        :rtype: DispatchResult
+        """
+        reader = BatchReader(stream, self.codec)
+        messages = iter(reader)
+        head = list(itertools.islice(messages, 2))
+        if not reader.is_batch or len(head) < 2:
+            return self._dispatch_parsed_messages(head, False)
+
+        state = context.copy_current_state()
+        parse_errors = []
+
+        def _read_messages():
+            try:
+                for message in itertools.chain(head, messages):
+                    yield message
+            except ParseError as exc:
+                parse_errors.append(exc)
+
+        results = itertools.chain(self._iter_dispatch_messages(_read_messages(), state),
+                                  iter_error_responses(parse_errors))
+        chunks = self._iter_encoded_batch(results)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return DispatchResult(None, False, None)
+        return DispatchResult(itertools.chain([first_chunk], chunks), True, None)
+
+    @staticmethod
+    def _has_response(messages):
+        return any(not isinstance(message, dict) or "id" in message for message in messages)
+
+    def _create_streamed_result(self, messages):
+        """Creates a result whose chunks dispatch and encode the messages lazily.
+
+        :param messages: The parsed request messages, of which at least one is not a notification
+        :type messages: list[object]
+        :rtype: DispatchResult
+        """
+        state = context.copy_current_state()
+        unique_messages, sources = self._deduplicate_messages(messages)
+        grouped_results = self._dispatch_grouped_calls(unique_messages)
+        results = iter_shared_results(messages, unique_messages, sources,
+                                      self._iter_dispatch_messages(unique_messages, state,
+                                                                   grouped_results))
+        return DispatchResult(self._iter_encoded_batch(results), True, None)
+
+    def _deduplicate_messages(self, messages):
+        unique_messages, sources = deduplicate_messages(messages, self._get_idempotent_call_key)
+        if len(unique_messages) < len(messages):
+            with self._counter_lock:
+                self._deduplicated_calls += len(messages) - len(unique_messages)
+        return unique_messages, sources
+
+    def _get_idempotent_call_key(self, msg):
+        if Registry._get_method_name(msg) not in self._idempotent_method_names:
+            return None
+        try:
+            # An invalid message must get its own error rather than the response of a valid twin.
+            self._check_request(msg)
+            return msg["method"], make_key(msg.get("params"))
+        except (Error, TypeError):
+            return None
+
+    @staticmethod
+    def _get_method_name(msg):
+        """Returns the name of the method a message calls if it is well-formed enough to have one.
+
+        :param msg: The parsed request message
+        :type msg: object
+        :rtype: str | None
+        """
+        if isinstance(msg, dict) and isinstance(msg.get("method"), six.string_types):
+            return msg["method"]
+        return None
+
+    @property
+    def deduplicated_calls(self):
+        """The number of batch entries which shared the response of an identical entry instead of
+        being executed.
+
+        :rtype: int
+
+        .. versionadded:: 0.5.0
+        """
+        return self._deduplicated_calls
+
+    @property
+    def timed_out_calls(self):
+        """The number of calls which did not finish within their timeout.
 
-        result, _ = self._handle_exceptions(_wrapped)
-        if result is not None:
-            return self._encode_complete_result(result)
+        :rtype: int
+
+        .. versionadded:: 0.5.0
+        """
+        return self._timed_out_calls
+
+    def _create_dispatch_result(self, result):
+        if result is None:
+            return DispatchResult(None, False, None)
+        if isinstance(result, list):
+            if any(isinstance(response.get("result"), StreamResult) for response in result):
+                return DispatchResult(self._iter_encoded_batch(result), True, None)
+            return DispatchResult(list(self._iter_encoded_batch(result)), True, None)
+        if isinstance(result.get("result"), StreamResult):
+            return DispatchResult(iter_encoded_stream(result, self.codec, self._logger), False,
+                                  None)
+        encoded, response = self._encode_single_result(result)
+        if isinstance(response, dict) and "error" in response:
+            return DispatchResult([encoded], False, response["error"]["code"])
+        return DispatchResult([encoded], False, None)
+
+    def _dispatch_messages(self, messages):
+        """Dispatches every message and returns the responses in the order of the messages.
+
+        If the registry has an executor, the messages are dispatched on it with at most
+        ``max_batch_parallelism`` of them in flight at once.
+
+        :param messages: The parsed request messages
+        :type messages: list[object]
+        :return: The response for each message, or None for notifications
+        :rtype: list[dict[str, object] | None]
+        """
+        grouped_results = self._dispatch_grouped_calls(messages)
+        if grouped_results:
+            return list(self._iter_dispatch_messages(messages, context.copy_current_state(),
+                                                     grouped_results))
+        if self._executor is None or len(messages) < 2:
+            return [self._dispatch_and_handle_errors(message) for message in messages]
+        return list(self._iter_dispatch_messages(messages, context.copy_current_state()))
+
+    def _iter_dispatch_messages(self, messages, state, grouped_results=None):
+        """Dispatches the messages lazily and yields the responses in the order of the messages.
+
+        :param messages: The parsed request messages
+        :type messages: collections.Iterable[object]
+        :param state: The request-scoped state to dispatch the messages with
+        :type state: dict[str, object]
+        :param grouped_results: The responses of the messages which were already dispatched by
+            their index
+        :type grouped_results: dict[int, dict[str, object] | None] | None
+        :return: The response for each message, or None for notifications
+        :rtype: collections.Iterator[dict[str, object] | None]
+        """
+        if grouped_results is None:
+            grouped_results = {}
+        if self._executor is None:
+            for index, message in enumerate(messages):
+                if index in grouped_results:
+                    yield grouped_results.pop(index)
+                else:
+                    yield context.call_with_state(state, self._dispatch_and_handle_errors, message)
+            return
+
+        pending = deque()
+        for index, message in enumerate(messages):
+            if len(pending) >= self._max_batch_parallelism:
+                yield pending.popleft().result()
+            if index in grouped_results:
+                pending.append(_CompletedFuture(grouped_results.pop(index)))
+            else:
+                pending.append(self._submit(state, message))
+        while pending:
+            yield pending.popleft().result()
+
+    def _submit(self, state, message):
+        """Submits a message to the executor, with its priority if the executor supports it.
+
+        :param state: The request-scoped state to dispatch the message with
+        :type state: dict[str, object]
+        :param message: The parsed request message
+        :type message: object
+        :rtype: concurrent.futures.Future
+        """
+        submit_prioritized = getattr(self._executor, "submit_prioritized", None)
+        if submit_prioritized is None:
+            return self._executor.submit(context.call_with_state, state,
+                                         self._dispatch_and_handle_errors, message)
+        priority = context.call_with_state(state, context.get_priority)
+        if priority is None:
+            priority = self._name_to_priority.get(Registry._get_method_name(message), 0)
+        return submit_prioritized(priority, context.call_with_state(state, context.get_deadline),
+                                  context.call_with_state, state,
+                                  self._dispatch_and_handle_errors, message)
+
+    def _dispatch_grouped_calls(self, messages):
+        """Dispatches the entries of a batch which call the same batch method together.
+
+        :param messages: The parsed request messages
+        :type messages: list[object]
+        :return: The responses of the dispatched messages by index
+        :rtype: dict[int, dict[str, object] | None]
+        """
+        results = {}
+        for batch_method, indexed_messages in group_calls(messages, self._name_to_batch_method):
+            results.update(self._dispatch_group(batch_method, indexed_messages))
+        return results
+
+    def _dispatch_group(self, batch_method, indexed_messages):
+        """Makes all calls to one batch method with a single invocation.
+
+        :param batch_method: The batch method
+        :type batch_method: typedjsonrpc.batching.BatchMethod
+        :param indexed_messages: The messages calling the method with their indexes
+        :type indexed_messages: list[(int, dict[str, object])]
+        :return: The responses of the messages by index
+        :rtype: dict[int, dict[str, object] | None]
+        """
+        results = {}
+        calls = []
+        for index, message in indexed_messages:
+            arguments, is_error = self._handle_exceptions(
+                functools.partial(self._bind_batch_call, batch_method, message),
+                "id" not in message, self._get_id_if_known(message))
+            if is_error:
+                results[index] = arguments
+            else:
+                calls.append((index, message, arguments))
+        if calls:
+            indexes, call_messages, call_arguments = zip(*calls)
+            responses = dispatch_group(batch_method, list(zip(call_messages, call_arguments)),
+                                       self._handle_exception)
+            results.update(zip(indexes, responses))
+        return results
+
+    def _bind_batch_call(self, batch_method, msg):
+        _, args, kwargs = self._prepare_call(msg)
+        return batch_method.bind(args, kwargs)
 
     def _dispatch_and_handle_errors(self, msg):
         is_notification = isinstance(msg, dict) and "id" not in msg
 
         def _wrapped():
             result = self._dispatch_message(msg)
+            if isinstance(result, StreamResult):
+                Registry._start_stream(result, is_notification)
             if not is_notification:
-                return Registry._create_result_response(msg["id"], result)
+                return create_result_response(msg["id"], result)
 
         result, _ = self._handle_exceptions(_wrapped, is_notification, self._get_id_if_known(msg))
         return result
 
+    @staticmethod
+    def _start_stream(result, is_notification):
+        """Takes the first item of a stream result so that early errors become error responses.
+        The stream of a notification is consumed right away, because nothing else consumes it.
+        """
+        if is_notification:
+            for _ in result:
+                pass
+        else:
+            result.start()
+
     def _handle_exceptions(self, method, is_notification=False, msg_id=None):
         try:
             return method(), False
-        except Error as exc:
-            if not is_notification:
-                if self.debug:
-                    debug_url = self._store_traceback()
-                    exc.data = {"message": exc.data, "debug_url": debug_url}
-                return Registry._create_error_response(msg_id, exc), True
         except Exception as exc:  # pylint: disable=broad-except
-            if not is_notification:
-                exc_info = sys.exc_info()
-                if self.debug:
-                    debug_url = self._store_traceback()
-                else:
-                    debug_url = None
-                exception_message = "id: {}, debug_url: {}".format(msg_id, debug_url)
-                self._logger.exception(exception_message)
-                new_error = InternalError.from_error(exc_info, self.json_encoder, debug_url)
-                return Registry._create_error_response(msg_id, new_error), True
+            return self._handle_exception(exc, is_notification, msg_id), True
 
-    def _encode_complete_result(self, result):
-        if isinstance(result, list):
-            return '[' + ','.join([self._encode_single_result(res) for res in result]) + ']'
+    def _handle_exception(self, exc, is_notification=False, msg_id=None):
+        """Creates the error response for the exception which is currently being handled.
+
+        This must be called from within the ``except`` block handling the exception.
+
+        :param exc: The exception
+        :type exc: Exception
+        :param is_notification: Whether the failed message was a notification
+        :type is_notification: bool
+        :param msg_id: The id of the failed message if known
+        :type msg_id: str | int | None
+        :return: The error response, or None for notifications
+        :rtype: dict[str, object] | None
+        """
+        if is_notification:
+            return None
+        if isinstance(exc, Error):
+            if self.debug:
+                debug_url = self._store_traceback()
+                exc.data = {"message": exc.data, "debug_url": debug_url}
+            return create_error_response(msg_id, exc)
+        exc_info = sys.exc_info()
+        if self.debug:
+            debug_url = self._store_traceback()
         else:
-            return self._encode_single_result(result)
+            debug_url = None
+        exception_message = "id: {}, debug_url: {}".format(msg_id, debug_url)
+        self._logger.exception(exception_message)
+        new_error = InternalError.from_error(exc_info, self.codec, debug_url)
+        return create_error_response(msg_id, new_error)
+
+    def _iter_encoded_batch(self, results):
+        """Encodes responses one at a time as the pieces of a JSON array.
+
+        :param results: The responses to encode, where notifications are None
+        :type results: collections.Iterable[dict[str, object] | None]
+        :return: The pieces of the encoded JSON array, or nothing if all responses are None
+        :rtype: collections.Iterator[bytes]
+        """
+        separator = b"["
+        for result in results:
+            if result is None:
+                continue
+            yield separator
+            if isinstance(result.get("result"), StreamResult):
+                for chunk in iter_encoded_stream(result, self.codec, self._logger):
+                    yield chunk
+            else:
+                yield self._encode_single_result(result)[0]
+            separator = b","
+        if separator == b",":
+            yield b"]"
 
     def _encode_single_result(self, result):
+        """Encodes a single response.
+
+        :param result: The response to encode
+        :type result: dict[str, object]
+        :return: The UTF-8 encoded response and the response which was actually encoded, which is
+            an error response if the original response could not be encoded
+        :rtype: (bytes, dict[str, object])
+        """
         msg_id = Registry._get_id_if_known(result)
         is_notification = msg_id is None
 
+        codec = self.codec
+
         def _encode():
-            return self.json_encoder.encode(result)
+            return codec.encode(result)
 
         encoded, is_error = self._handle_exceptions(_encode,
                                                     is_notification=is_notification,
                                                     msg_id=msg_id)
         if is_error:
             # Fall back to default because previous encoding didn't work.
-            return self.json_encoder.encode(encoded)
+            return codec.encode(encoded), encoded
         else:
-            return encoded
+            return encoded, result
 
     def _store_traceback(self):
         traceback = get_current_traceback(skip=1,
@@ -186,34 +606,52 @@ class Registry(object):
             return None
 
     def _dispatch_message(self, msg):
+        method_info, args, kwargs = self._prepare_call(msg)
+        bulkhead = self._name_to_bulkhead.get(method_info.name)
+        if bulkhead is None:
+            return self._call_method(msg, method_info, args, kwargs)
+        self._acquire_bulkhead(bulkhead, method_info.name)
+        try:
+            return self._call_method(msg, method_info, args, kwargs)
+        finally:
+            bulkhead.release()
+
+    def _call_method(self, msg, method_info, args, kwargs):
+        if self._single_flight is None or method_info.name in self._stream_method_names:
+            return method_info.method(*args, **kwargs)
+        key = (method_info.name, make_key(msg.get("params")))
+        return self._single_flight.call(key, lambda: method_info.method(*args, **kwargs))
+
+    @staticmethod
+    def _acquire_bulkhead(bulkhead, name, blocking=True):
+        if not bulkhead.acquire(blocking):
+            raise OverloadedError("Too many concurrent calls to '{}'".format(name))
+
+    @staticmethod
+    def _check_deadline():
+        if context.get_remaining_time() == 0:
+            raise DeadlineExceededError("The deadline of the request passed before the call")
+
+    def _prepare_call(self, msg):
+        """Checks a request message and determines how to call its method.
+
+        :param msg: The request message
+        :type msg: dict[str, object]
+        :return: The method info, the positional arguments and the keyword arguments
+        :rtype: (MethodInfo, list[object], dict[str, object])
+        """
         self._check_request(msg)
-        method = self._name_to_method_info[msg["method"]].method
+        Registry._check_deadline()
+        method_info = self._name_to_method_info[msg["method"]]
         params = msg.get("params", [])
-        parameter_checker.validate_params_match(method, params)
+        parameter_checker.check_params_match(method_info.call_plan, params)
         if isinstance(params, list):
-            result = method(*params)
+            return method_info, params, {}
         elif isinstance(params, dict):
-            result = method(**params)
+            return method_info, (), params
         else:
             raise InvalidRequestError("Given params '{}' are neither a list nor a dict."
                                       .format(msg["params"]))
-        return result
-
-    @staticmethod
-    def _create_result_response(msg_id, result):
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": result,
-        }
-
-    @staticmethod
-    def _create_error_response(msg_id, exc):
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "error": exc.as_error_object(),
-        }
 
     def register(self, name, method, method_signature=None):
         """Registers a method with a given name and signature.
@@ -229,9 +667,13 @@ class Registry(object):
         """
         if inspect.ismethod(method):
             raise Exception("typedjsonrpc does not support making class methods into endpoints")
-        self._name_to_method_info[name] = MethodInfo(name, method, method_signature)
+        parameter_types = dict(method_signature.parameter_types) if method_signature else None
+        self._register(name, method, method_signature, CallPlan.create(method, parameter_types))
 
-    def method(self, returns, **parameter_types):
+    def _register(self, name, method, method_signature, call_plan):
+        self._name_to_method_info[name] = MethodInfo(name, method, method_signature, call_plan)
+
+    def method(self, returns, options=None, **parameter_types):
         """Syntactic sugar for registering a method
 
         Example:
@@ -241,80 +683,259 @@ class Registry(object):
             ... def add(x, y):
             ...     return x + y
 
-        :param returns: The method's return type
-        :type returns: type
+        :param returns: The method's return type. With a :class:`typedjsonrpc.streaming.Stream`,
+            the method returns an iterable whose items are type-checked and encoded one at a time.
+            Such methods can't use the executor, cache, idempotent, bulkhead or timeout options,
+            and the registry's ``default_timeout`` doesn't apply to them.
+        :type returns: type | typedjsonrpc.streaming.Stream
+        :param options: How the method is run. Anything else is the type of a parameter named
+            ``options``.
+        :type options: typedjsonrpc.method_info.MethodOptions | None
         :param parameter_types: The types of the method's parameters
         :type parameter_types: dict[str, type]
 
         .. versionadded:: 0.1.0
+        .. versionchanged:: 0.5.0 Added options
         """
-        @wrapt.decorator
-        def type_check_wrapper(method, instance, args, kwargs):
-            """Wraps a method so that it is type-checked.
+        options = Registry._split_options(options, MethodOptions, parameter_types)
+        executor, cache, idempotent, bulkhead, timeout, priority = options
+        if executor not in (None, "process"):
+            raise Exception("Unknown executor '{}'".format(executor))
+        if executor == "process" and self._process_executor is None:
+            raise Exception("executor='process' requires a registry with a process_executor")
+        if isinstance(returns, Stream):
+            check_stream_options(executor, cache, idempotent, bulkhead, timeout)
+        elif timeout is None:
+            timeout = self._default_timeout
 
-            :param method: The method to wrap
-            :type method: (T) -> U
-            :return: The result of calling the method with the given parameters
-            :rtype: U
+        def register_method(method):
+            """Registers a method with its fully qualified name.
+
+            :param method: The method to register
+            :type method: function
+            :return: The original method wrapped into a type-checker
+            :rtype: function
             """
-            if instance is not None:
-                raise Exception("Instance shouldn't be set.")
+            call_plan = CallPlan.create(method, parameter_types)
+            parameter_checker.check_type_declaration(call_plan.arg_names, parameter_types)
+            fully_qualified_name = "{}.{}".format(method.__module__, method.__name__)
+            validate_parameters = parameter_checker.create_parameter_validator(
+                call_plan, self._strict_floats, fully_qualified_name)
+            if executor == "process":
+                invoke = create_process_invoker(method, self._process_executor, self._logger)
+            else:
+                invoke = method
+            if timeout is not None:
+                invoke = self._create_timeout_invoker(invoke, timeout, fully_qualified_name)
+            invoke, validate_return = self._create_return_handling(method, invoke, returns,
+                                                                   fully_qualified_name)
+
+            self._store_dispatch_options(fully_qualified_name, call_plan, cache, idempotent,
+                                         bulkhead, priority)
+            wrapped_method = self._create_type_check_wrapper(method, invoke, validate_parameters,
+                                                             validate_return, cache)
+            self._register(fully_qualified_name, wrapped_method,
+                           MethodSignature.create(call_plan.arg_names, parameter_types, returns),
+                           call_plan)
+            return wrapped_method
 
-            parameter_names = inspect.getargspec(method).args  # pylint: disable=deprecated-method
-            defaults = inspect.getargspec(method).defaults  # pylint: disable=deprecated-method
-            parameters = self._collect_parameters(parameter_names, args, kwargs, defaults)
+        return register_method
 
-            parameter_checker.check_types(parameters, parameter_types, self._strict_floats)
+    def batch_method(self, returns, options=None, **parameter_types):
+        """Registers a method which receives all calls to it from a batch at once.
 
-            result = method(*args, **kwargs)
-            parameter_checker.check_return_type(result, returns, self._strict_floats)
+        The method is called with a list containing a dict of validated arguments for each call
+        and must return a list with the result of each call in the same order. A result may be an
+        :class:`Exception` instance, which is returned as the error of that call only.
 
-            return result
+        Example:
+
+            >>> registry = Registry()
+            >>> @registry.batch_method(returns=str, user_id=int)
+            ... def get_user_name(calls):
+            ...     names = load_names([call["user_id"] for call in calls])
+            ...     return [names.get(call["user_id"], KeyError(call["user_id"])) for call in calls]
+
+        All parameters are required. Params can only be positional if there is a single parameter,
+        because the order of keyword arguments isn't preserved before Python 3.6.
+
+        :param returns: The return type of a single call
+        :type returns: type
+        :param options: How the method is run. Anything else is the type of a parameter named
+            ``options``.
+        :type options: typedjsonrpc.batching.BatchMethodOptions | None
+        :param parameter_types: The types of the parameters of a single call
+        :type parameter_types: dict[str, type]
+        :return: A decorator which registers the method and returns it unchanged
+        :rtype: ((list[dict[str, object]]) -> list[object]) -> function
+
+        .. versionadded:: 0.5.0
+        """
+        micro_batcher = Registry._split_options(options, BatchMethodOptions,
+                                                parameter_types).micro_batcher
 
         def register_method(method):
-            """Registers a method with its fully qualified name.
+            """Registers a batch method with its fully qualified name.
 
-            :param method: The method to register
-            :type method: function
-            :return: The original method wrapped into a type-checker
+            :param method: The implementation to register
+            :type method: (list[dict[str, object]]) -> list[object]
+            :return: The implementation unchanged
             :rtype: function
             """
-            parameter_names = inspect.getargspec(method).args  # pylint: disable=deprecated-method
-            parameter_checker.check_type_declaration(parameter_names, parameter_types)
-
-            wrapped_method = type_check_wrapper(method, None, None, None)
             fully_qualified_name = "{}.{}".format(method.__module__, method.__name__)
-            self.register(fully_qualified_name, wrapped_method,
-                          MethodSignature.create(parameter_names, parameter_types, returns))
-            return wrapped_method
+            call_plan = BatchMethod.create_call_plan(parameter_types)
+            validate_parameters = parameter_checker.create_parameter_validator(
+                call_plan, self._strict_floats, fully_qualified_name)
+            validate_return = parameter_checker.create_return_validator(returns,
+                                                                        self._strict_floats)
+            batch_method = BatchMethod(fully_qualified_name, method, call_plan,
+                                       validate_parameters, validate_return, micro_batcher)
+            self._name_to_batch_method[fully_qualified_name] = batch_method
+            self._register(fully_qualified_name, batch_method,
+                           MethodSignature.create(call_plan.arg_names, parameter_types, returns),
+                           call_plan)
+            return method
 
         return register_method
 
     @staticmethod
-    def _collect_parameters(parameter_names, args, kwargs, defaults):
-        """Creates a dictionary mapping parameters names to their values in the method call.
-
-        :param parameter_names: The method's parameter names
-        :type parameter_names: list[string]
-        :param args: *args passed into the method
-        :type args: list[object]
-        :param kwargs: **kwargs passed into the method
-        :type kwargs: dict[string, object]
-        :param defaults: The method's default values
-        :type defaults: list[object]
-        :return: Dictionary mapping parameter names to values
-        :rtype: dict[string, object]
-        """
-        parameters = {}
-        if defaults is not None:
-            zipped_defaults = zip(reversed(parameter_names), reversed(defaults))
-            for name, default in zipped_defaults:
-                parameters[name] = default
-        for name, value in zip(parameter_names, args):
-            parameters[name] = value
-        for name, value in kwargs.items():
-            parameters[name] = value
-        return parameters
+    def _split_options(options, options_type, parameter_types):
+        """Returns the options of a method, and moves a parameter named ``options`` into the
+        parameter types.
+
+        :param options: The options argument of the decorator
+        :type options: object
+        :param options_type: The type of the options
+        :type options_type: type
+        :param parameter_types: The declared types of the method's parameters
+        :type parameter_types: dict[str, type]
+        :rtype: typedjsonrpc.method_info.MethodOptions | typedjsonrpc.batching.BatchMethodOptions
+        """
+        if options is None:
+            return options_type()
+        if isinstance(options, options_type):
+            return options
+        parameter_types["options"] = options
+        return options_type()
+
+    def _create_return_handling(self, method, invoke, returns, name):
+        """Creates the function which runs the body of a method and the validator for the values
+        it returns.
+
+        :param method: The method
+        :type method: function
+        :param invoke: The function which runs the body of the method
+        :type invoke: function
+        :param returns: The method's return type
+        :type returns: type | typedjsonrpc.streaming.Stream
+        :param name: The name the method is registered with
+        :type name: str
+        :rtype: (function, (object) -> None)
+        """
+        if not isinstance(returns, Stream):
+            return invoke, parameter_checker.create_return_validator(returns, self._strict_floats)
+        self._stream_method_names.add(name)
+        return create_stream_invoker(method, invoke, returns, self._strict_floats)
+
+    def _store_dispatch_options(self, name, call_plan,  # pylint: disable=too-many-arguments
+                                cache, idempotent, bulkhead, priority):
+        if cache is not None:
+            cache.bind(call_plan)
+            self._name_to_cache[name] = cache
+        if idempotent:
+            self._idempotent_method_names.add(name)
+        if bulkhead is not None:
+            self._name_to_bulkhead[name] = bulkhead
+        if priority:
+            self._name_to_priority[name] = priority
+
+    @staticmethod
+    def _create_type_check_wrapper(method, invoke, validate_parameters, validate_return,
+                                   cache=None):
+        """Wraps a method so that it is type-checked and, optionally, its results are cached.
+
+        :param method: The method to wrap
+        :type method: (T) -> U
+        :param invoke: The function which runs the body of the method
+        :type invoke: (T) -> U
+        :param validate_parameters: The validator for the method's parameters
+        :type validate_parameters: (tuple[object], dict[str, object]) -> tuple[object]
+        :param validate_return: The validator for the method's return value
+        :type validate_return: (U) -> None
+        :param cache: The cache for the method's results
+        :type cache: typedjsonrpc.cache.ResultCache | None
+        :return: The wrapped method
+        :rtype: (T) -> U
+        """
+        @wrapt.decorator
+        def type_check_wrapper(method, instance, args, kwargs):  # pylint: disable=unused-argument
+            """Type-checks a call of the wrapped method and, if it has a cache, looks up its result.
+            """
+            if instance is not None:
+                raise Exception("Instance shouldn't be set.")
+
+            values = validate_parameters(args, kwargs)
+            key = None if cache is None else cache.make_key(values, args, kwargs)
+            if key is not None:
+                found, result = cache.get(key)
+                if found:
+                    return result
+            result = invoke(*args, **kwargs)
+            validate_return(result)
+            if key is not None:
+                cache.put(key, result)
+            return result
+
+        return type_check_wrapper(method, None, None, None)
+
+    def get_coalescing_info(self):
+        """Returns statistics about the coalescing of dispatched calls.
+
+        :rtype: typedjsonrpc.cache.SingleFlightInfo
+        :raises Exception: If the registry does not coalesce calls
+
+        .. versionadded:: 0.5.0
+        """
+        if self._single_flight is None:
+            raise Exception("The registry does not coalesce calls")
+        return self._single_flight.info()
+
+    def get_cache_info(self, name):
+        """Returns the statistics of a method's result cache.
+
+        :param name: The name the method is registered with
+        :type name: str
+        :rtype: typedjsonrpc.cache.CacheInfo
+
+        .. versionadded:: 0.5.0
+        """
+        return self._get_cache(name).info()
+
+    def invalidate_cache(self, name):
+        """Removes all stored results of a method.
+
+        :param name: The name the method is registered with
+        :type name: str
+
+        .. versionadded:: 0.5.0
+        """
+        self._get_cache(name).invalidate()
+
+    def _get_cache(self, name):
+        if name not in self._name_to_cache:
+            raise Exception("Method '{}' does not have a result cache".format(name))
+        return self._name_to_cache[name]
+
+    def _create_timeout_invoker(self, invoke, timeout, name):
+        if self._timeout_executor is None:
+            raise Exception("timeout requires a registry with a timeout_executor")
+        return create_timeout_invoker(invoke, timeout, name, self._timeout_executor,
+                                      self._record_timeout)
+
+    def _record_timeout(self, name, timeout):
+        with self._counter_lock:
+            self._timed_out_calls += 1
+        self._logger.warning("Call to '%s' timed out after %s seconds", name, timeout)
 
     def describe(self):
         """Returns a description of all the methods in the registry.
@@ -337,11 +958,13 @@ class Registry(object):
         :return: The parsed json object
         :rtype: dict[str, object]
         """
-        data = request.get_data(as_text=True)
+        data = request.get_data()
         try:
-            msg = self.json_decoder.decode(data)
+            msg = self.codec.decode(data)
         except Exception:
-            raise ParseError("Could not parse request data '{}'".format(data))
+            raise ParseError("Could not parse request data '{}'"
+                             .format(data.decode("utf-8", "replace")
+                                     if isinstance(data, six.binary_type) else data))
         if isinstance(msg, list):
             return msg
         else:
@@ -0,0 +1,143 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Responses to JSON-RPC requests."""
+from __future__ import absolute_import, division, print_function
+
+from collections import namedtuple
+
+from .errors import get_status_code_from_error_code
+
+__all__ = ["DispatchResult", "collect_results", "create_error_response", "create_result_response",
+           "iter_error_responses"]
+
+
+class DispatchResult(namedtuple("DispatchResult", ["chunks", "is_batch", "error_code"])):
+    """The encoded response to a request together with a summary of its outcome.
+
+    :attribute chunks: The UTF-8 encoded response in pieces which can be written out as they are,
+        or None if there is nothing to respond. A streamed response is an iterator which dispatches
+        the entries of the batch while it is consumed, and can only be iterated once.
+    :type chunks: list[bytes] | collections.Iterator[bytes] | None
+    :attribute is_batch: Whether the response is a list of responses
+    :type is_batch: bool
+    :attribute error_code: The code of the error if the response is a single error response
+    :type error_code: int | None
+
+    .. versionadded:: 0.5.0
+    """
+
+    @property
+    def body(self):
+        """The complete response as text, or None if there is nothing to respond.
+
+        :rtype: str | None
+        """
+        if self.chunks is not None:
+            return b"".join(self.chunks).decode("utf-8")
+
+    @property
+    def content_length(self):
+        """The length of the encoded response in bytes, or None if the response is streamed.
+
+        :rtype: int | None
+        """
+        if self.chunks is not None and not isinstance(self.chunks, list):
+            return None
+        return sum(len(chunk) for chunk in self.chunks or ())
+
+    @property
+    def status_code(self):
+        """The HTTP status code for the response.
+
+        :rtype: int
+        """
+        if self.chunks is None:
+            return 204
+        if self.is_batch or self.error_code is None:
+            return 200
+        return get_status_code_from_error_code(self.error_code)
+
+
+def create_result_response(msg_id, result):
+    """Creates the response to a successful call.
+
+    :param msg_id: The id of the request
+    :type msg_id: str | int | None
+    :param result: The result of the call
+    :type result: object
+    :rtype: dict[str, object]
+
+    .. versionadded:: 0.5.0
+    """
+    return {
+        "jsonrpc": "2.0",
+        "id": msg_id,
+        "result": result,
+    }
+
+
+def create_error_response(msg_id, exc):
+    """Creates the response to a failed call.
+
+    :param msg_id: The id of the request if known
+    :type msg_id: str | int | None
+    :param exc: The error of the call
+    :type exc: typedjsonrpc.errors.Error
+    :rtype: dict[str, object]
+
+    .. versionadded:: 0.5.0
+    """
+    return {
+        "jsonrpc": "2.0",
+        "id": msg_id,
+        "error": exc.as_error_object(),
+    }
+
+
+def iter_error_responses(errors):
+    """Creates the responses to requests which could not be read.
+
+    :param errors: The errors
+    :type errors: collections.Iterable[typedjsonrpc.errors.Error]
+    :rtype: collections.Iterator[dict[str, object]]
+
+    .. versionadded:: 0.5.0
+    """
+    for error in errors:
+        yield create_error_response(None, error)
+
+
+def collect_results(messages, results):
+    """Turns the responses to the messages of a request into the response to the request.
+
+    :param messages: The parsed request messages
+    :type messages: list[object]
+    :param results: The response for each message, or None for notifications
+    :type results: list[dict[str, object] | None]
+    :return: The single response, the list of responses of a batch, or None if there is nothing
+        to respond
+    :rtype: dict[str, object] | list[dict[str, object]] | None
+
+    .. versionadded:: 0.5.0
+    """
+    non_notification_results = [x for x in results if x is not None]
+    if len(non_notification_results) == 0:
+        return None
+    elif len(messages) == 1:
+        return non_notification_results[0]
+    else:
+        return non_notification_results
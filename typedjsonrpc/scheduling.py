@@ -0,0 +1,160 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An executor which runs queued calls by priority and deadline.
+
+This module requires :mod:`concurrent.futures`, which Python 2 gets from the ``futures`` backport.
+"""
+from __future__ import absolute_import, division, print_function
+
+import heapq
+import itertools
+import threading
+from collections import namedtuple
+from concurrent.futures import Executor, Future
+
+__all__ = ["PriorityExecutor", "PriorityExecutorInfo"]
+
+
+class PriorityExecutorInfo(namedtuple("PriorityExecutorInfo", ["queued", "workers", "idle_workers",
+                                                               "max_workers"])):
+    """Statistics of a :class:`PriorityExecutor`.
+
+    :attribute queued: The number of calls which are waiting for a worker
+    :type queued: int
+    :attribute workers: The number of worker threads which were started
+    :type workers: int
+    :attribute idle_workers: The number of worker threads which are waiting for a call
+    :type idle_workers: int
+    :attribute max_workers: The maximum number of worker threads
+    :type max_workers: int
+
+    .. versionadded:: 0.5.0
+    """
+
+
+class PriorityExecutor(Executor):
+    """A thread pool which runs the calls waiting in its queue by priority instead of in the order
+    they were submitted.
+
+    Calls with a higher priority run first. Among calls with the same priority, the call with the
+    earliest deadline runs first, and calls without a deadline run last. Calls which are equal in
+    both run in the order they were submitted.
+
+    When a :class:`typedjsonrpc.registry.Registry` dispatches the entries of a batch on this
+    executor, it submits them with the priority of their method and the deadline of their request.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, max_workers):
+        """
+        :param max_workers: The maximum number of worker threads
+        :type max_workers: int
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self._max_workers = max_workers
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._idle_workers = 0
+        self._shutdown = False
+
+    def submit(self, func, *args, **kwargs):
+        """Schedules a call with the priority 0 and no deadline.
+
+        :param func: The function to call
+        :type func: function
+        :return: The future of the result of the call
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit_prioritized(0, None, func, *args, **kwargs)
+
+    def submit_prioritized(self, priority, deadline, func, *args, **kwargs):
+        """Schedules a call with the given priority and deadline.
+
+        :param priority: The priority of the call. Higher priorities run first.
+        :type priority: int
+        :param deadline: The deadline of the call in seconds since the epoch, or None
+        :type deadline: float | None
+        :param func: The function to call
+        :type func: function
+        :return: The future of the result of the call
+        :rtype: concurrent.futures.Future
+        """
+        future = Future()
+        sort_key = (-priority, float("inf") if deadline is None else deadline,
+                    next(self._sequence))
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            heapq.heappush(self._queue, (sort_key, future, func, args, kwargs))
+            # Idle workers which were notified before still count as idle until they wake up.
+            if len(self._queue) > self._idle_workers and len(self._threads) < self._max_workers:
+                self._start_worker()
+            else:
+                self._condition.notify()
+        return future
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._idle_workers += 1
+                    self._condition.wait()
+                    self._idle_workers -= 1
+                if not self._queue:
+                    return
+                _, future, func, args, kwargs = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as exc:  # pylint: disable=broad-except
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait=True):
+        """Stops accepting new calls. The calls in the queue still run.
+
+        :param wait: If True, this waits until all queued calls have finished
+        :type wait: bool
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def info(self):
+        """Returns statistics of the executor.
+
+        :rtype: PriorityExecutorInfo
+        """
+        with self._condition:
+            return PriorityExecutorInfo(len(self._queue), len(self._threads), self._idle_workers,
+                                        self._max_workers)
@@ -17,37 +17,39 @@
 """Contains the Werkzeug server for debugging and WSGI compatibility."""
 from __future__ import absolute_import, division, print_function
 
-from threading import Lock
+import functools
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from threading import Lock, Thread
 
 from werkzeug.debug import DebuggedApplication
 from werkzeug.exceptions import abort
-from werkzeug.local import Local, LocalManager, LocalProxy
 from werkzeug.routing import Map, Rule
-from werkzeug.serving import run_simple
+from werkzeug.serving import BaseWSGIServer, run_simple
 from werkzeug.wrappers import Request, Response
 
-from .errors import get_status_code_from_error_code
+from .context import (_CURRENT_REQUEST_KEY, _LOCAL_MANAGER, _local, current_request,
+                      deadline_from_headers, priority_from_headers, set_deadline, set_priority)
+from .errors import OverloadedError
 
-__all__ = ["Server", "DebuggedJsonRpcApplication", "current_request"]
+__all__ = ["Server", "DebuggedJsonRpcApplication", "PreforkRunner", "current_request"]
 
 
 DEFAULT_API_ENDPOINT_NAME = "/api"
+DEFAULT_WORKER_THREADS = 16
 
-_CURRENT_REQUEST_KEY = "current_request"
-_local = Local()  # pylint: disable=invalid-name
-_LOCAL_MANAGER = LocalManager([_local])
+_LISTEN_BACKLOG = 128
+_SUPERVISOR_INTERVAL = 0.1
+_MIN_WORKER_LIFETIME = 1.0
+_MAX_FAILED_STARTS = 10
 
-current_request = LocalProxy(_local, _CURRENT_REQUEST_KEY)  # pylint: disable=invalid-name
-"""A thread-local which stores the current request object when dispatching requests for
-:class:`Server`.
 
-Stores a :class:`werkzeug.wrappers.Request`.
-
-.. versionadded:: 0.2.0
-"""
-
-
-class Server(object):
+class Server(object):  # pylint: disable=too-many-instance-attributes
     """A basic WSGI-compatible server for typedjsonrpc endpoints.
 
     :attribute registry: The registry for this server
@@ -57,15 +59,36 @@ class Server(object):
     .. versionchanged:: 0.4.0 Now returns HTTP status codes
     """
 
-    def __init__(self, registry, endpoint=DEFAULT_API_ENDPOINT_NAME):
+    def __init__(self, registry,  # pylint: disable=too-many-arguments
+                 endpoint=DEFAULT_API_ENDPOINT_NAME, stream_batches=False,
+                 incremental_batches=False, limiter=None):
         """
         :param registry: The JSON-RPC registry to use
         :type registry: typedjsonrpc.registry.Registry
         :param endpoint: The endpoint to publish JSON-RPC endpoints. Default "/api".
         :type endpoint: str
+        :param stream_batches: If True, the responses to a batch are sent as they are computed
+            instead of after the whole batch is done. The response then has no Content-Length.
+        :type stream_batches: bool
+        :param incremental_batches: If True, the entries of a batch are read from the request body
+            one at a time and dispatched before the rest of the body has arrived. The responses are
+            then always streamed.
+        :type incremental_batches: bool
+        :param limiter: If set, requests which it does not admit are rejected with the HTTP status
+            code 503 and an :class:`typedjsonrpc.errors.OverloadedError` without being dispatched.
+            An admitted request counts against the limit until its response has been sent.
+        :type limiter: typedjsonrpc.limits.AdaptiveLimiter | None
+
+        .. versionchanged:: 0.5.0 Added stream_batches, incremental_batches and limiter options
         """
         self.registry = registry
         self._endpoint = endpoint
+        self._limiter = limiter
+        self._dispatch_options = {}
+        if stream_batches:
+            self._dispatch_options["stream"] = True
+        if incremental_batches:
+            self._dispatch_options["incremental"] = True
         self._url_map = Map([Rule(endpoint, endpoint=self._endpoint)])
 
         self._before_first_request_funcs = []
@@ -83,20 +106,39 @@ class Server(object):
             abort(404)
 
     def _dispatch_jsonrpc_request(self, request):
-        json_output = self.registry.dispatch(request)
-        if json_output is None:
-            return Response(status=204)
-        return Response(json_output,
-                        mimetype="application/json",
-                        status=self._determine_status_code(json_output))
-
-    def _determine_status_code(self, json_output):
-        output = self.registry.json_decoder.decode(json_output)
-        if isinstance(output, list) or "result" in output:
-            return 200
+        if self._limiter is None:
+            return self._dispatch_admitted_request(request)
+        token = self._limiter.acquire()
+        if token is None:
+            error = OverloadedError("The server is handling too many requests")
+            body = self.registry.codec.encode({
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": error.as_error_object(),
+            })
+            return Response(body, mimetype="application/json", status=error.status_code)
+        try:
+            response = self._dispatch_admitted_request(request)
+        except Exception:
+            self._limiter.release(token)
+            raise
+        if response.is_streamed:
+            # A streamed response is only handled once it has been sent.
+            response.call_on_close(functools.partial(self._limiter.release, token))
         else:
-            assert "error" in output, "JSON-RPC is malformed and doesn't contain result or error"
-            return get_status_code_from_error_code(output["error"]["code"])
+            self._limiter.release(token)
+        return response
+
+    def _dispatch_admitted_request(self, request):
+        dispatch_result = self.registry.dispatch_response(request, **self._dispatch_options)
+        if dispatch_result.chunks is None:
+            return Response(status=204)
+        response = Response(dispatch_result.chunks,
+                            mimetype="application/json",
+                            status=dispatch_result.status_code)
+        if dispatch_result.content_length is not None:
+            response.content_length = dispatch_result.content_length
+        return response
 
     def wsgi_app(self, environ, start_response):
         """A basic WSGI app"""
@@ -104,6 +146,8 @@ class Server(object):
         def _wrapped_app(environ, start_response):
             request = Request(environ)
             setattr(_local, _CURRENT_REQUEST_KEY, request)
+            set_deadline(deadline_from_headers(request.headers))
+            set_priority(priority_from_headers(request.headers))
             response = self._dispatch_request(request)
             return response(environ, start_response)
         return _wrapped_app(environ, start_response)
@@ -117,8 +161,9 @@ class Server(object):
         .. WARNING:: **Security vulnerability**
 
             This uses :class:`DebuggedJsonRpcApplication` to assist debugging. If you want to use
-            this in production, you should run :class:`Server` as a standard WSGI app with
-            `uWSGI <https://uwsgi-docs.readthedocs.org/en/latest/>`_ or another similar WSGI server.
+            this in production, you should run :class:`Server` with :class:`PreforkRunner`, or as a
+            standard WSGI app with `uWSGI <https://uwsgi-docs.readthedocs.org/en/latest/>`_ or
+            another similar WSGI server.
 
         .. versionadded:: 0.1.0
         """
@@ -221,3 +266,257 @@ class DebuggedJsonRpcApplication(DebuggedApplication):
             self.tracebacks[traceback_id] = traceback
             for frame in traceback.frames:
                 self.frames[frame.id] = frame
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server which handles connections on a fixed pool of threads and accepts them from a
+    socket which is already listening.
+    """
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, listening_socket, app, threads):
+        self._listening_socket = listening_socket
+        host, port = listening_socket.getsockname()[:2]
+        BaseWSGIServer.__init__(self, host, port, app)
+        # concurrent.futures is only available on Python 2 with the futures backport.
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+
+    def server_bind(self):
+        # Adopt the listening socket instead of binding the socket created by the base class.
+        self.socket.close()
+        self.socket = self._listening_socket
+        self.server_address = self.socket.getsockname()
+        host, port = self.server_address[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+
+    def server_activate(self):
+        pass
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_in_pool, request, client_address)
+
+    def _process_request_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        BaseWSGIServer.server_close(self)
+        self._pool.shutdown(wait=True)
+
+
+class PreforkRunner(object):  # pylint: disable=too-many-instance-attributes
+    """Serves a WSGI application such as :class:`Server` from several worker processes.
+
+    The runner binds the listening socket and then forks the workers. Each worker handles
+    connections on its own pool of threads. Unlike :meth:`Server.run`, no debugging or reloading
+    is involved.
+
+    The runner reacts to signals in the same way as other pre-forking servers:
+
+    * ``SIGHUP`` starts a new set of workers and then lets the old workers finish the requests
+      they are handling before they exit.
+    * ``SIGTERM`` and ``SIGINT`` let all workers finish their requests and then stop the runner.
+
+    Workers which exit unexpectedly are replaced. If workers keep exiting right after they were
+    started, for example because ``post_fork`` raises, the runner stops them all and :meth:`run`
+    raises a :class:`RuntimeError` instead of forking new workers forever.
+
+    Thread pools which were already running threads in the parent process don't work in the
+    workers, so executors should be created in ``post_fork`` or before they are first used.
+
+    This requires ``os.fork`` and is therefore not available on Windows.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, app, host, port,  # pylint: disable=too-many-arguments
+                 workers=None, threads=DEFAULT_WORKER_THREADS, reuse_port=False, post_fork=None):
+        """
+        :param app: The WSGI application to serve
+        :type app: Server
+        :param host: The host name or IP address to listen on
+        :type host: str
+        :param port: The port to listen on, or 0 to pick a free port
+        :type port: int
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        :type workers: int | None
+        :param threads: The number of threads which handle connections in each worker
+        :type threads: int
+        :param reuse_port: If True, every worker listens on its own socket with ``SO_REUSEPORT``
+            so that the kernel balances connections between them. Otherwise, the workers accept
+            connections from a socket which they inherit from the runner.
+        :type reuse_port: bool
+        :param post_fork: A function which is called in each worker after it was forked
+        :type post_fork: (() -> object) | None
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if threads < 1:
+            raise ValueError("threads must be at least 1")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise ValueError("SO_REUSEPORT is not supported on this platform")
+        self._app = app
+        self._host = host
+        self._port = port
+        self._workers = workers
+        self._threads = threads
+        self._reuse_port = reuse_port
+        self._post_fork = post_fork
+        self._socket = None
+        self._worker_pids = {}
+        self._retiring_pids = set()
+        self._failed_starts = 0
+        self._restarting = False
+        self._stopping = False
+
+    @property
+    def address(self):
+        """The address the runner listens on, which is only known once it is bound.
+
+        :rtype: (str, int) | None
+        """
+        if self._socket is None:
+            return None
+        return self._socket.getsockname()[:2]
+
+    def bind(self):
+        """Binds the listening socket. This is done by :meth:`run` if it wasn't done before."""
+        if self._socket is not None:
+            return
+        family = socket.AF_INET6 if ":" in self._host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self._reuse_port:
+            # The runner's socket only reserves the address and is never listened on, so that the
+            # kernel doesn't hand connections to it.
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self._host, self._port))
+        if not self._reuse_port:
+            sock.listen(_LISTEN_BACKLOG)
+        self._socket = sock
+
+    def run(self):
+        """Starts the workers and supervises them until the runner receives ``SIGTERM`` or
+        ``SIGINT``.
+
+        :raises RuntimeError: If the workers keep exiting right after they were started
+        """
+        self.bind()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_restart)
+        try:
+            for _ in range(self._workers):
+                self._spawn_worker()
+            while not self._stopping:
+                if self._restarting:
+                    self._restarting = False
+                    self._restart_workers()
+                self._reap_workers()
+                time.sleep(_SUPERVISOR_INTERVAL)
+        finally:
+            self._stop_workers()
+            self._socket.close()
+            self._socket = None
+
+    def _handle_stop(self, signum, frame):  # pylint: disable=unused-argument
+        self._stopping = True
+
+    def _handle_restart(self, signum, frame):  # pylint: disable=unused-argument
+        self._restarting = True
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker()
+            except BaseException:  # pylint: disable=broad-except
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)  # pylint: disable=protected-access
+        self._worker_pids[pid] = time.time()
+
+    def _restart_workers(self):
+        old_pids = set(self._worker_pids)
+        self._worker_pids.clear()
+        self._failed_starts = 0
+        for _ in range(self._workers):
+            self._spawn_worker()
+        for pid in old_pids:
+            self._signal_worker(pid, signal.SIGTERM)
+        self._retiring_pids.update(old_pids)
+
+    def _reap_workers(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                return
+            if pid == 0:
+                return
+            self._retiring_pids.discard(pid)
+            if pid in self._worker_pids:
+                started = self._worker_pids.pop(pid)
+                if time.time() - started < _MIN_WORKER_LIFETIME:
+                    self._failed_starts += 1
+                    if self._failed_starts >= _MAX_FAILED_STARTS:
+                        raise RuntimeError("{} workers in a row exited right after they were "
+                                           "started".format(self._failed_starts))
+                else:
+                    self._failed_starts = 0
+                self._spawn_worker()
+
+    def _stop_workers(self):
+        pids = set(self._worker_pids) | self._retiring_pids
+        for pid in pids:
+            self._signal_worker(pid, signal.SIGTERM)
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self._worker_pids.clear()
+        self._retiring_pids.clear()
+
+    @staticmethod
+    def _signal_worker(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+
+    def _run_worker(self):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        if self._reuse_port:
+            sock = socket.socket(self._socket.family, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(self.address)
+            sock.listen(_LISTEN_BACKLOG)
+            self._socket.close()
+            self._socket = sock
+        if self._post_fork is not None:
+            self._post_fork()
+        server = _PooledWSGIServer(self._socket, self._app, self._threads)
+
+        def _shut_down(signum, frame):  # pylint: disable=unused-argument
+            # shutdown() waits for serve_forever() to return, so it must not block this thread.
+            Thread(target=server.shutdown).start()
+        signal.signal(signal.SIGTERM, _shut_down)
+        signal.signal(signal.SIGINT, _shut_down)
+        server.serve_forever()
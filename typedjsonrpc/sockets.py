@@ -0,0 +1,668 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A transport which exchanges framed JSON-RPC messages over TCP and Unix domain sockets.
+
+Every request and every response is one frame, which contains a single message or a batch. A
+connection stays open for any number of requests.
+"""
+from __future__ import absolute_import, division, print_function
+
+import functools
+import itertools
+import logging
+import socket
+import struct
+import sys
+import threading
+
+import six
+
+from . import context
+from .codec import JsonCodec
+from .context import _CURRENT_REQUEST_KEY
+from .errors import DeadlineExceededError, InternalError, ParseError, get_error_from_error_object
+from .responses import create_error_response
+
+__all__ = ["LengthPrefixedFraming", "LineFraming", "SocketClient", "SocketServer"]
+
+DEFAULT_MAX_FRAME_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT = 16
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LineFraming(object):
+    """Frames messages by ending each with a newline.
+
+    This is only suitable for codecs which never put newlines into encoded messages, such as the
+    JSON codecs.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """
+        :param max_frame_size: The maximum length of a received frame in bytes
+        :type max_frame_size: int
+        """
+        self.max_frame_size = max_frame_size
+
+    def read_frame(self, rfile):
+        """Reads the next frame.
+
+        A last line which the stream ends without a newline is a frame as well.
+
+        :param rfile: The stream to read from
+        :type rfile: io.BufferedIOBase
+        :return: The frame, or None if the stream ended
+        :rtype: bytes | None
+        :raises typedjsonrpc.errors.ParseError: If the frame is too long
+        """
+        while True:
+            line = rfile.readline(self.max_frame_size + 1)
+            if not line.endswith(b"\n"):
+                if len(line) > self.max_frame_size:
+                    raise ParseError("Frame exceeds {} bytes".format(self.max_frame_size))
+                line = line.rstrip(b"\r")
+                return line if line.strip() else None
+            line = line.rstrip(b"\r\n")
+            if line.strip():
+                return line
+
+    def write_frame(self, wfile, data):  # pylint: disable=no-self-use
+        """Writes a frame.
+
+        :param wfile: The stream to write to
+        :type wfile: io.BufferedIOBase
+        :param data: The encoded message
+        :type data: bytes
+        """
+        wfile.write(data + b"\n")
+
+
+class LengthPrefixedFraming(object):
+    """Frames messages by prefixing each with its length as a 4-byte big-endian integer.
+
+    This works with any codec.
+
+    .. versionadded:: 0.5.0
+    """
+
+    _LENGTH = struct.Struct(">I")
+
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """
+        :param max_frame_size: The maximum length of a received frame in bytes
+        :type max_frame_size: int
+        """
+        self.max_frame_size = max_frame_size
+
+    def read_frame(self, rfile):
+        """Reads the next frame.
+
+        :param rfile: The stream to read from
+        :type rfile: io.BufferedIOBase
+        :return: The frame, or None if the stream ended
+        :rtype: bytes | None
+        :raises typedjsonrpc.errors.ParseError: If the frame is too long
+        """
+        prefix = rfile.read(self._LENGTH.size)
+        if len(prefix) < self._LENGTH.size:
+            return None
+        length, = self._LENGTH.unpack(prefix)
+        if length > self.max_frame_size:
+            raise ParseError("Frame exceeds {} bytes".format(self.max_frame_size))
+        data = rfile.read(length)
+        if len(data) < length:
+            return None
+        return data
+
+    def write_frame(self, wfile, data):
+        """Writes a frame.
+
+        :param wfile: The stream to write to
+        :type wfile: io.BufferedIOBase
+        :param data: The encoded message
+        :type data: bytes
+        """
+        wfile.write(self._LENGTH.pack(len(data)) + data)
+
+
+class _FrameRequest(object):  # pylint: disable=too-few-public-methods
+    """The request object which :class:`SocketServer` passes to the registry."""
+
+    def __init__(self, data):
+        self._data = data
+        self.headers = {}
+
+    def get_data(self, as_text=False):
+        """Returns the received message.
+
+        :param as_text: Whether to decode the message
+        :type as_text: bool
+        :rtype: bytes | six.text_type
+        """
+        if as_text:
+            return self._data.decode("utf-8")
+        return self._data
+
+
+class _ConnectionDispatcher(object):  # pylint: disable=too-many-instance-attributes
+    """Dispatches the requests received on one connection and sends their responses.
+
+    Without an executor, each request is answered before the next one is dispatched. With an
+    executor, up to ``max_in_flight`` requests are dispatched concurrently and each response is
+    sent as soon as it is done, so responses may arrive in a different order than the requests.
+    :meth:`dispatch` blocks while the limit is reached, which stops reading from the connection.
+    """
+
+    def __init__(self, registry, send_frame,  # pylint: disable=too-many-arguments
+                 executor=None, max_in_flight=1, create_request=_FrameRequest):
+        """
+        :param registry: The JSON-RPC registry to use
+        :type registry: typedjsonrpc.registry.Registry
+        :param send_frame: Sends an encoded response and returns False if the connection is closed
+        :type send_frame: (bytes) -> bool
+        :param executor: The executor to dispatch requests on, or None to dispatch them in order
+        :type executor: concurrent.futures.Executor | None
+        :param max_in_flight: The maximum number of requests dispatched at the same time
+        :type max_in_flight: int
+        :param create_request: Creates the request object for a received frame, which is also
+            available to methods as :data:`typedjsonrpc.context.current_request`
+        :type create_request: (bytes) -> object
+        """
+        self._registry = registry
+        self._create_request = create_request
+        self._send_frame = send_frame
+        self._executor = executor
+        self._max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def dispatch(self, frame):
+        """Dispatches a request and sends its response, if any.
+
+        :param frame: The encoded request
+        :type frame: bytes
+        """
+        if self._executor is None:
+            self._dispatch(frame)
+            return
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._dispatch, frame)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._finish_dispatch)
+
+    def _finish_dispatch(self, future):
+        self._slots.release()
+        exc = future.exception()
+        if exc is not None:
+            _LOGGER.error("Failed to dispatch a request",
+                          exc_info=(type(exc), exc, getattr(exc, "__traceback__", None)))
+
+    def _dispatch(self, frame):
+        request = self._create_request(frame)
+        try:
+            dispatch_result = context.call_with_state({_CURRENT_REQUEST_KEY: request},
+                                                      self._registry.dispatch_response, request)
+            if dispatch_result.chunks is None:
+                return
+            data = b"".join(dispatch_result.chunks)
+        except Exception:  # pylint: disable=broad-except
+            # A streamed result failed after its response was started, so the client would
+            # otherwise wait for the response forever.
+            _LOGGER.exception("Failed to encode the response to a request")
+            data = self._encode_internal_errors(frame, InternalError.from_error(
+                sys.exc_info(), self._registry.codec))
+            if data is None:
+                return
+        self._send(data)
+
+    def _encode_internal_errors(self, frame, error):
+        """Encodes an error response to every call in a request.
+
+        :param frame: The encoded request
+        :type frame: bytes
+        :param error: The error of the calls
+        :type error: typedjsonrpc.errors.InternalError
+        :return: The encoded response, or None if the request only contains notifications
+        :rtype: bytes | None
+        """
+        message = self._registry.codec.decode(frame)
+        messages = message if isinstance(message, list) else [message]
+        responses = [create_error_response(msg["id"], error) for msg in messages
+                     if isinstance(msg, dict) and "id" in msg]
+        if not responses:
+            return None
+        return self._registry.codec.encode(responses if isinstance(message, list)
+                                           else responses[0])
+
+    def send_error(self, error):
+        """Sends an error response which belongs to no request.
+
+        :param error: The error
+        :type error: typedjsonrpc.errors.Error
+        """
+        self._send(self._registry.codec.encode({
+            "jsonrpc": "2.0",
+            "id": None,
+            "error": error.as_error_object(),
+        }))
+
+    def _send(self, data):
+        with self._send_lock:
+            if not self.closed and not self._send_frame(data):
+                self.closed = True
+
+    def wait(self):
+        """Waits until all dispatched requests are answered."""
+        for _ in range(self._max_in_flight):
+            self._slots.acquire()
+        for _ in range(self._max_in_flight):
+            self._slots.release()
+
+
+class _ConnectionHandler(six.moves.socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.transport.handle_connection(self.rfile, self.wfile)
+
+
+class _TCPServer(six.moves.socketserver.ThreadingMixIn, six.moves.socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, request_handler_class):
+        if ":" in server_address[0]:
+            # Listen on IPv6 for the same addresses that SocketClient connects to over IPv6.
+            self.address_family = socket.AF_INET6
+        six.moves.socketserver.TCPServer.__init__(self, server_address, request_handler_class)
+
+
+if hasattr(six.moves.socketserver, "UnixStreamServer"):
+    class _UnixServer(six.moves.socketserver.ThreadingMixIn,
+                      six.moves.socketserver.UnixStreamServer):
+        daemon_threads = True
+else:  # pragma: no cover
+    _UnixServer = None  # pylint: disable=invalid-name
+
+
+class _ListeningServer(object):
+    """The lifecycle of a transport whose socket server is stored in ``_server``."""
+
+    _server = None
+
+    @property
+    def address(self):
+        """The address the server listens on.
+
+        :rtype: (str, int) | str
+        """
+        return self._server.server_address
+
+    def serve_forever(self):
+        """Handles connections until :meth:`shutdown` is called."""
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """Stops :meth:`serve_forever`. This must be called from another thread."""
+        self._server.shutdown()
+
+    def close(self):
+        """Closes the listening socket."""
+        self._server.server_close()
+
+
+class SocketServer(_ListeningServer):
+    """Serves a registry over TCP or a Unix domain socket without HTTP.
+
+    Each connection is read on its own thread, and its requests are dispatched with
+    :meth:`typedjsonrpc.registry.Registry.dispatch_response`. By default, they are answered one
+    after another. With an ``executor``, the requests of a connection run concurrently and each
+    response is sent when it is done, so clients must match responses to requests by their
+    ``id``. Notifications are not answered.
+
+    :attribute registry: The registry for this server
+    :type registry: typedjsonrpc.registry.Registry
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, registry, address,  # pylint: disable=too-many-arguments
+                 framing=None, executor=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        :param registry: The JSON-RPC registry to use
+        :type registry: typedjsonrpc.registry.Registry
+        :param address: A ``(host, port)`` tuple to listen on TCP, or the path of a Unix domain
+            socket. A host which contains a colon is an IPv6 address.
+        :type address: (str, int) | str
+        :param framing: How messages are framed. Defaults to :class:`LineFraming`.
+        :type framing: LineFraming | LengthPrefixedFraming | None
+        :param executor: If set, the requests of a connection are dispatched concurrently on this
+            executor and answered in the order they complete
+        :type executor: concurrent.futures.Executor | None
+        :param max_in_flight: The maximum number of requests of one connection which are
+            dispatched at the same time. Further requests are not read from the connection until
+            one of them is answered.
+        :type max_in_flight: int
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.registry = registry
+        self._framing = framing if framing is not None else LineFraming()
+        self._executor = executor
+        self._max_in_flight = max_in_flight
+        if isinstance(address, six.string_types):
+            if _UnixServer is None:
+                raise ValueError("Unix domain sockets are not supported on this platform")
+            server_class = _UnixServer
+        else:
+            server_class = _TCPServer
+        self._server = server_class(address, _ConnectionHandler)
+        self._server.transport = self
+
+    def handle_connection(self, rfile, wfile):
+        """Answers the requests which are read from a connection until it is closed.
+
+        :param rfile: The stream to read requests from
+        :type rfile: io.BufferedIOBase
+        :param wfile: The stream to write responses to
+        :type wfile: io.BufferedIOBase
+        """
+        dispatcher = _ConnectionDispatcher(self.registry,
+                                           functools.partial(self._send_frame, wfile),
+                                           self._executor, self._max_in_flight)
+        try:
+            while not dispatcher.closed:
+                try:
+                    frame = self._framing.read_frame(rfile)
+                except ParseError as exc:
+                    # The rest of the stream can't be split into frames anymore.
+                    dispatcher.send_error(exc)
+                    return
+                if frame is None:
+                    return
+                dispatcher.dispatch(frame)
+        finally:
+            dispatcher.wait()
+
+    def _send_frame(self, wfile, data):
+        try:
+            self._framing.write_frame(wfile, data)
+            wfile.flush()
+        except (IOError, OSError):
+            # The client closed the connection without waiting for the response.
+            return False
+        return True
+
+
+class _PendingCall(object):
+    """A call of a :class:`SocketClient` which waits for its response."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = {}
+        self.error = None
+
+    def resolve(self, response):
+        """Completes the call with its response.
+
+        :param response: The decoded response
+        :type response: dict[str, object]
+        """
+        self.response = response
+        self.done.set()
+
+    def fail(self, error):
+        """Completes the call with an error which occurred before a response was received.
+
+        :param error: The error
+        :type error: Exception
+        """
+        self.error = error
+        self.done.set()
+
+    def get_result(self):
+        """Returns the result of the call once it is done.
+
+        :rtype: object
+        :raises typedjsonrpc.errors.Error: If the server responded with an error
+        """
+        if self.error is not None:
+            six.reraise(type(self.error), self.error)
+        if "error" in self.response:
+            raise get_error_from_error_object(self.response["error"])
+        return self.response["result"]
+
+
+class SocketClient(object):  # pylint: disable=too-many-instance-attributes
+    """Calls methods of a :class:`SocketServer` over a persistent connection.
+
+    The connection is opened on the first call and reopened after an error. Calls from several
+    threads share the connection and are matched with their responses by ``id``, so they don't
+    wait for each other when the server answers out of order.
+
+    If a call is made while a request with a deadline is handled, the client waits for at most the
+    remaining time and raises :class:`typedjsonrpc.errors.DeadlineExceededError` without calling
+    if no time is left. Frames have no headers, so the deadline is not sent to the server, which
+    keeps working on a call after the client stopped waiting for it.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, address, framing=None, codec=None, timeout=None):
+        """
+        :param address: A ``(host, port)`` tuple of a TCP server, or the path of a Unix domain
+            socket
+        :type address: (str, int) | str
+        :param framing: How messages are framed. Defaults to :class:`LineFraming`.
+        :type framing: LineFraming | LengthPrefixedFraming | None
+        :param codec: The codec for requests and responses. Defaults to a
+            :class:`typedjsonrpc.codec.JsonCodec`.
+        :type codec: typedjsonrpc.codec.Codec | None
+        :param timeout: The number of seconds to wait for a response, or None to wait forever
+        :type timeout: float | None
+        """
+        self._address = address
+        self._framing = framing if framing is not None else LineFraming()
+        self._codec = codec if codec is not None else JsonCodec()
+        self._timeout = timeout
+        self._ids = itertools.count(1)
+        # The lock protects the connection and the pending calls, and is never held while waiting
+        # for the socket, so that the thread which reads responses can always deliver them. The
+        # send lock orders the writes to the connection.
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._socket = None
+        self._wfile = None
+
+    def call(self, method, *args, **kwargs):
+        """Calls a method and returns its result.
+
+        :param method: The name of the method
+        :type method: str
+        :param args: The positional parameters
+        :param kwargs: The keyword parameters
+        :return: The result of the method
+        :rtype: object
+        :raises typedjsonrpc.errors.Error: If the server responds with an error
+        :raises socket.timeout: If there is no response within the timeout
+        """
+        message = self._create_message(method, args, kwargs)
+        timeout = self._get_timeout()
+        pending = _PendingCall()
+        with self._lock:
+            msg_id = message["id"] = next(self._ids)
+        self._send(message, timeout, pending)
+        if not pending.done.wait(timeout):
+            with self._lock:
+                self._pending.pop(msg_id, None)
+            raise socket.timeout("No response to request {} within {} seconds"
+                                 .format(msg_id, timeout))
+        return pending.get_result()
+
+    def notify(self, method, *args, **kwargs):
+        """Calls a method without waiting for it.
+
+        :param method: The name of the method
+        :type method: str
+        :param args: The positional parameters
+        :param kwargs: The keyword parameters
+        """
+        message = self._create_message(method, args, kwargs)
+        self._send(message, self._get_timeout())
+
+    @staticmethod
+    def _create_message(method, args, kwargs):
+        if args and kwargs:
+            raise ValueError("JSON-RPC calls take either positional or keyword parameters")
+        message = {"jsonrpc": "2.0", "method": method}
+        if args or kwargs:
+            message["params"] = list(args) if args else kwargs
+        return message
+
+    def _get_timeout(self):
+        remaining = context.get_remaining_time()
+        if remaining is None:
+            return self._timeout
+        if remaining == 0:
+            raise DeadlineExceededError("The deadline of the request passed before the call")
+        return remaining if self._timeout is None else min(self._timeout, remaining)
+
+    def _send(self, message, timeout, pending=None):
+        """Sends a message on the connection.
+
+        :param message: The message
+        :type message: dict[str, object]
+        :param timeout: The number of seconds to wait for the connection to open
+        :type timeout: float | None
+        :param pending: The call which waits for the response to the message, if any
+        :type pending: _PendingCall | None
+        """
+        data = self._codec.encode(message)
+        with self._send_lock:
+            try:
+                wfile = self._connect(timeout)
+                if pending is not None:
+                    with self._lock:
+                        self._pending[message["id"]] = pending
+                self._framing.write_frame(wfile, data)
+                wfile.flush()
+            except Exception as exc:
+                with self._lock:
+                    self._close(exc)
+                raise
+
+    def _connect(self, timeout):
+        """Opens the connection if it is not open. The caller must hold the send lock.
+
+        :return: The stream to write to the connection
+        :rtype: io.BufferedIOBase
+        """
+        with self._lock:
+            if self._wfile is not None:
+                return self._wfile
+        if isinstance(self._address, six.string_types):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET6 if ":" in self._address[0] else socket.AF_INET,
+                                 socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(self._address)
+            # The socket is shared with the thread which reads responses, so it must stay in
+            # blocking mode. Each call waits for its response with its own timeout instead.
+            sock.settimeout(None)
+        except Exception:
+            sock.close()
+            raise
+        wfile = sock.makefile("wb")
+        with self._lock:
+            self._socket = sock
+            self._wfile = wfile
+        reader = threading.Thread(target=self._read_responses, args=(sock,))
+        reader.daemon = True
+        reader.start()
+        return wfile
+
+    def _read_responses(self, sock):
+        rfile = sock.makefile("rb")
+        error = socket.error("The connection was closed before the response was received")
+        try:
+            while True:
+                frame = self._framing.read_frame(rfile)
+                if frame is None:
+                    break
+                self._deliver(self._codec.decode(frame))
+        except Exception as exc:  # pylint: disable=broad-except
+            error = exc
+        finally:
+            rfile.close()
+        with self._lock:
+            if self._socket is sock:
+                self._close(error)
+
+    def _deliver(self, response):
+        with self._lock:
+            if not isinstance(response, dict):
+                return
+            if response.get("id") is None and "error" in response:
+                # The server could not tell which request failed, so none of them get an answer.
+                error = get_error_from_error_object(response["error"])
+                for pending in self._pending.values():
+                    pending.fail(error)
+                self._pending.clear()
+                return
+            pending = self._pending.pop(response.get("id"), None)
+        if pending is not None:
+            pending.resolve(response)
+
+    def close(self):
+        """Closes the connection. The next call opens a new one."""
+        with self._lock:
+            self._close(socket.error("The connection was closed by the client"))
+
+    def _close(self, error):
+        """Closes the connection and fails the calls which wait for it. The caller must hold the
+        lock.
+        """
+        for pending in self._pending.values():
+            pending.fail(error)
+        self._pending.clear()
+        if self._socket is None:
+            return
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except (IOError, OSError):
+            pass
+        for closeable in (self._wfile, self._socket):
+            try:
+                closeable.close()
+            except (IOError, OSError):
+                pass
+        self._socket = self._wfile = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
@@ -0,0 +1,198 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Methods which return a stream of items instead of a single value."""
+from __future__ import absolute_import, division, print_function
+
+import inspect
+import uuid
+
+import six
+
+import typedjsonrpc.parameter_checker as parameter_checker
+from . import context
+from .errors import InvalidReturnTypeError
+
+__all__ = ["Stream", "StreamResult", "check_stream_options", "create_stream_invoker",
+           "iter_encoded_stream"]
+
+
+class Stream(object):  # pylint: disable=too-few-public-methods
+    """Declares that a method returns a stream of items of the same type.
+
+    Pass it as the ``returns`` type of :meth:`typedjsonrpc.registry.Registry.method`. The method
+    returns any iterable, usually by being a generator. Each item is type-checked against
+    ``item_type`` while the response is encoded, so the items never have to be in memory at the
+    same time. The client receives the items as a regular JSON array.
+
+    Example:
+
+        >>> from typedjsonrpc.registry import Registry
+        >>> registry = Registry()
+        >>> @registry.method(returns=Stream(int), count=int)
+        ... def count_up(count):
+        ...     for i in range(count):
+        ...         yield i
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, item_type):
+        """
+        :param item_type: The type of each item
+        :type item_type: type
+        """
+        self.item_type = item_type
+
+    @property
+    def __name__(self):
+        """The name of the stream type as it appears in method descriptions.
+
+        :rtype: str
+        """
+        return "Stream[{}]".format(self.item_type.__name__)
+
+    def __repr__(self):
+        return "Stream({!r})".format(self.item_type)
+
+
+class StreamResult(six.Iterator):
+    """The result of a method which returns a :class:`Stream`.
+
+    Items are taken from the iterable which the method returned and type-checked one at a time
+    while the result is iterated. The request-scoped state of the call, such as
+    :data:`typedjsonrpc.context.current_request`, is available to the method's generator while
+    it runs.
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, items, validate_item):
+        """
+        :param items: The iterable returned by the method
+        :type items: collections.Iterable[object]
+        :param validate_item: The validator for the items
+        :type validate_item: (object) -> None
+        :raises typedjsonrpc.errors.InvalidReturnTypeError: If items is not iterable
+        """
+        if isinstance(items, (six.string_types, six.binary_type, dict)):
+            raise InvalidReturnTypeError("Returned value '{}' is not a stream of items"
+                                         .format(items))
+        try:
+            self._items = iter(items)
+        except TypeError:
+            raise InvalidReturnTypeError("Returned value '{}' is not a stream of items"
+                                         .format(items))
+        self._validate_item = validate_item
+        self._state = context.copy_current_state()
+        self._buffered = []
+
+    def __iter__(self):  # pylint: disable=non-iterator-returned
+        return self
+
+    def __next__(self):
+        if self._buffered:
+            return self._buffered.pop()
+        item = context.call_with_state(self._state, next, self._items)
+        self._validate_item(item)
+        return item
+
+    def start(self):
+        """Takes the first item from the method in advance, so that errors which occur before the
+        method yields anything are raised here instead of during iteration.
+        """
+        if not self._buffered:
+            try:
+                self._buffered.append(next(self))
+            except StopIteration:
+                pass
+
+
+def check_stream_options(executor, cache, idempotent, bulkhead, timeout):
+    """Rejects the options of :meth:`typedjsonrpc.registry.Registry.method` which can't be applied
+    to a method which returns a :class:`Stream`.
+
+    The body of such a method mostly runs while its result is encoded, after the call has returned.
+    A bulkhead or timeout would only cover the creation of the stream.
+
+    :raises Exception: If any of the options is used
+
+    .. versionadded:: 0.5.0
+    """
+    options = [("executor", executor is not None), ("cache", cache is not None),
+               ("idempotent", idempotent), ("bulkhead", bulkhead is not None),
+               ("timeout", timeout is not None)]
+    used = [name for name, is_used in options if is_used]
+    if used:
+        raise Exception("Methods which return a Stream can't use {}".format(", ".join(used)))
+
+
+def create_stream_invoker(method, invoke, returns, strict_floats):
+    """Creates the function which runs the body of a method which returns a :class:`Stream`, and
+    the validator for the values it returns.
+
+    :param method: The method
+    :type method: function
+    :param invoke: The function which runs the body of the method
+    :type invoke: function
+    :param returns: The method's return type
+    :type returns: Stream
+    :param strict_floats: If True, ints are not allowed as float items
+    :type strict_floats: bool
+    :rtype: (function, (object) -> None)
+
+    .. versionadded:: 0.5.0
+    """
+    is_coroutine_function = getattr(inspect, "iscoroutinefunction", None)
+    if is_coroutine_function is not None and is_coroutine_function(method):
+        raise Exception("Methods which return a Stream can't be coroutine functions")
+    validate_item = parameter_checker.create_return_validator(returns.item_type, strict_floats)
+
+    def _invoke_stream(*args, **kwargs):
+        return StreamResult(invoke(*args, **kwargs), validate_item)
+    return _invoke_stream, parameter_checker.create_return_validator(StreamResult, strict_floats)
+
+
+def iter_encoded_stream(response, codec, logger):
+    """Encodes a response whose result is a :class:`StreamResult` one item at a time.
+
+    Once the beginning of the response is encoded, an error can no longer be reported in the
+    response. It is logged and raised, which aborts the response.
+
+    :param response: The response to encode
+    :type response: dict[str, object]
+    :param codec: The codec for the response
+    :type codec: typedjsonrpc.codec.Codec
+    :param logger: The logger for errors which occur during the stream
+    :type logger: logging.Logger
+    :return: The pieces of the encoded response
+    :rtype: collections.Iterator[bytes]
+
+    .. versionadded:: 0.5.0
+    """
+    placeholder = "stream-{}".format(uuid.uuid4().hex)
+    envelope = codec.encode(dict(response, result=placeholder))
+    head, tail = envelope.split(codec.encode(placeholder), 1)
+    yield head + b"["
+    separator = b""
+    try:
+        for item in response["result"]:
+            yield separator + codec.encode(item)
+            separator = b","
+    except Exception:
+        logger.exception("Stream of the response to id %s failed", response["id"])
+        raise
+    yield b"]" + tail
@@ -0,0 +1,454 @@
+# coding: utf-8
+#
+# Copyright 2015 Palantir Technologies, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A WebSocket transport which keeps JSON-RPC sessions open and lets the server push notifications.
+
+This implements the server side of :rfc:`6455` without any additional dependencies. Each text or
+binary message from the client is dispatched like the body of an HTTP request, and each response
+is sent back as a text message.
+"""
+from __future__ import absolute_import, division, print_function
+
+import base64
+import hashlib
+import struct
+import threading
+
+import six
+
+from .server import DEFAULT_API_ENDPOINT_NAME
+from .sockets import (DEFAULT_MAX_FRAME_SIZE, DEFAULT_MAX_IN_FLIGHT, _ConnectionDispatcher,
+                      _ConnectionHandler, _FrameRequest, _ListeningServer, _TCPServer)
+
+__all__ = ["WebSocketRequest", "WebSocketServer", "WebSocketSession", "create_accept_key"]
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_MAX_HEADER_LINE = 8192
+_MAX_HEADERS = 100
+
+_OPCODE_CONTINUATION = 0x0
+_OPCODE_TEXT = 0x1
+_OPCODE_BINARY = 0x2
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+_OPCODES = frozenset([_OPCODE_CONTINUATION, _OPCODE_TEXT, _OPCODE_BINARY, _OPCODE_CLOSE,
+                      _OPCODE_PING, _OPCODE_PONG])
+
+_CLOSE_NORMAL = 1000
+_CLOSE_PROTOCOL_ERROR = 1002
+_CLOSE_MESSAGE_TOO_BIG = 1009
+
+_SHORT_LENGTH = struct.Struct(">H")
+_LONG_LENGTH = struct.Struct(">Q")
+
+
+def create_accept_key(key):
+    """Computes the ``Sec-WebSocket-Accept`` header for a ``Sec-WebSocket-Key`` header.
+
+    :param key: The key sent by the client
+    :type key: str
+    :rtype: str
+
+    .. versionadded:: 0.5.0
+    """
+    digest = hashlib.sha1(key.encode("ascii") + _GUID).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+if six.PY3:
+    def _unmask(data, mask):
+        length = len(data)
+        key = (mask * (length // 4 + 1))[:length]
+        # pylint: disable=no-member
+        return (int.from_bytes(data, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+else:  # pragma: no cover
+    def _unmask(data, mask):
+        mask = bytearray(mask)
+        return bytes(bytearray(byte ^ mask[index % 4]
+                               for index, byte in enumerate(bytearray(data))))
+
+
+class _HandshakeError(Exception):
+    def __init__(self, status):
+        super(_HandshakeError, self).__init__(status)
+        self.status = status
+
+
+class _ProtocolError(Exception):
+    def __init__(self, close_code, reason):
+        super(_ProtocolError, self).__init__(close_code, reason)
+        self.close_code = close_code
+        self.reason = reason
+
+
+class WebSocketRequest(_FrameRequest):  # pylint: disable=too-few-public-methods
+    """The request object which :class:`WebSocketServer` passes to the registry for each message.
+
+    It is available to methods as :data:`typedjsonrpc.context.current_request`.
+
+    :attribute headers: The headers of the WebSocket handshake with lower-case names
+    :type headers: dict[str, str]
+    :attribute session: The session the message was received on
+    :type session: WebSocketSession
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, session, data):
+        """
+        :param session: The session the message was received on
+        :type session: WebSocketSession
+        :param data: The message
+        :type data: bytes
+        """
+        super(WebSocketRequest, self).__init__(data)
+        self.session = session
+        self.headers = session.headers
+
+
+class WebSocketSession(object):
+    """An open WebSocket connection of a :class:`WebSocketServer`.
+
+    :attribute headers: The headers of the WebSocket handshake with lower-case names
+    :type headers: dict[str, str]
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, codec, wfile, headers):
+        """
+        :param codec: The codec to encode notifications with
+        :type codec: typedjsonrpc.codec.Codec
+        :param wfile: The stream to write frames to
+        :type wfile: io.BufferedIOBase
+        :param headers: The headers of the WebSocket handshake with lower-case names
+        :type headers: dict[str, str]
+        """
+        self.headers = headers
+        self._codec = codec
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def closed(self):
+        """Whether the connection is closed.
+
+        :rtype: bool
+        """
+        return self._closed
+
+    def notify(self, method, *args, **kwargs):
+        """Pushes a notification to the client.
+
+        :param method: The name of the notification
+        :type method: str
+        :param args: The positional parameters
+        :param kwargs: The keyword parameters
+        :return: False if the connection is closed
+        :rtype: bool
+        """
+        if args and kwargs:
+            raise ValueError("JSON-RPC notifications take either positional or keyword parameters")
+        message = {"jsonrpc": "2.0", "method": method}
+        if args or kwargs:
+            message["params"] = list(args) if args else kwargs
+        return self.send_text(self._codec.encode(message))
+
+    def send_text(self, data):
+        """Sends an encoded message as a text frame.
+
+        :param data: The UTF-8 encoded message
+        :type data: bytes
+        :return: False if the connection is closed
+        :rtype: bool
+        """
+        return self._send_frame(_OPCODE_TEXT, data)
+
+    def send_pong(self, data):
+        """Answers a ping from the client.
+
+        :param data: The payload of the ping
+        :type data: bytes
+        :return: False if the connection is closed
+        :rtype: bool
+        """
+        return self._send_frame(_OPCODE_PONG, data)
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack(">BB", 0x80 | opcode, 126) + _SHORT_LENGTH.pack(length)
+        else:
+            header = struct.pack(">BB", 0x80 | opcode, 127) + _LONG_LENGTH.pack(length)
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._wfile.write(header + payload)
+                self._wfile.flush()
+            except (IOError, OSError):
+                self._closed = True
+                return False
+            if opcode == _OPCODE_CLOSE:
+                self._closed = True
+        return True
+
+    def close(self, code=_CLOSE_NORMAL, reason=""):
+        """Starts closing the connection. No more messages can be sent afterwards.
+
+        :param code: The status code of the close frame
+        :type code: int
+        :param reason: The reason for closing
+        :type reason: str
+        """
+        self._send_frame(_OPCODE_CLOSE, _SHORT_LENGTH.pack(code) + reason.encode("utf-8"))
+
+
+class WebSocketServer(_ListeningServer):  # pylint: disable=too-many-instance-attributes
+    """Serves a registry to WebSocket clients such as browsers.
+
+    Connections are accepted at ``endpoint`` and stay open until either side closes them. Every
+    message is dispatched with :meth:`typedjsonrpc.registry.Registry.dispatch_response`. Like
+    :class:`typedjsonrpc.sockets.SocketServer`, the messages of a connection are answered one after
+    another, or concurrently and in the order they complete if there is an ``executor``.
+
+    Methods can push notifications to their own client through
+    ``current_request.session.notify``, and :meth:`broadcast` pushes to all clients.
+
+    Browsers send cookies with WebSocket handshakes from any page and don't apply CORS to them.
+    Handshakes with an ``Origin`` header are therefore only accepted from the same origin as the
+    server or from ``allowed_origins``. Clients other than browsers usually send no ``Origin``
+    header and are always accepted.
+
+    :attribute registry: The registry for this server
+    :type registry: typedjsonrpc.registry.Registry
+
+    .. versionadded:: 0.5.0
+    """
+
+    def __init__(self, registry, address,  # pylint: disable=too-many-arguments
+                 endpoint=DEFAULT_API_ENDPOINT_NAME, executor=None,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_message_size=DEFAULT_MAX_FRAME_SIZE,
+                 allowed_origins=None):
+        """
+        :param registry: The JSON-RPC registry to use
+        :type registry: typedjsonrpc.registry.Registry
+        :param address: The ``(host, port)`` tuple to listen on
+        :type address: (str, int)
+        :param endpoint: The path clients connect to. Default "/api".
+        :type endpoint: str
+        :param executor: If set, the messages of a connection are dispatched concurrently on this
+            executor and answered in the order they complete
+        :type executor: concurrent.futures.Executor | None
+        :param max_in_flight: The maximum number of messages of one connection which are
+            dispatched at the same time
+        :type max_in_flight: int
+        :param max_message_size: The maximum length of a received message in bytes. Connections
+            which send longer messages are closed.
+        :type max_message_size: int
+        :param allowed_origins: The origins such as ``"https://dashboard.example.com"`` which may
+            connect in addition to the server's own origin. Handshakes from other origins are
+            rejected with the HTTP status code 403. ``"*"`` allows every origin.
+        :type allowed_origins: collections.Iterable[str] | None
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.registry = registry
+        self._endpoint = endpoint
+        self._executor = executor
+        self._max_in_flight = max_in_flight
+        self._max_message_size = max_message_size
+        self._allowed_origins = frozenset(origin.rstrip("/").lower()
+                                          for origin in allowed_origins or ())
+        self._sessions = set()
+        self._sessions_lock = threading.Lock()
+        self._server = _TCPServer(address, _ConnectionHandler)
+        self._server.transport = self
+
+    @property
+    def sessions(self):
+        """The open sessions.
+
+        :rtype: list[WebSocketSession]
+        """
+        with self._sessions_lock:
+            return list(self._sessions)
+
+    def broadcast(self, method, *args, **kwargs):
+        """Pushes a notification to every open session.
+
+        :param method: The name of the notification
+        :type method: str
+        :param args: The positional parameters
+        :param kwargs: The keyword parameters
+        :return: The number of sessions the notification was sent to
+        :rtype: int
+        """
+        return sum(1 for session in self.sessions if session.notify(method, *args, **kwargs))
+
+    def close(self):
+        """Closes the listening socket and all open sessions."""
+        super(WebSocketServer, self).close()
+        for session in self.sessions:
+            session.close()
+
+    def handle_connection(self, rfile, wfile):
+        """Performs the WebSocket handshake on a connection and then answers its messages until it
+        is closed.
+
+        :param rfile: The stream to read from
+        :type rfile: io.BufferedIOBase
+        :param wfile: The stream to write to
+        :type wfile: io.BufferedIOBase
+        """
+        try:
+            headers = self._accept(rfile)
+        except _HandshakeError as exc:
+            wfile.write("HTTP/1.1 {}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+                        .format(exc.status).encode("latin-1"))
+            return
+        wfile.write("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                    "Connection: Upgrade\r\nSec-WebSocket-Accept: {}\r\n\r\n"
+                    .format(create_accept_key(headers["sec-websocket-key"])).encode("latin-1"))
+        wfile.flush()
+
+        session = WebSocketSession(self.registry.codec, wfile, headers)
+        dispatcher = _ConnectionDispatcher(self.registry, session.send_text, self._executor,
+                                           self._max_in_flight,
+                                           lambda data: WebSocketRequest(session, data))
+        with self._sessions_lock:
+            self._sessions.add(session)
+        try:
+            self._receive_messages(rfile, session, dispatcher)
+        finally:
+            dispatcher.wait()
+            with self._sessions_lock:
+                self._sessions.discard(session)
+
+    def _accept(self, rfile):
+        """Reads and checks the handshake request.
+
+        :return: The headers of the request with lower-case names
+        :rtype: dict[str, str]
+        """
+        request_line = rfile.readline(_MAX_HEADER_LINE).decode("latin-1").split()
+        if len(request_line) != 3 or not request_line[2].startswith("HTTP/"):
+            raise _HandshakeError("400 Bad Request")
+        headers = {}
+        for _ in range(_MAX_HEADERS):
+            line = rfile.readline(_MAX_HEADER_LINE).decode("latin-1")
+            if not line.endswith("\n"):
+                raise _HandshakeError("400 Bad Request")
+            if not line.strip():
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _HandshakeError("431 Request Header Fields Too Large")
+
+        method, path, _ = request_line
+        connection = [token.strip().lower() for token in headers.get("connection", "").split(",")]
+        if path.split("?", 1)[0] != self._endpoint:
+            raise _HandshakeError("404 Not Found")
+        if method != "GET":
+            raise _HandshakeError("405 Method Not Allowed")
+        if headers.get("upgrade", "").lower() != "websocket" or "upgrade" not in connection:
+            raise _HandshakeError("426 Upgrade Required")
+        if headers.get("sec-websocket-version") != "13" or "sec-websocket-key" not in headers:
+            raise _HandshakeError("400 Bad Request")
+        if "origin" in headers and not self._is_allowed_origin(headers):
+            raise _HandshakeError("403 Forbidden")
+        return headers
+
+    def _is_allowed_origin(self, headers):
+        origin = headers["origin"].rstrip("/").lower()
+        if "*" in self._allowed_origins or origin in self._allowed_origins:
+            return True
+        _, separator, host = origin.partition("://")
+        return bool(separator) and host == headers.get("host", "").lower()
+
+    def _receive_messages(self, rfile, session, dispatcher):
+        fragments = []
+        try:
+            while not session.closed and not dispatcher.closed:
+                frame = self._read_frame(rfile)
+                if frame is None:
+                    return
+                fin, opcode, payload = frame
+                if opcode == _OPCODE_PING:
+                    session.send_pong(payload)
+                elif opcode == _OPCODE_CLOSE:
+                    session.close(*self._parse_close_payload(payload))
+                    return
+                elif opcode != _OPCODE_PONG:
+                    fragments = self._add_fragment(fragments, opcode, payload)
+                    if fin:
+                        dispatcher.dispatch(b"".join(fragments))
+                        fragments = []
+        except _ProtocolError as exc:
+            session.close(exc.close_code, exc.reason)
+
+    @staticmethod
+    def _parse_close_payload(payload):
+        if len(payload) < 2:
+            return _CLOSE_NORMAL, ""
+        return _SHORT_LENGTH.unpack(payload[:2])[0], ""
+
+    def _add_fragment(self, fragments, opcode, payload):
+        if (opcode == _OPCODE_CONTINUATION) != bool(fragments):
+            raise _ProtocolError(_CLOSE_PROTOCOL_ERROR, "Unexpected continuation frame")
+        if sum(len(fragment) for fragment in fragments) + len(payload) > self._max_message_size:
+            raise _ProtocolError(_CLOSE_MESSAGE_TOO_BIG, "Message too big")
+        fragments.append(payload)
+        return fragments
+
+    def _read_frame(self, rfile):
+        """Reads the next frame from the client.
+
+        :return: Whether the frame is final, its opcode and its unmasked payload, or None if the
+            connection was closed
+        :rtype: (bool, int, bytes) | None
+        """
+        header = rfile.read(2)
+        if len(header) < 2:
+            return None
+        first, second = struct.unpack(">BB", header)
+        fin = bool(first & 0x80)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if first & 0x70 or opcode not in _OPCODES:
+            raise _ProtocolError(_CLOSE_PROTOCOL_ERROR, "Unsupported frame")
+        if not second & 0x80:
+            raise _ProtocolError(_CLOSE_PROTOCOL_ERROR, "Client frames must be masked")
+        if opcode & 0x8 and (length > 125 or not fin):
+            raise _ProtocolError(_CLOSE_PROTOCOL_ERROR, "Invalid control frame")
+        if length >= 126:
+            length_format = _SHORT_LENGTH if length == 126 else _LONG_LENGTH
+            extended_length = rfile.read(length_format.size)
+            if len(extended_length) < length_format.size:
+                return None
+            length, = length_format.unpack(extended_length)
+        if length > self._max_message_size:
+            raise _ProtocolError(_CLOSE_MESSAGE_TOO_BIG, "Message too big")
+        mask = rfile.read(4)
+        payload = rfile.read(length)
+        if len(mask) < 4 or len(payload) < length:
+            return None
+        return fin, opcode, _unmask(payload, mask)